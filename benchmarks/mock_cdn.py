@@ -0,0 +1,136 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import threading
+import hashlib
+import time
+import re
+
+# =========================================================================== #
+
+class MockCDN:
+    """
+    Local stand-in for Snapchat's Memories CDN
+
+    Serves synthetic payloads for URLs produced by synthetic.make_export_html,
+    choosing the payload by the "kind" query parameter. Supports GET, HEAD and
+    single byte ranges, and can inject latency and 5xx errors.
+
+    Errors are deterministic: with error_rate=0.1 the same ~10% of Memories
+    fail their first attempt on every run, and succeed when retried.
+    """
+
+    def __init__(self, payloads: dict[str, tuple[bytes, str]], latency: float = 0.0,
+                 error_rate: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.payloads = payloads
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockCDN":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def reset(self) -> None:
+        """Clear counters and attempt history so errors are injected again"""
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.bytes_sent = 0
+            self._attempts.clear()
+
+    def _should_fail(self, key: str) -> bool:
+        # Only first attempts fail, so retries always make progress
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        if attempt > 0 or self.error_rate <= 0:
+            return False
+        bucket = int(hashlib.sha1(key.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+        return bucket < self.error_rate
+
+    def _make_handler(self):
+        cdn = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            # Keep-alive, like a real CDN
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, send_body: bool):
+                with cdn._lock:
+                    cdn.requests += 1
+                if cdn.latency:
+                    time.sleep(cdn.latency)
+
+                query = parse_qs(urlsplit(self.path).query)
+                kind = query.get("kind", [""])[0]
+                key = query.get("mid", [self.path])[0]
+
+                if kind not in cdn.payloads:
+                    self.send_error(404, f"Unknown kind '{kind}'")
+                    return
+                if send_body and cdn._should_fail(key):
+                    with cdn._lock:
+                        cdn.errors += 1
+                    self.send_error(503, "Injected error")
+                    return
+
+                body, content_type = cdn.payloads[kind]
+                start, end = 0, len(body) - 1
+                status = 200
+
+                match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)) if match.group(2) else end, end)
+                    status = 206
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+                self.end_headers()
+
+                if send_body:
+                    self.wfile.write(body[start:end + 1])
+                    with cdn._lock:
+                        cdn.bytes_sent += end - start + 1
+
+            def do_GET(self):
+                self._respond(send_body=True)
+
+            def do_HEAD(self):
+                self._respond(send_body=False)
+
+        return Handler
+
+# =========================================================================== #
@@ -0,0 +1,432 @@
+from contextlib import redirect_stdout
+from mock_cdn import MockCDN
+from pathlib import Path
+import synthetic
+import subprocess
+import statistics
+import tempfile
+import argparse
+import platform
+import shutil
+import time
+import json
+import sys
+import os
+import io
+
+# Run against the working tree, not an installed copy
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.parsers import parse_snapchat_memories
+from src.downloaders import memory_download, handle_zip
+from src.metadata import write_exif
+from src.media_processing import merge_jpg_with_overlay, merge_mp4_with_overlay
+from src.dependencies import find_dependency
+from src.exceptions import DependencyError
+from src.config import RunConfig
+
+# =========================================================================== #
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+# Default export sizes for the parser benchmark
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# A benchmark counts as regressed when it is this much slower than baseline
+DEFAULT_MAX_REGRESSION = 0.20
+
+# =========================================================================== #
+
+"""
+Time a callable over several repeats, keeping the fastest run
+
+Args:
+    func: Callable run once per repeat (setup should happen outside it)
+    repeat: Number of repeats
+
+Returns:
+    Best wall time in seconds
+"""
+def best_of(func, repeat: int = 1) -> float:
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+# =========================================================================== #
+
+"""
+Check whether an external tool can be found the way the pipeline finds it
+
+Args:
+    name: "exiftool" or "ffmpeg"
+
+Returns:
+    True if find_dependency succeeds
+"""
+def has_tool(name: str) -> bool:
+
+    try:
+        find_dependency(name)
+        return True
+    except DependencyError:
+        return False
+
+# =========================================================================== #
+
+"""
+Expose imageio-ffmpeg's bundled binary as "ffmpeg" on PATH if no system
+ffmpeg is installed, so the MP4 merge can be benchmarked anywhere
+
+Args:
+    bin_dir: Scratch directory to place the link in
+"""
+def ensure_ffmpeg_on_path(bin_dir: Path) -> None:
+
+    if shutil.which("ffmpeg"):
+        return
+    bundled = synthetic.find_ffmpeg()
+    if bundled is None:
+        return
+
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    link = bin_dir / ("ffmpeg.exe" if sys.platform.startswith("win") else "ffmpeg")
+    try:
+        link.symlink_to(bundled)
+    except OSError:
+        shutil.copy2(bundled, link)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+
+# =========================================================================== #
+
+"""
+Benchmark parse_snapchat_memories on synthetic exports
+
+Args:
+    sizes: Row counts to generate
+    base_url: URL embedded in the download links
+
+Returns:
+    Dictionary of benchmark name -> result
+"""
+def bench_parse(sizes: list[int], base_url: str) -> dict:
+
+    results = {}
+    for size in sizes:
+        html = synthetic.make_export_html(size, base_url)
+        with redirect_stdout(io.StringIO()):
+            seconds = best_of(lambda: parse_snapchat_memories(html))
+        results[f"parse_snapchat_memories[{size}]"] = {
+            "seconds": seconds,
+            "items": size,
+            "per_item_ms": seconds / size * 1000,
+            "html_bytes": len(html),
+        }
+    return results
+
+# =========================================================================== #
+
+"""
+Benchmark memory_download end to end against the mock CDN
+
+Args:
+    cdn: Running mock CDN
+    count: Number of Memories to download
+    workers: Worker threads passed to memory_download
+    scratch: Scratch directory
+
+Returns:
+    Dictionary of benchmark name -> result
+"""
+def bench_download(cdn: MockCDN, count: int, workers: int, scratch: Path) -> dict:
+
+    html = synthetic.make_export_html(count, cdn.url)
+    with redirect_stdout(io.StringIO()):
+        memories = parse_snapchat_memories(html)
+
+    # Only serve kinds the CDN has payloads for (MP4 needs ffmpeg to build)
+    memories = [m for m in memories if m["url"].split("kind=")[1].split("&")[0] in cdn.payloads]
+
+    out_dir = scratch / f"download-w{workers}"
+    config = RunConfig(out_dir=out_dir, workers=workers, retry_delay=0)
+    cdn.reset()
+
+    with redirect_stdout(io.StringIO()):
+        seconds = best_of(lambda: memory_download(memories, config))
+
+    moved = cdn.bytes_sent
+    return {
+        f"memory_download[{len(memories)},workers={workers}]": {
+            "seconds": seconds,
+            "items": len(memories),
+            "per_item_ms": seconds / max(len(memories), 1) * 1000,
+            "mb_per_s": moved / seconds / 1e6 if seconds else 0.0,
+            "injected_errors": cdn.errors,
+        }
+    }
+
+# =========================================================================== #
+
+"""
+Benchmark handle_zip, write_exif and both overlay merges on local files
+
+Args:
+    payloads: Payloads from synthetic.make_payloads()
+    count: Files per benchmark
+    scratch: Scratch directory
+
+Returns:
+    Dictionary of benchmark name -> result
+"""
+def bench_processing(payloads: dict, count: int, scratch: Path) -> dict:
+
+    results = {}
+    memory = {"date": "2020-05-17 13:45:10 UTC", "type": "Image",
+              "lat": "30.445803", "lon": "-84.31457", "url": None}
+
+    def record(name, seconds, items):
+        results[name] = {"seconds": seconds, "items": items,
+                         "per_item_ms": seconds / max(items, 1) * 1000}
+
+    # handle_zip: unzip, rename, tag and merge. Without exiftool the tagging
+    # is skipped, so that timing gets its own name
+    zip_dir = scratch / "zip"
+    zip_dir.mkdir()
+    zips = []
+    for i in range(count):
+        path = zip_dir / f"2020-05-17-{i:06d}.zip"
+        path.write_bytes(payloads["zip_jpg"][0])
+        zips.append(path)
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for path in zips:
+            handle_zip(path, path.stem, memory)
+        record("handle_zip[jpg]" if has_tool("exiftool") else "handle_zip[jpg,no-exiftool]",
+               time.perf_counter() - start, count)
+
+    # write_exif on plain JPGs
+    if has_tool("exiftool"):
+        exif_dir = scratch / "exif"
+        exif_dir.mkdir()
+        files = []
+        for i in range(count):
+            path = exif_dir / f"{i}.jpg"
+            path.write_bytes(payloads["jpg"][0])
+            files.append(path)
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for path in files:
+                write_exif(path, memory["date"], memory["lat"], memory["lon"])
+            record("write_exif[jpg]", time.perf_counter() - start, count)
+
+    # merge_jpg_with_overlay at phone resolution
+    overlay = synthetic.make_overlay_png()
+    merge_dir = scratch / "merge_jpg"
+    merge_dir.mkdir()
+    pairs = []
+    for i in range(count):
+        jpg = merge_dir / f"{i}-main.jpg"
+        png = merge_dir / f"{i}-overlay.png"
+        jpg.write_bytes(payloads["jpg"][0])
+        png.write_bytes(overlay)
+        pairs.append((jpg, png))
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for jpg, png in pairs:
+            merge_jpg_with_overlay(jpg, png)
+        record("merge_jpg_with_overlay", time.perf_counter() - start, count)
+
+    # merge_mp4_with_overlay, fewer runs since each one is an ffmpeg encode
+    if "mp4" in payloads and has_tool("ffmpeg"):
+        video_overlay = synthetic.make_overlay_png(synthetic.VIDEO_SIZE)
+        mp4_dir = scratch / "merge_mp4"
+        mp4_dir.mkdir()
+        mp4_count = max(1, count // 10)
+        pairs = []
+        for i in range(mp4_count):
+            mp4 = mp4_dir / f"{i}-main.mp4"
+            png = mp4_dir / f"{i}-overlay.png"
+            mp4.write_bytes(payloads["mp4"][0])
+            png.write_bytes(video_overlay)
+            pairs.append((mp4, png))
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for mp4, png in pairs:
+                merge_mp4_with_overlay(mp4, png)
+            record("merge_mp4_with_overlay", time.perf_counter() - start, mp4_count)
+
+    return results
+
+# =========================================================================== #
+
+"""
+Get the current commit, marking uncommitted changes
+
+Returns:
+    Short commit hash (with "-dirty" suffix if the tree has changes), or
+    "unknown" outside a git checkout
+"""
+def current_commit() -> str:
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+# =========================================================================== #
+
+"""
+Compare results with a baseline run
+
+Runs with different external tools are not compared: downloads and ZIP
+handling skip tagging without exiftool and merging without ffmpeg.
+
+Args:
+    results: Current benchmark results
+    baseline: Baseline results file contents
+    max_regression: Allowed slowdown as a fraction (0.2 = 20%)
+    tools: Availability of each external tool in this run
+
+Returns:
+    List of regression messages (empty if none)
+"""
+def compare(results: dict, baseline: dict, max_regression: float, tools: dict) -> list[str]:
+
+    regressions = []
+    if baseline.get("tools") != tools:
+        print(f"\nNot compared with {baseline['commit']}: it ran with tools {baseline.get('tools')}, "
+              f"this run with {tools}")
+        return regressions
+    print(f"\nCompared with {baseline['commit']} ({baseline['timestamp']}):")
+
+    for name, result in results.items():
+        old = baseline["benchmarks"].get(name)
+        if not old or not old["seconds"]:
+            continue
+        change = result["seconds"] / old["seconds"] - 1
+        marker = ""
+        if change > max_regression:
+            marker = "  <-- REGRESSION"
+            regressions.append(f"{name}: {change:+.1%}")
+        print(f"  {name:<45} {old['seconds']:9.3f}s -> {result['seconds']:9.3f}s  {change:+7.1%}{marker}")
+
+    return regressions
+
+# =========================================================================== #
+
+"""
+Find the most recent stored results from a different commit
+
+Args:
+    commit: Commit of the current run
+
+Returns:
+    Path to a results file, or None
+"""
+def latest_baseline(commit: str) -> Path | None:
+
+    candidates = [
+        path for path in RESULTS_DIR.glob("*.json")
+        if not path.stem.startswith(commit.removesuffix("-dirty"))
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda path: path.stat().st_mtime)
+
+# =========================================================================== #
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="MemorEasy benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Export sizes for the parser benchmark")
+    parser.add_argument("--download-count", type=int, default=200,
+                        help="Memories downloaded in the end-to-end benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8],
+                        help="Worker counts for the end-to-end benchmark")
+    parser.add_argument("--process-count", type=int, default=50,
+                        help="Files per local processing benchmark")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Mock CDN latency per request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.05,
+                        help="Share of Memories whose first request gets a 503")
+    parser.add_argument("--compare", type=Path, default=None,
+                        help="Baseline results file (default: latest from another commit)")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="Fail if any benchmark is this much slower (0.2 = 20%%)")
+    parser.add_argument("--no-save", action="store_true", help="Don't store the results")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="memoreasy-bench-") as tmp:
+        scratch = Path(tmp)
+        ensure_ffmpeg_on_path(scratch / "bin")
+
+        print("Building synthetic payloads...")
+        payloads = synthetic.make_payloads()
+
+        with MockCDN(payloads, latency=args.latency, error_rate=args.error_rate) as cdn:
+            print(f"Mock CDN at {cdn.url} serving: {', '.join(payloads)}")
+
+            print("Parsing synthetic exports...")
+            results.update(bench_parse(args.sizes, cdn.url))
+
+            for workers in args.workers:
+                print(f"Downloading {args.download_count} memories with {workers} worker(s)...")
+                results.update(bench_download(cdn, args.download_count, workers, scratch))
+
+        print("Processing local files...")
+        results.update(bench_processing(payloads, args.process_count, scratch))
+        tools = {tool: has_tool(tool) for tool in ("exiftool", "ffmpeg")}
+
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tools": tools,
+        "settings": {key: str(value) for key, value in vars(args).items()},
+        "benchmarks": results,
+    }
+
+    print(f"\n{'Benchmark':<45} {'seconds':>10} {'ms/item':>10}")
+    for name, result in results.items():
+        print(f"{name:<45} {result['seconds']:10.3f} {result['per_item_ms']:10.3f}")
+    median_ms = statistics.median(result["per_item_ms"] for result in results.values())
+    print(f"(median {median_ms:.3f} ms/item; tools: {report['tools']})")
+
+    baseline_path = args.compare or latest_baseline(commit)
+    regressions = []
+    if baseline_path and baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.max_regression, tools)
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        out_path = RESULTS_DIR / f"{commit}.json"
+        out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nResults saved to {out_path.relative_to(ROOT)}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.max_regression:.0%}:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+
+# =========================================================================== #
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+from pathlib import Path
+import statistics
+import subprocess
+import argparse
+import sys
+
+# =========================================================================== #
+
+# Repository root, so the benchmark can be run from anywhere
+ROOT = Path(__file__).resolve().parent.parent
+
+# Libraries that must only be imported once the pipeline actually needs them
+HEAVY_MODULES = ("moviepy", "numpy", "imageio", "PIL", "bs4", "requests")
+
+# Cumulative import budget for the entry point, in milliseconds
+DEFAULT_THRESHOLD_MS = 150.0
+
+# =========================================================================== #
+
+"""
+Import the entry point in a fresh interpreter with -X importtime
+
+Args:
+    module: Dotted module name to import
+
+Returns:
+    Tuple of (cumulative import time of module in microseconds,
+              set of every module name imported along the way)
+
+Raises:
+    RuntimeError: If the import fails or the module is missing from the output
+"""
+def measure_import(module: str) -> tuple[int, set[str]]:
+
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    cumulative = None
+    imported = set()
+
+    # Format: "import time:  self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [field.strip() for field in line[len("import time:"):].split("|")]
+        if len(fields) != 3 or not fields[1].isdigit():
+            continue
+
+        name = fields[2].strip()
+        imported.add(name)
+        if name == module:
+            cumulative = int(fields[1])
+
+    if cumulative is None:
+        raise RuntimeError(f"No importtime entry found for {module}")
+
+    return cumulative, imported
+
+# =========================================================================== #
+
+"""
+Measure cold start of the CLI entry point and fail on regressions
+
+Exits non-zero if the median import time exceeds the threshold or if any of
+the heavy media/network libraries are imported eagerly.
+"""
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="MemorEasy startup benchmark")
+    parser.add_argument("--module", default="src.main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=7, help="Number of cold imports")
+    parser.add_argument(
+        "--threshold-ms", type=float, default=DEFAULT_THRESHOLD_MS,
+        help="Maximum allowed median cumulative import time"
+    )
+    args = parser.parse_args()
+
+    samples = []
+    imported = set()
+    for _ in range(args.runs):
+        cumulative, names = measure_import(args.module)
+        samples.append(cumulative / 1000)
+        imported |= names
+
+    median_ms = statistics.median(samples)
+    print(f"{args.module}: median {median_ms:.1f} ms, "
+          f"min {min(samples):.1f} ms, max {max(samples):.1f} ms "
+          f"over {args.runs} runs (threshold {args.threshold_ms:.0f} ms)")
+
+    failures = []
+
+    eager = sorted({name.split(".")[0] for name in imported} & set(HEAVY_MODULES))
+    if eager:
+        failures.append(f"Heavy modules imported at startup: {', '.join(eager)}")
+    if median_ms > args.threshold_ms:
+        failures.append(
+            f"Startup regression: {median_ms:.1f} ms > {args.threshold_ms:.0f} ms"
+        )
+
+    for failure in failures:
+        print(failure)
+
+    sys.exit(1 if failures else 0)
+
+# =========================================================================== #
+
+if __name__ == "__main__":
+    main()
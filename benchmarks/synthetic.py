@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import subprocess
+import tempfile
+import zipfile
+import shutil
+import random
+import io
+
+# =========================================================================== #
+
+# Share of each payload kind in a synthetic export. Snapchat serves plain
+# photos and videos directly and Memories with overlays as ZIP archives.
+KIND_WEIGHTS = {"jpg": 0.55, "mp4": 0.2, "zip_jpg": 0.15, "zip_mp4": 0.1}
+
+# Content-Type sent for each kind
+CONTENT_TYPES = {
+    "jpg": "image/jpg",
+    "mp4": "video/mp4",
+    "zip_jpg": "application/zip",
+    "zip_mp4": "application/zip",
+}
+
+# Snapchat renders photos and videos at phone-screen resolution
+IMAGE_SIZE = (1080, 1920)
+VIDEO_SIZE = (540, 960)
+VIDEO_SECONDS = 2
+
+# =========================================================================== #
+
+"""
+Pick the payload kind of every synthetic Memory
+
+Args:
+    count: Number of Memories
+    seed: Random seed so exports are reproducible
+
+Returns:
+    List of kinds (keys of KIND_WEIGHTS)
+"""
+def memory_kinds(count: int, seed: int = 0) -> list[str]:
+
+    rng = random.Random(seed)
+    kinds = list(KIND_WEIGHTS)
+    return rng.choices(kinds, weights=[KIND_WEIGHTS[kind] for kind in kinds], k=count)
+
+# =========================================================================== #
+
+"""
+Build a synthetic memories_history.html in Snapchat's format
+
+Args:
+    count: Number of table rows
+    base_url: URL of the mock CDN, e.g. "http://127.0.0.1:8000"
+    seed: Random seed so exports are reproducible
+
+Returns:
+    HTML text with the Memories table on one line, like the real export
+"""
+def make_export_html(count: int, base_url: str, seed: int = 0) -> str:
+
+    rng = random.Random(seed)
+    start = datetime(2016, 1, 1)
+    rows = ["<tr><th>Date</th><th>Media Type</th><th>Location</th><th></th></tr>"]
+
+    for idx, kind in enumerate(memory_kinds(count, seed)):
+        # Unique, increasing timestamps so every Memory gets its own file name
+        date = start + timedelta(seconds=idx * 3607 + rng.randrange(3600))
+        media_type = "Video" if "mp4" in kind else "Image"
+        lat = rng.uniform(-80, 80)
+        lon = rng.uniform(-170, 170)
+        url = f"{base_url}/dmd/memories?uid=u&sid=s{idx}&mid=m{idx}&kind={kind}&sig={rng.getrandbits(64):x}"
+        rows.append(
+            f"<tr><td>{date:%Y-%m-%d %H:%M:%S} UTC</td><td>{media_type}</td>"
+            f"<td>Latitude, Longitude: {lat:.6f}, {lon:.6f}</td>"
+            f"<td><a href=\"#\" onclick=\"downloadMemories('{url}', this, true); return false;\">"
+            f"Download</a></td></tr>"
+        )
+
+    return (
+        "<html><head><title>Memories</title></head><body>\n"
+        "<div id='mem-info-bar'><table>" + "".join(rows) + "</table></div>\n"
+        "</body></html>\n"
+    )
+
+# =========================================================================== #
+
+"""
+Encode a JPG photo
+
+Args:
+    size: (width, height)
+    seed: Varies the image content
+
+Returns:
+    JPEG bytes
+"""
+def make_jpg(size: tuple[int, int] = IMAGE_SIZE, seed: int = 0) -> bytes:
+
+    from PIL import Image
+
+    # Noise compresses poorly, so file sizes resemble real photos
+    rng = random.Random(seed)
+    tile = Image.frombytes("RGB", (64, 64), rng.randbytes(64 * 64 * 3))
+    image = tile.resize(size)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+# =========================================================================== #
+
+"""
+Encode a transparent overlay PNG like Snapchat's caption/sticker layer
+
+Args:
+    size: (width, height)
+
+Returns:
+    PNG bytes
+"""
+def make_overlay_png(size: tuple[int, int] = IMAGE_SIZE) -> bytes:
+
+    from PIL import Image, ImageDraw
+
+    overlay = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    draw.rectangle((0, size[1] // 2 - 40, size[0], size[1] // 2 + 40), fill=(0, 0, 0, 140))
+    draw.ellipse((size[0] // 4, size[1] // 5, size[0] // 2, size[1] // 3), fill=(255, 220, 0, 255))
+    buffer = io.BytesIO()
+    overlay.save(buffer, "PNG")
+    return buffer.getvalue()
+
+# =========================================================================== #
+
+"""
+Find an ffmpeg executable: the system one, or the binary bundled with
+imageio-ffmpeg (installed alongside moviepy)
+
+Returns:
+    Path to ffmpeg, or None if neither is available
+"""
+def find_ffmpeg() -> str | None:
+
+    system = shutil.which("ffmpeg")
+    if system:
+        return system
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+# =========================================================================== #
+
+"""
+Encode a short H.264 MP4 test video
+
+Args:
+    size: (width, height)
+    seconds: Duration
+
+Returns:
+    MP4 bytes, or None if no ffmpeg is available
+"""
+def make_mp4(size: tuple[int, int] = VIDEO_SIZE, seconds: int = VIDEO_SECONDS) -> bytes | None:
+
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        return None
+
+    # The moov atom goes at the front like Snapchat's files, which needs a
+    # seekable output, so encode to a temporary file rather than a pipe
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = Path(tmp) / "video.mp4"
+        cmd = [
+            ffmpeg, "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc=size={size[0]}x{size[1]}:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-shortest", "-movflags", "+faststart",
+            str(out_path),
+        ]
+        result = subprocess.run(cmd, capture_output=True)
+        if result.returncode != 0 or not out_path.exists():
+            return None
+        return out_path.read_bytes()
+
+# =========================================================================== #
+
+"""
+Pack a main file and overlay into a ZIP the way Snapchat does
+
+Args:
+    main_name: Member name of the main file (ends with "-main.jpg"/"-main.mp4")
+    main_bytes: Main file content
+    overlay_bytes: Overlay PNG content
+
+Returns:
+    ZIP bytes
+"""
+def make_zip(main_name: str, main_bytes: bytes, overlay_bytes: bytes) -> bytes:
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(main_name, main_bytes)
+        archive.writestr(main_name.rsplit("-main", 1)[0] + "-overlay.png", overlay_bytes)
+    return buffer.getvalue()
+
+# =========================================================================== #
+
+"""
+Build one payload per kind for the mock CDN to serve
+
+Returns:
+    Dictionary of kind -> (bytes, Content-Type). MP4 kinds are left out when
+    no ffmpeg is available to encode them.
+"""
+def make_payloads() -> dict[str, tuple[bytes, str]]:
+
+    jpg = make_jpg()
+    overlay = make_overlay_png()
+    payloads = {
+        "jpg": jpg,
+        "zip_jpg": make_zip("0a1b2c3d-main.jpg", jpg, overlay),
+    }
+
+    mp4 = make_mp4()
+    if mp4 is not None:
+        payloads["mp4"] = mp4
+        payloads["zip_mp4"] = make_zip("0a1b2c3d-main.mp4", mp4, make_overlay_png(VIDEO_SIZE))
+
+    return {kind: (body, CONTENT_TYPES[kind]) for kind, body in payloads.items()}
+
+# =========================================================================== #
+
+"""
+Write a synthetic export to disk
+
+Args:
+    path: Output HTML path
+    count: Number of rows
+    base_url: URL of the mock CDN
+    seed: Random seed
+
+Returns:
+    path
+"""
+def write_export(path: Path, count: int, base_url: str, seed: int = 0) -> Path:
+
+    path = Path(path)
+    path.write_text(make_export_html(count, base_url, seed), encoding="utf-8")
+    return path
+
+# =========================================================================== #
@@ -0,0 +1,121 @@
+from mock_cdn import MockCDN
+from pathlib import Path
+import tempfile
+import argparse
+import hashlib
+import time
+import sys
+import os
+
+# Run against the working tree, not an installed copy
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.downloaders import stream_to_file
+
+# =========================================================================== #
+
+# Default body size: a typical long Snapchat video
+DEFAULT_SIZE_MB = 128
+
+# =========================================================================== #
+
+"""
+The write path before tuning: 8 KB iter_content chunks, one write each
+
+Args:
+    r: Streaming requests Response
+    f: File opened for binary writing
+    content_length: Expected body size; unused, accepted so legacy_write is
+                    called like stream_to_file
+
+Returns:
+    Tuple of (bytes written, SHA-256 hex digest)
+"""
+def legacy_write(r, f, content_length: int | None = None) -> tuple[int, str]:
+
+    digest = hashlib.sha256()
+    written = 0
+    for chunk in r.iter_content(chunk_size=8192):
+        if chunk:
+            f.write(chunk)
+            digest.update(chunk)
+            written += len(chunk)
+    return written, digest.hexdigest()
+
+# =========================================================================== #
+
+"""
+Download one body with a write path and measure it
+
+Args:
+    url: URL of the body on the mock CDN
+    write: legacy_write or a stream_to_file variant
+    target: File to write to
+
+Returns:
+    Tuple of (wall seconds, CPU seconds of the downloading thread, digest)
+"""
+def measure(url: str, write, target: Path) -> tuple[float, float, str]:
+
+    import requests
+
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    with requests.get(url, stream=True, timeout=60) as r, open(target, "wb") as f:
+        r.raise_for_status()
+        length = int(r.headers["Content-Length"])
+        written, digest = write(r, f, length)
+        f.flush()
+        os.fsync(f.fileno())
+    cpu = time.thread_time() - cpu
+    wall = time.perf_counter() - wall
+    if written != length:
+        raise RuntimeError(f"{write.__name__} wrote {written} of {length} bytes")
+    return wall, cpu, digest
+
+# =========================================================================== #
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Download write path microbenchmark")
+    parser.add_argument("--size-mb", type=int, default=DEFAULT_SIZE_MB,
+                        help=f"Body size in MB (default: {DEFAULT_SIZE_MB})")
+    parser.add_argument("--repeat", type=int, default=5, help="Downloads per variant (best is kept)")
+    parser.add_argument("--dir", type=Path, default=None,
+                        help="Directory to write to (default: a temporary directory)")
+    args = parser.parse_args()
+
+    body = os.urandom(args.size_mb * 1024 * 1024)
+    expected = hashlib.sha256(body).hexdigest()
+
+    variants = [
+        ("iter_content 8 KB (before)", legacy_write),
+        ("readinto 64 KB", lambda r, f, n: stream_to_file(r, f, n, buffer_size=64 * 1024)),
+        ("readinto 1 MB + fallocate", stream_to_file),
+        ("readinto 4 MB + fallocate", lambda r, f, n: stream_to_file(r, f, n, buffer_size=4 * 1024 * 1024)),
+    ]
+
+    with MockCDN({"mp4": (body, "video/mp4")}) as cdn, \
+            tempfile.TemporaryDirectory(dir=args.dir) as scratch:
+        url = f"{cdn.url}/dmd/memories?mid=bench&kind=mp4"
+        target = Path(scratch) / "body.mp4"
+
+        print(f"Body: {args.size_mb} MB, best of {args.repeat}\n")
+        print(f"{'Write path':<30} {'MB/s':>8} {'CPU s/GB':>9}")
+        for label, write in variants:
+            best_wall, best_cpu = float("inf"), float("inf")
+            for _ in range(args.repeat):
+                wall, cpu, digest = measure(url, write, target)
+                if digest != expected:
+                    raise RuntimeError(f"{label}: digest mismatch")
+                best_wall = min(best_wall, wall)
+                best_cpu = min(best_cpu, cpu)
+                target.unlink()
+            size_gb = len(body) / 1e9
+            print(f"{label:<30} {len(body) / best_wall / 1e6:>8.1f} {best_cpu / size_gb:>9.2f}")
+
+# =========================================================================== #
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 from src.main import main
+import multiprocessing
 
 if __name__ == "__main__":
+    # Lets the frozen executable start export parser processes
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,175 @@
+from .manifest import state_dir
+from pathlib import Path
+import threading
+import hashlib
+import shutil
+import os
+
+# =========================================================================== #
+
+# Folder of the content-addressed store inside the bookkeeping folder
+BLOBS_DIR_NAME = "blobs"
+
+# Linux ioctl that clones a file's extents (btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+
+# =========================================================================== #
+
+"""
+Make dest a copy-on-write clone of src
+
+Args:
+    src: Existing file
+    dest: New file to create
+
+Raises:
+    OSError: If the platform or filesystem does not support reflinks
+"""
+def reflink(src: Path, dest: Path) -> None:
+
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("Reflinks are not supported on this platform")
+
+    with open(src, "rb") as source, open(dest, "wb") as target:
+        try:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.remove(dest)
+            raise
+
+# =========================================================================== #
+
+"""
+Key for outputs that depend on a Memory's metadata as well as its content
+
+Args:
+    memory: Memory dictionary with keys: date, type, lat, lon, url
+
+Returns:
+    Short hex digest of the date and location written into the file
+"""
+def metadata_tag(memory: dict[str, str, str, str, str]) -> str:
+
+    key = "|".join((memory.get("date") or "", memory.get("lat") or "", memory.get("lon") or ""))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+# =========================================================================== #
+
+class BlobStore:
+    """
+    Content-addressed store that keeps one copy of each distinct file
+
+    Blobs live under <out_dir>/.memoreasy/blobs/ab/<sha256>.<tag><ext>,
+    where the digest is that of the download and the tag names the finished
+    output (metadata_tag, optionally prefixed by its role in a ZIP Memory).
+    Only finished, tagged files are stored, and each is the same file as its
+    copy in the output tree, so the store costs no extra space. Files are
+    materialised from blobs as hardlinks, falling back to reflinks and then
+    plain copies.
+
+    exiftool's -overwrite_original replaces a file rather than editing it, so
+    retagging a materialised file leaves its blob untouched; the blob is then
+    no longer referenced and collect_garbage() removes it.
+    """
+
+    def __init__(self, out_dir: Path):
+        self.root = state_dir(out_dir) / BLOBS_DIR_NAME
+        self._lock = threading.Lock()
+
+    def path(self, digest: str, ext: str = "", tag: str = "") -> Path:
+        """Location of a blob (which may not exist)"""
+        name = f"{digest}.{tag}{ext}" if tag else f"{digest}{ext}"
+        return self.root / digest[:2] / name
+
+    def get(self, digest: str, ext: str = "", tag: str = "") -> Path | None:
+        """Path of a stored blob, or None if it is not in the store"""
+        path = self.path(digest, ext, tag)
+        return path if path.exists() else None
+
+    def find(self, digest: str, ext: str = "", prefix: str = "") -> Path | None:
+        """Any stored blob of the digest whose tag starts with prefix, or None"""
+        return next(iter(sorted((self.root / digest[:2]).glob(f"{digest}.{prefix}*{ext}"))), None)
+
+    def put(self, src: Path, digest: str, ext: str = "", tag: str = "") -> tuple[Path, bool]:
+        """
+        Add a file to the store by linking it in
+
+        Args:
+            src: File whose content has the given digest (or derives from it)
+            digest: SHA-256 hex digest of the downloaded content
+            ext: File extension including the dot
+            tag: Variant of the blob, such as metadata_tag(memory)
+
+        Returns:
+            Tuple of (blob path, whether an identical blob was already stored)
+        """
+        blob = self.path(digest, ext, tag)
+        with self._lock:
+            if blob.exists():
+                return blob, True
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            self.materialise(src, blob)
+        return blob, False
+
+    def materialise(self, blob: Path, dest: Path) -> str:
+        """
+        Place a blob's content at dest, replacing any file already there
+
+        Args:
+            blob: Source file
+            dest: Destination path
+
+        Returns:
+            How the file was placed: "hardlink", "reflink" or "copy"
+        """
+        tmp = dest.with_name(f"{dest.name}.{threading.get_ident()}.link")
+        try:
+            os.link(blob, tmp)
+            method = "hardlink"
+        except OSError:
+            # Filesystems without hardlinks (FAT/exFAT) or across volumes
+            try:
+                reflink(blob, tmp)
+                method = "reflink"
+            except OSError:
+                shutil.copyfile(blob, tmp)
+                method = "copy"
+        tmp.replace(dest)
+        # rename() is a no-op when both names already link the same file
+        if tmp.exists():
+            tmp.unlink()
+        return method
+
+    def collect_garbage(self) -> tuple[int, int]:
+        """
+        Remove blobs that no file in the output tree links to
+
+        A blob whose link count is 1 is only held by the store: its output
+        file was retagged, packed into a volume, deleted, or is a copy on a
+        filesystem without hardlinks.
+
+        Returns:
+            Tuple of (number of blobs removed, bytes freed)
+        """
+        removed = 0
+        freed = 0
+        if not self.root.exists():
+            return removed, freed
+
+        with self._lock:
+            for blob in self.root.glob("*/*"):
+                try:
+                    stat = blob.stat()
+                    if not blob.is_file() or stat.st_nlink > 1:
+                        continue
+                    blob.unlink()
+                except OSError:
+                    continue
+                removed += 1
+                freed += stat.st_size
+        return removed, freed
+
+# =========================================================================== #
@@ -0,0 +1,196 @@
+from .exceptions import *
+from pathlib import Path
+import threading
+import shutil
+import time
+import re
+
+# =========================================================================== #
+
+# Reservation used when a response has no Content-Length
+DEFAULT_ESTIMATE = 16 * 1024 * 1024
+
+# How often a blocked reservation re-checks free disk space (seconds)
+POLL_INTERVAL = 5.0
+
+# Give up on a reservation if disk space does not recover within this time
+STALL_TIMEOUT = 30 * 60
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+# =========================================================================== #
+
+"""
+Parse a human-readable byte size
+
+Args:
+    text: Size such as "512M", "2G", "1.5GB" or "1048576"
+
+Returns:
+    Size in bytes
+
+Raises:
+    ValueError: If text is not a valid size
+"""
+def parse_size(text: str) -> int:
+
+    match = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]+)?)\s*([KMGT]?)(?:I?B)?\s*", text.upper())
+    if not match:
+        raise ValueError(f"Invalid size '{text}'. Expected e.g. '512M' or '2G'.")
+
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit])
+
+# =========================================================================== #
+
+"""
+Format a byte count for messages
+
+Args:
+    nbytes: Size in bytes
+
+Returns:
+    Size such as "1.5 GB"
+"""
+def format_size(nbytes: int) -> str:
+
+    size = float(nbytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+# =========================================================================== #
+
+class ByteBudget:
+    """
+    Global budget for bytes that are being downloaded or extracted
+
+    A reservation blocks while the bytes already in flight plus the new
+    request would exceed the limit, or while writing them would leave less
+    than the free-space headroom on the output volume. Blocked reservations
+    resume on their own as other downloads finish or disk space frees up.
+
+    Bytes reported as written (see written()) already show up in the free
+    space of the volume, so the disk check only counts reserved bytes that
+    haven't been written yet. The in-flight limit counts whole reservations.
+    """
+
+    def __init__(self, path: Path, limit: int | None = None, headroom: int = 0,
+                 poll_interval: float = POLL_INTERVAL, stall_timeout: float = STALL_TIMEOUT):
+        self.path = Path(path)
+        self.limit = limit
+        self.headroom = headroom
+        self.poll_interval = poll_interval
+        self.stall_timeout = stall_timeout
+        self.in_flight = 0
+        self.unwritten = 0
+        self._condition = threading.Condition()
+
+    def _free_space(self) -> int:
+        # The output folder may not exist yet, so check the nearest parent that does
+        path = self.path
+        while not path.exists() and path != path.parent:
+            path = path.parent
+        return shutil.disk_usage(path).free
+
+    def _blocked_by(self, nbytes: int) -> str | None:
+        # A single oversized item is admitted once nothing else is in flight
+        if self.limit is not None and self.in_flight > 0 and self.in_flight + nbytes > self.limit:
+            return "in-flight limit"
+
+        free = self._free_space()
+        if free - self.unwritten - nbytes < self.headroom:
+            return f"disk space ({format_size(free)} free)"
+
+        return None
+
+    def try_reserve(self, nbytes: int) -> bool:
+        """Reserve nbytes if they fit right now, without blocking"""
+        with self._condition:
+            if self._blocked_by(nbytes):
+                return False
+            self.in_flight += nbytes
+            self.unwritten += nbytes
+            return True
+
+    def reserve(self, nbytes: int) -> None:
+        """Reserve nbytes, waiting until they fit"""
+        with self._condition:
+            started = time.monotonic()
+            reason = self._blocked_by(nbytes)
+            if reason:
+                print(f"\nWaiting for {format_size(nbytes)} to fit: limited by {reason}")
+
+            while reason:
+                # Disk space is only freed by other downloads or by the user,
+                # so give up if nothing else is running and it never recovers
+                waited = time.monotonic() - started
+                if self.in_flight == 0 and waited >= self.stall_timeout:
+                    raise DiskSpaceError(
+                        f"Not enough disk space for {format_size(nbytes)} in {self.path} "
+                        f"after waiting {int(waited)}s, limited by {reason}"
+                    )
+                self._condition.wait(self.poll_interval)
+                reason = self._blocked_by(nbytes)
+
+            self.in_flight += nbytes
+            self.unwritten += nbytes
+
+    def resize(self, old: int, new: int) -> None:
+        """Replace a reservation once its real size is known, without blocking"""
+        with self._condition:
+            self.in_flight += new - old
+            self.unwritten = max(0, self.unwritten + new - old)
+            if new < old:
+                self._condition.notify_all()
+
+    def written(self, nbytes: int) -> None:
+        """
+        Move reserved bytes that are now on disk out of the disk check.
+        Negative values put back bytes whose file was deleted before the
+        reservation ended (e.g. a failed attempt that will be retried).
+        """
+        with self._condition:
+            self.unwritten = max(0, self.unwritten - nbytes)
+            if nbytes < 0:
+                return
+            self._condition.notify_all()
+
+    def release(self, nbytes: int, written: int = 0) -> None:
+        """
+        Return a reservation and wake up blocked downloads
+
+        Args:
+            nbytes: Size of the reservation
+            written: Bytes of it already reported with written()
+        """
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - nbytes)
+            self.unwritten = max(0, self.unwritten - max(0, nbytes - written))
+            self._condition.notify_all()
+
+# =========================================================================== #
+
+"""
+Estimate the disk space a download needs while it is being processed
+
+ZIP Memories are briefly on disk twice (archive plus extracted copy), and
+their contents barely compress, so they are reserved at twice their size.
+
+Args:
+    content_length: Value of the Content-Length header, or None if missing
+    ext: File extension derived from Content-Type (".jpg", ".zip", ...)
+
+Returns:
+    Estimated peak bytes on disk
+"""
+def estimate_download_bytes(content_length: int | None, ext: str) -> int:
+
+    nbytes = content_length if content_length else DEFAULT_ESTIMATE
+    if ext == ".zip":
+        nbytes *= 2
+    return nbytes
+
+# =========================================================================== #
@@ -0,0 +1,466 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .manifest import Manifest, state_dir
+from .packing import load_pack_index
+from .dependencies import *
+from pathlib import Path
+import subprocess
+import threading
+import hashlib
+import sqlite3
+import math
+import os
+import io
+
+# =========================================================================== #
+
+# Catalog database, kept next to the sync manifest
+CATALOG_NAME = "catalog.sqlite"
+
+# Generated thumbnails, kept next to the catalog
+THUMBS_DIR_NAME = "thumbs"
+
+# Longest side of a thumbnail in pixels
+DEFAULT_THUMB_SIZE = 256
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.32
+
+# Gallery order of the files of a Memory: the first one present is shown
+THUMB_ROLES = ("combined", "main")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    date TEXT,
+    type TEXT,
+    lat REAL,
+    lon REAL,
+    path TEXT,
+    volume TEXT,
+    ext TEXT,
+    bytes INTEGER,
+    sha256 TEXT,
+    duplicate_of TEXT
+);
+CREATE INDEX IF NOT EXISTS memories_date ON memories (date);
+CREATE TABLE IF NOT EXISTS files (
+    memory_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT,
+    volume TEXT,
+    offset INTEGER,
+    PRIMARY KEY (memory_id, path)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS memories_geo USING rtree (
+    id, min_lat, max_lat, min_lon, max_lon
+);
+"""
+
+# =========================================================================== #
+
+"""
+Tell what part of a Memory a file is from its name
+
+Args:
+    path: Memory file; files of extracted ZIP Memories end in -main,
+          -overlay or -combined
+
+Returns:
+    "main", "overlay" or "combined"
+"""
+def file_role(path: Path) -> str:
+
+    for role in ("overlay", "combined"):
+        if path.stem.endswith(f"-{role}"):
+            return role
+    return "main"
+
+# =========================================================================== #
+
+"""
+Describe the files of a Memory for the catalog
+
+Nothing is read back: a plain photo or video is listed with the digest it
+was downloaded with, which identifies its media whatever tags were written
+into it since. Files extracted from a ZIP Memory have no digest of their own.
+
+Args:
+    out_dir: Root output directory
+    path: Memory file, or folder of an extracted ZIP Memory
+    sha256: SHA-256 hex digest of the download, if known
+
+Returns:
+    List of dictionaries with keys role, path (relative to out_dir), size
+    and sha256
+"""
+def describe_files(out_dir: Path, path: Path, sha256: str | None = None) -> list[dict]:
+
+    files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+    return [
+        {
+            "role": file_role(file),
+            "path": Path(os.path.relpath(file, out_dir)).as_posix(),
+            "size": file.stat().st_size,
+            "sha256": None if path.is_dir() else sha256,
+        }
+        for file in files
+        if file.exists()
+    ]
+
+# =========================================================================== #
+
+"""
+Convert a coordinate from the export to a float
+
+Args:
+    value: Decimal degrees as a string, or None
+
+Returns:
+    Float, or None if missing or invalid
+"""
+def _coordinate(value) -> float | None:
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+# =========================================================================== #
+
+class Catalog:
+    """
+    SQLite catalog of the Memories in an output directory
+
+    One row per Memory (date, type, location, download size and digest) and
+    one per file (main, overlay, combined) with its size, download digest
+    (see describe_files) and, for packed output, its volume and offset.
+    Locations are indexed with an R-tree, so place and date lookups are
+    index queries instead of walks over the output tree.
+    """
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = Path(out_dir)
+        self.path = state_dir(out_dir) / CATALOG_NAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Workers share one connection; the lock serialises them
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def __contains__(self, memory_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM memories WHERE id = ?", (memory_id,)).fetchone() is not None
+
+    def add(self, entry: dict, files: list[dict], volume: str | None = None,
+            offsets: dict[str, int] | None = None) -> None:
+        """
+        Insert or replace one Memory and its files
+
+        Args:
+            entry: Manifest entry of the Memory
+            files: File descriptions from describe_files
+            volume: Volume the files were packed into, if any
+            offsets: Data offset within the volume per file path
+        """
+        lat = _coordinate(entry.get("lat"))
+        lon = _coordinate(entry.get("lon"))
+        date = (entry.get("date") or "").replace(" UTC", "").strip() or None
+        offsets = offsets or {}
+
+        with self._lock, self._db:
+            old = self._db.execute("SELECT rowid FROM memories WHERE id = ?", (entry["id"],)).fetchone()
+            if old is not None:
+                self._db.execute("DELETE FROM memories_geo WHERE id = ?", (old[0],))
+            cursor = self._db.execute(
+                "INSERT OR REPLACE INTO memories (rowid, id, date, type, lat, lon, path, volume, "
+                "ext, bytes, sha256, duplicate_of) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (old[0] if old else None, entry["id"], date, entry.get("type"), lat, lon,
+                 entry.get("path"), volume, entry.get("ext"), entry.get("bytes"),
+                 entry.get("sha256"), entry.get("duplicate_of")),
+            )
+            if lat is not None and lon is not None:
+                self._db.execute(
+                    "INSERT INTO memories_geo VALUES (?, ?, ?, ?, ?)",
+                    (cursor.lastrowid, lat, lat, lon, lon),
+                )
+            self._db.execute("DELETE FROM files WHERE memory_id = ?", (entry["id"],))
+            self._db.executemany(
+                "INSERT INTO files (memory_id, role, path, size, sha256, volume, offset) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(entry["id"], file["role"], file["path"], file["size"], file.get("sha256"),
+                  volume, offsets.get(file["path"])) for file in files],
+            )
+
+    def relocate(self, moves: dict[Path, Path]) -> None:
+        """Update stored paths after files were moved by a layout migration"""
+        def relative(path: Path) -> str:
+            return Path(os.path.relpath(path, self.out_dir)).as_posix()
+
+        with self._lock, self._db:
+            for old, new in moves.items():
+                old, new = relative(old), relative(new)
+                self._db.execute("UPDATE memories SET path = ? WHERE path = ?", (new, old))
+                # Files of a ZIP folder move with it
+                self._db.execute(
+                    "UPDATE files SET path = ? || substr(path, ?) WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                    (new, len(old) + 1, old,
+                     old.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%"),
+                )
+
+    def query(self, near: tuple[float, float] | None = None, radius_km: float = 1.0,
+              date_from: str | None = None, date_to: str | None = None,
+              memory_type: str | None = None, limit: int | None = None) -> list[dict]:
+        """
+        Find Memories by place, date range and type, oldest first
+
+        Args:
+            near: (lat, lon) to search around
+            radius_km: Search radius around near
+            date_from: First date to include; a prefix like "2022" or "2022-06"
+            date_to: Last date to include; prefixes include the whole period
+            memory_type: "Image" or "Video"
+            limit: Maximum number of results
+
+        Returns:
+            List of Memory rows, each with a "files" list and, for place
+            searches, "distance_km"
+        """
+        sql = "SELECT m.* FROM memories m"
+        where = []
+        params = []
+        if near is not None:
+            # Bounding box from the R-tree; exact distance is checked below
+            lat, lon = near
+            dlat = radius_km / KM_PER_DEGREE
+            dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+            sql += " JOIN memories_geo g ON g.id = m.rowid"
+            where.append("g.min_lat >= ? AND g.max_lat <= ? AND g.min_lon >= ? AND g.max_lon <= ?")
+            params += [lat - dlat, lat + dlat, lon - dlon, lon + dlon]
+        if date_from:
+            where.append("m.date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("substr(m.date, 1, ?) <= ?")
+            params += [len(date_to), date_to]
+        if memory_type:
+            where.append("m.type = ?")
+            params.append(memory_type)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY m.date"
+        if limit and near is None:
+            sql += f" LIMIT {int(limit)}"
+
+        with self._lock:
+            rows = [dict(row) for row in self._db.execute(sql, params)]
+
+        if near is not None:
+            for row in rows:
+                row["distance_km"] = haversine_km(near, (row["lat"], row["lon"]))
+            rows = [row for row in rows if row["distance_km"] <= radius_km][:limit or None]
+
+        with self._lock:
+            for row in rows:
+                owner = row["duplicate_of"] or row["id"]
+                row["files"] = [dict(file) for file in self._db.execute(
+                    "SELECT * FROM files WHERE memory_id = ? ORDER BY role", (owner,)
+                )]
+        return rows
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+# =========================================================================== #
+
+"""
+Great-circle distance between two points
+
+Args:
+    a: (lat, lon) in degrees
+    b: (lat, lon) in degrees
+
+Returns:
+    Distance in kilometres
+"""
+def haversine_km(a: tuple[float, float], b: tuple[float, float]) -> float:
+
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+# =========================================================================== #
+
+"""
+Fill the catalog from the manifest and pack indexes of an existing output
+
+Used for output written before the catalog existed, or after files were
+changed outside of a run.
+
+Args:
+    out_dir: Root output directory
+    catalog: Catalog to fill
+
+Returns:
+    Number of Memories cataloged
+"""
+def rebuild_catalog(out_dir: Path, catalog: Catalog) -> int:
+
+    out_dir = Path(out_dir)
+    manifest = Manifest(out_dir)
+
+    # Packed files are listed by their volume's index
+    packed = {}
+    for name, member in load_pack_index(out_dir).items():
+        packed.setdefault(member["id"], []).append(member)
+
+    count = 0
+    for entry in manifest.entries.values():
+        if "duplicate_of" in entry:
+            catalog.add(entry, [])
+        elif entry.get("packed"):
+            members = packed.get(entry["id"], [])
+            sha256 = entry.get("sha256") if entry.get("ext") != ".zip" else None
+            files = [
+                {"role": file_role(Path(member["name"])), "path": member["name"], "size": member["size"],
+                 "sha256": sha256}
+                for member in members
+            ]
+            catalog.add(entry, files, entry["packed"],
+                        {member["name"]: member["offset"] for member in members})
+        else:
+            path = manifest.resolve(entry)
+            if not path.exists():
+                continue
+            catalog.add(entry, describe_files(out_dir, path, entry.get("sha256")))
+        count += 1
+    return count
+
+# =========================================================================== #
+
+"""
+Pick the file shown for a Memory in a gallery
+
+Args:
+    row: Memory row from Catalog.query
+
+Returns:
+    File row, or None if the Memory has no file to show
+"""
+def thumbnail_source(row: dict) -> dict | None:
+
+    by_role = {file["role"]: file for file in row["files"]}
+    return next((by_role[role] for role in THUMB_ROLES if role in by_role), None)
+
+# =========================================================================== #
+
+"""
+Get the thumbnail of a file, generating it on first use
+
+Photos are decoded with Pillow's draft mode, which lets the JPEG decoder
+scale down by up to 8x while decoding. Videos use a single ffmpeg frame.
+Packed files are read straight from their volume.
+
+Args:
+    out_dir: Root output directory
+    file: File row from Catalog.query
+    size: Longest side of the thumbnail in pixels
+
+Returns:
+    Path of the cached thumbnail
+
+Raises:
+    DependencyError: If ffmpeg is needed for a video and not found
+    OSError: If the file cannot be read or decoded; Pillow raises its own
+        errors for some damaged or oversized images
+"""
+def make_thumbnail(out_dir: Path, file: dict, size: int = DEFAULT_THUMB_SIZE) -> Path:
+
+    from PIL import Image
+
+    out_dir = Path(out_dir)
+    key = file["sha256"] or hashlib.sha256(f"{file['memory_id']}/{file['role']}".encode()).hexdigest()
+    thumb = state_dir(out_dir) / THUMBS_DIR_NAME / key[:2] / f"{key}-{size}.jpg"
+    if thumb.exists():
+        return thumb
+    thumb.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = thumb.with_name(f"{thumb.name}.{threading.get_ident()}.tmp")
+
+    if Path(file["path"]).suffix.lower() == ".mp4":
+        if file["volume"]:
+            # ffmpeg reads the byte range out of the volume itself
+            source = (f"subfile,,start,{file['offset']},end,{file['offset'] + file['size']},,:"
+                      f"{out_dir / file['volume']}")
+        else:
+            source = str(out_dir / file["path"])
+        cmd = [
+            find_dependency("ffmpeg"), "-v", "error", "-y", "-i", source, "-frames:v", "1",
+            "-vf", f"scale={size}:{size}:force_original_aspect_ratio=decrease",
+            "-f", "image2", "-c:v", "mjpeg", str(tmp_path),
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0 or not tmp_path.exists():
+            raise OSError(f"ffmpeg could not read a frame: {result.stderr.strip()}")
+    else:
+        if file["volume"]:
+            with open(out_dir / file["volume"], "rb") as f:
+                f.seek(file["offset"])
+                source = io.BytesIO(f.read(file["size"]))
+        else:
+            source = out_dir / file["path"]
+        with Image.open(source) as image:
+            image.draft("RGB", (size, size))
+            image.thumbnail((size, size))
+            image.convert("RGB").save(tmp_path, "JPEG", quality=80)
+
+    tmp_path.replace(thumb)
+    return thumb
+
+# =========================================================================== #
+
+"""
+Make thumbnails for query results in parallel
+
+Args:
+    out_dir: Root output directory
+    rows: Memory rows from Catalog.query
+    size: Longest side of the thumbnails in pixels
+    workers: Number of thumbnails generated concurrently
+
+Returns:
+    Tuple of (dictionary of Memory ID -> thumbnail path, list of
+    (Memory ID, problem) failures)
+"""
+def make_thumbnails(out_dir: Path, rows: list[dict], size: int = DEFAULT_THUMB_SIZE,
+                    workers: int = 4) -> tuple[dict[str, Path], list[tuple[str, str]]]:
+
+    thumbs = {}
+    failures = []
+    # Pillow and ffmpeg decode outside the GIL, so threads scale here
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {}
+        for row in rows:
+            source = thumbnail_source(row)
+            if source is not None:
+                futures[executor.submit(make_thumbnail, out_dir, source, size)] = row["id"]
+        for future in as_completed(futures):
+            try:
+                thumbs[futures[future]] = future.result()
+            except Exception as e:
+                # Pillow rejects damaged or oversized images with its own
+                # errors (DecompressionBombError, SyntaxError, ...); each one
+                # fails only its thumbnail
+                failures.append((futures[future], str(e) or type(e).__name__))
+    return thumbs, failures
+
+# =========================================================================== #
@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from .governor import MemoryGovernor
+from .budget import ByteBudget
+from .manifest import Manifest
+from .blobstore import BlobStore
+from .packing import Packer
+from .catalog import Catalog
+from .verify import ChecksumManifest
+from .scheduling import ProgressETA
+from pathlib import Path
+
+# =========================================================================== #
+
+# Defaults match the original behaviour of running next to the export file
+DEFAULT_INPUT = Path("./memories_history.html")
+DEFAULT_OUTPUT = Path("./memories")
+
+# =========================================================================== #
+
+@dataclass
+class RunConfig:
+    """Settings shared by the download and post-processing stages"""
+
+    # Directory that downloaded Memories are written to
+    out_dir: Path = DEFAULT_OUTPUT
+
+    # Number of Memories downloaded and processed concurrently
+    workers: int = 1
+
+    # Attempts per Memory and pause between them (seconds)
+    max_retries: int = 3
+    retry_delay: float = 2
+
+    # How Memories are spread over subfolders of out_dir (see layout.LAYOUTS)
+    layout: str = "flat"
+
+    # Limits bytes downloaded or extracted at once and waits for disk space.
+    # None disables both checks
+    budget: ByteBudget | None = None
+
+    # Admits overlay merges only while their estimated peak memory fits.
+    # None runs merges without a limit
+    merge_governor: MemoryGovernor | None = None
+
+    # Completed Memories are recorded here for incremental sync. None skips
+    # the bookkeeping
+    manifest: Manifest | None = None
+
+    # Keeps tagged files hardlinked to the output and reuses them and overlay
+    # merges across identical Memories. None stores files directly
+    store: BlobStore | None = None
+
+    # Moves finished Memories into rolling archive volumes with a sidecar
+    # index. None leaves them as loose files
+    packer: Packer | None = None
+
+    # Completed Memories and their files are added here for place and date
+    # queries. None skips the catalog
+    catalog: Catalog | None = None
+
+    # Files left exactly as downloaded are recorded here with their streaming
+    # digest, so verify doesn't hash them again. None skips the record
+    checksums: ChecksumManifest | None = None
+
+    # Completed share and ETA shown with each status line. None shows only
+    # the Memory count
+    progress: ProgressETA | None = None
+
+# =========================================================================== #
@@ -1,14 +1,215 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .media_processing import *
 from .exceptions import *
+from .config import RunConfig
+from .layout import memory_dir, memory_name
+from .budget import *
+from .metrics import METRICS
+from . import profiling
 from pathlib import Path
 from .metadata import *
-import requests
+from .identity import memory_id
+from .manifest import Manifest
+from .blobstore import *
+from .catalog import describe_files
+import threading
+import zipfile
+import sqlite3
+import hashlib
 import shutil
 import time
 import os
 
 # =========================================================================== #
 
+# Read size for response bodies. A 200 MB video takes 200 reads instead of
+# 25,000 with 8 KB chunks; smaller bodies simply return short reads.
+STREAM_BUFFER_SIZE = 1024 * 1024
+
+# One reusable buffer per download thread
+_stream_buffers = threading.local()
+
+# =========================================================================== #
+
+"""
+Reserve a file's full size on disk before writing it, so large downloads
+aren't fragmented across the volume. Ignored where unsupported.
+
+Args:
+    f: File opened for writing
+    size: Expected size in bytes, or None if unknown
+
+Returns:
+    True if the space was allocated
+"""
+def preallocate(f, size: int | None) -> bool:
+
+    if not size or not hasattr(os, "posix_fallocate"):
+        return False
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except OSError:
+        # Not supported by the filesystem (e.g. some network mounts)
+        return False
+    return True
+
+# =========================================================================== #
+
+"""
+Stream a response body to a file, hashing it on the way
+
+Bodies are read straight into a reusable buffer (readinto), written and
+hashed from the same memory, so no per-chunk bytes objects are created.
+Content-encoded responses need decoding and go through requests instead.
+
+Args:
+    r: Streaming requests Response
+    f: File opened for binary writing
+    content_length: Expected body size, used to preallocate the file
+    buffer_size: Bytes read at a time
+    on_disk: Called with the number of bytes the file newly takes up on
+             disk: the preallocated size up front, otherwise each chunk
+             as it is written (see ByteBudget.written)
+
+Returns:
+    Tuple of (bytes written, SHA-256 hex digest)
+
+Raises:
+    IncompleteDownloadError: If the connection breaks mid-body
+"""
+def stream_to_file(r, f, content_length: int | None = None,
+                   buffer_size: int = STREAM_BUFFER_SIZE, on_disk=None) -> tuple[int, str]:
+
+    import urllib3
+
+    digest = hashlib.sha256()
+    written = 0
+    allocated = preallocate(f, content_length)
+    if allocated and on_disk is not None:
+        on_disk(content_length)
+    # Chunks only need reporting when the space wasn't allocated up front
+    report = on_disk if not allocated else None
+
+    try:
+        if r.headers.get("Content-Encoding", "identity").lower() != "identity":
+            for chunk in r.iter_content(chunk_size=buffer_size):
+                f.write(chunk)
+                digest.update(chunk)
+                written += len(chunk)
+                if report is not None:
+                    report(len(chunk))
+        else:
+            buffer = getattr(_stream_buffers, "buffer", None)
+            if buffer is None or len(buffer) != buffer_size:
+                buffer = _stream_buffers.buffer = memoryview(bytearray(buffer_size))
+            while True:
+                n = r.raw.readinto(buffer)
+                if not n:
+                    break
+                chunk = buffer[:n]
+                f.write(chunk)
+                digest.update(chunk)
+                written += n
+                if report is not None:
+                    report(n)
+    except urllib3.exceptions.HTTPError as e:
+        raise IncompleteDownloadError(f"Connection broke after {written} bytes: {e}")
+    finally:
+        # Preallocation sized the file up front; cut it back to what arrived
+        if content_length and written < content_length:
+            f.truncate(written)
+            if allocated and on_disk is not None:
+                on_disk(written - content_length)
+
+    return written, digest.hexdigest()
+
+# =========================================================================== #
+
+"""
+Get the total uncompressed size of a ZIP archive without extracting it
+
+Args:
+    filepath: Path to ZIP file
+
+Returns:
+    Sum of the uncompressed sizes of all members, or 0 if unreadable
+"""
+def zip_extracted_size(filepath: Path) -> int:
+
+    try:
+        with zipfile.ZipFile(filepath) as archive:
+            return sum(info.file_size for info in archive.infolist())
+    except (OSError, zipfile.BadZipFile):
+        return 0
+
+# =========================================================================== #
+
+"""
+Get the file extension for a download's Content-Type
+
+Args:
+    content_type: Content-Type header value
+
+Returns:
+    ".jpg", ".png", ".mp4" or ".zip", or None for unknown types
+"""
+def content_type_ext(content_type: str) -> str | None:
+
+    content_type = content_type.lower()
+    if "jpg" in content_type:
+        return ".jpg"
+    if "png" in content_type:
+        return ".png"
+    if "mp4" in content_type:
+        return ".mp4"
+    if "zip" in content_type:
+        return ".zip"
+    return None
+
+# =========================================================================== #
+
+"""
+Merge a main file with its overlay, or reuse the merge of an identical archive
+
+Combined files are only stored once tagged (see tag_with_store), so a stored
+merge of the same archive carries another Memory's metadata; the caller tags
+the returned file again, and the same Memory saved under several timestamps
+is merged only once.
+
+Args:
+    merge: merge_jpg_with_overlay or merge_mp4_with_overlay
+    main_path: Main file (ends with "-main.jpg"/"-main.mp4")
+    png_path: Overlay PNG
+    governor: Optional memory governor passed on to the merge
+    store: Optional blob store; without it the merge always runs
+    digest: SHA-256 hex digest of the archive the files came from
+
+Returns:
+    Path to the combined file
+"""
+def merge_with_store(merge, main_path: Path, png_path: Path, governor: MemoryGovernor | None,
+                     store: BlobStore | None, digest: str | None) -> Path:
+
+    if store is None or digest is None:
+        return merge(main_path, png_path, governor)
+
+    ext = main_path.suffix
+    cached = store.find(digest, ext, prefix="combined-")
+    if cached is None:
+        return merge(main_path, png_path, governor)
+
+    combined_path = main_path.parent / main_path.name.replace(f"-main{ext}", f"-combined{ext}")
+    store.materialise(cached, combined_path)
+    METRICS.add("merges_reused")
+    # Same as a completed merge: the overlay is baked into the combined file
+    try:
+        os.remove(png_path)
+    except OSError as e:
+        print(f"Warning: Could not delete overlay PNG {png_path.name}: {e}")
+    return combined_path
+
+# =========================================================================== #
+
 """
 Extract files from a ZIP folder and process Snapchat memory files
 
@@ -16,19 +217,26 @@ Args:
     filepath: Path to ZIP file
     name: Base name for files (datetime string without extension)
     memory: Memory dictionary with keys: date, type, lat, lon, url
+    governor: Optional memory governor passed on to the overlay merges
+    store: Optional blob store; tagged files and overlay merges of an archive
+           with the same digest are reused from it instead of being redone
+    digest: SHA-256 hex digest of the downloaded archive (needed with store)
 
 Raises:
     FileNotFoundError: If ZIP file doesn't exist
-    ZipExtractionError: If extraction or processing fails
+    ZipExtractionError: If extraction or processing fails, or a file could
+                        not be tagged
 """
-def handle_zip(filepath: Path, name: str, memory: dict[str, str, str, str, str]) -> None:
+def handle_zip(filepath: Path, name: str, memory: dict[str, str, str, str, str],
+               governor: MemoryGovernor | None = None, store: BlobStore | None = None,
+               digest: str | None = None) -> None:
 
     if not filepath.exists():
         raise FileNotFoundError(f"ZIP file not found: {filepath}")
 
 
-    # Create folder path for extracted files
-    new_folder = Path(f"./memories/{name}")
+    # Extract next to the archive so the folder lands in the run's output tree
+    new_folder = filepath.parent / name
 
     if new_folder.exists():
         print(f"Folder already exists: {new_folder.name}, skipping extraction")
@@ -41,7 +249,8 @@ def handle_zip(filepath: Path, name: str, memory: dict[str, str, str, str, str])
 
     # Extract ZIP
     try:
-        shutil.unpack_archive(filepath, new_folder)
+        with METRICS.stage("unzip"):
+            shutil.unpack_archive(filepath, new_folder)
     except Exception as e:
         # Cleanup and remove partial extraction if fail
         try:
@@ -109,6 +318,16 @@ def handle_zip(filepath: Path, name: str, memory: dict[str, str, str, str, str])
         lat = memory["lat"]
         lon = memory["lon"]
 
+        # Tag a file, keeping the result in the store under its role
+        untagged = []
+        def tag(path: Path, role: str) -> None:
+            if store is None or digest is None:
+                tagged = write_exif(path, date_str, lat, lon)
+            else:
+                tagged = tag_with_store(path, memory, digest, store, role)
+            if not tagged:
+                untagged.append(path.name)
+
         # Make sure valid metadata
         if not date_str:
             raise ValueError("Date string not found in Memory {filepath.name}.")
@@ -119,12 +338,14 @@ def handle_zip(filepath: Path, name: str, memory: dict[str, str, str, str, str])
         if main_mp4 and main_mp4.exists():
             try:
                 # Tag original MP4
-                write_exif(main_mp4, date_str, lat, lon)
+                tag(main_mp4, "main")
 
                 if overlay_png and overlay_png.exists():
                     try:
-                        combined_path = merge_mp4_with_overlay(main_mp4, overlay_png)
-                        write_exif(combined_path, date_str, lat, lon)
+                        combined_path = merge_with_store(
+                            merge_mp4_with_overlay, main_mp4, overlay_png, governor, store, digest
+                        )
+                        tag(combined_path, "combined")
                     except VideoProcessingError as e:
                         # Check if it's a HEVC decoder issue
                         if "hevc" in str(e).lower() and "decoder" in str(e).lower():
@@ -143,12 +364,14 @@ def handle_zip(filepath: Path, name: str, memory: dict[str, str, str, str, str])
         if main_jpg and main_jpg.exists():
             try:
                 # Tag original JPG
-                write_exif(main_jpg, date_str, lat, lon)
+                tag(main_jpg, "main")
 
                 if overlay_png and overlay_png.exists():
                     try:
-                        combined_path = merge_jpg_with_overlay(main_jpg, overlay_png)
-                        write_exif(combined_path, date_str, lat, lon)
+                        combined_path = merge_with_store(
+                            merge_jpg_with_overlay, main_jpg, overlay_png, governor, store, digest
+                        )
+                        tag(combined_path, "combined")
                     except ImageProcessingError as e:
                         print(f"Warning: Failed to merge JPG with overlay: {e}")
                     except Exception as e:
@@ -164,6 +387,10 @@ def handle_zip(filepath: Path, name: str, memory: dict[str, str, str, str, str])
         except Exception as e:
             print(f"Warning: Could not set folder timestamp: {e}")
 
+        # Left for reprocess, like a failed merge, but reported as unfinished
+        if untagged:
+            raise ZipExtractionError(f"exiftool failed for {', '.join(untagged)}")
+
     except ZipExtractionError:
         # Re-raise our custom errors
         raise
@@ -174,161 +401,547 @@ def handle_zip(filepath: Path, name: str, memory: dict[str, str, str, str, str])
 # =========================================================================== #
 
 """
-Download Memories that are provided in list of dictionaries. Call subfunctions
-to handle metadata writing.
+Tag a downloaded file, or reuse an identical file tagged with the same metadata
+
+Only the tagged file is stored, linked to the output file, keyed by the
+download's digest and the metadata written into it.
 
 Args:
-    memories: List of Memory dictionaries with keys: date, type, lat, lon, url
+    filepath: Downloaded photo or video, or a file extracted from a ZIP Memory
+    memory: Memory dictionary with keys: date, type, lat, lon, url
+    sha256: Hex digest of the downloaded content (the archive for ZIP Memories)
+    store: Blob store holding tagged files from earlier Memories
+    role: Which file of a ZIP Memory this is ("main" or "combined"), empty
+          for plain downloads
+
+Returns:
+    True if the file is tagged, False if exiftool failed
 
 Raises:
-    DownloadError: If download fails
-    NetworkError: If network connection fails
+    Same as write_exif
 """
-def memory_download(memories: list[dict[str, str, str, str, str]]) -> None:
+def tag_with_store(filepath: Path, memory: dict[str, str, str, str, str],
+                   sha256: str, store: BlobStore, role: str = "") -> bool:
+
+    tag = metadata_tag(memory)
+    if role:
+        tag = f"{role}-{tag}"
+    tagged = store.get(sha256, filepath.suffix, tag)
+    if tagged is not None:
+        store.materialise(tagged, filepath)
+        METRICS.add("tags_reused")
+        return True
+
+    if not write_exif(filepath, memory["date"], memory["lat"], memory["lon"]):
+        return False
+    store.put(filepath, sha256, filepath.suffix, tag)
+    return True
 
-    total_files = len(memories)
-    if not memories or total_files <= 0:
-        print("No memories to download.")
-        return
+# =========================================================================== #
 
-    print(f"\nStarting download of {total_files} memories...\n")
+# Serialises choosing final file names, so two workers never claim the same one
+_place_lock = threading.Lock()
+
+"""
+Move a finished download to its final name, resolving name collisions by content
+
+Memories from different exports can share a timestamp and so a file name. If
+the name is taken by a file with the same content (SHA-256 as downloaded),
+the download is a duplicate and is discarded; otherwise it gets the first
+free suffixed name (name_2, name_3, ...). Only a name collision triggers the
+comparison: the same content under another name belongs to a Memory with a
+different date and is tagged with it, so it is always kept.
+
+Args:
+    part_path: Completed temporary download
+    memory: Memory dictionary with keys: date, type, lat, lon, url
+    out_dir: Folder the Memory belongs in
+    name: Base name for the Memory (datetime string without extension)
+    ext: File extension including the dot
+    sha256: Hex digest of the downloaded content
+    manifest: Manifest holding digests of earlier downloads, or None to
+              always keep both files
+    packed: Names recorded in the manifest count as taken even when their
+            files are gone (they were moved into an archive volume)
+
+Returns:
+    Tuple of (base name the file was saved under or duplicates, whether it
+    was a duplicate and part_path was removed)
+"""
+def place_download(part_path: Path, memory: dict[str, str, str, str, str], out_dir: Path,
+                   name: str, ext: str, sha256: str, manifest: Manifest | None,
+                   packed: bool = False) -> tuple[str, bool]:
+
+    def taken(candidate: str, recorded: Path) -> bool:
+        if (out_dir / f"{candidate}{ext}").exists() or (out_dir / candidate).exists():
+            return True
+        return packed and manifest is not None and manifest.owner_of(recorded) is not None
+
+    with _place_lock:
+        candidate = name
+        suffix = 1
+        # ZIP Memories are recorded by their extracted folder
+        while taken(candidate, recorded := out_dir / (candidate if ext == ".zip" else f"{candidate}{ext}")):
+            if manifest is not None and manifest.digest_at(recorded) == sha256:
+                part_path.unlink()
+                return candidate, True
+            suffix += 1
+            candidate = f"{name}_{suffix}"
+
+        part_path.replace(out_dir / f"{candidate}{ext}")
+        if manifest is not None:
+            manifest.claim(memory, out_dir / (candidate if ext == ".zip" else f"{candidate}{ext}"), sha256)
+
+    return candidate, False
+
+# =========================================================================== #
+
+"""
+Add a completed Memory to the run's catalog. A catalog that cannot be
+written only costs the Memory its catalog row, never the download.
+
+Args:
+    config: Run settings with a catalog
+    entry: Manifest entry of the Memory
+    path: File or ZIP folder to describe when files is None
+    files: File descriptions from describe_files
+    volume: Volume the files were packed into, if any
+    offsets: Data offset within the volume per file path
+"""
+def catalog_memory(config: RunConfig, entry: dict, path: Path | None = None,
+                   files: list[dict] | None = None, volume: str | None = None,
+                   offsets: dict[str, int] | None = None) -> None:
 
-    # Create output directory
-    out_dir = Path("./memories")
     try:
-        out_dir.mkdir(parents=True, exist_ok=True)
-    except OSError as e:
-        raise DownloadError(f"Failed to create output directory: {e}")
+        if files is None:
+            files = describe_files(config.out_dir, path, entry.get("sha256")) if path is not None else []
+        with METRICS.stage("catalog"):
+            config.catalog.add(entry, files, volume, offsets)
+    except (OSError, sqlite3.Error) as e:
+        print(f"\nCould not add {entry['path']} to the catalog: {e}\n")
 
-    download_count = 0
-    failed_downloads = []
+# =========================================================================== #
 
-    # Logic to begin downloading begins here
-    for idx, memory in enumerate(memories):
+"""
+Download a single Memory with retries, then tag or extract it. Timings,
+bytes and retries are recorded in the run metrics under the Memory's index.
 
-        url = memory["url"]
-        date_str = memory["date"]
-        lat = memory["lat"]
-        lon = memory["lon"]
+Args:
+    idx: Position of the Memory in the download queue (used for messages)
+    memory: Memory dictionary with keys: date, type, lat, lon, url
+    total_files: Total number of Memories in this run
+    config: Run settings (output directory, layout, budgets and manifest)
 
-        if not url:
-            print(f"\nMemory {idx}: No download URL, skipping")
-            failed_downloads.append((idx, "No URL"))
-            continue
+Returns:
+    None if the Memory was downloaded (or already present), otherwise a short
+    reason describing why it failed
+"""
+def download_memory(idx: int, memory: dict[str, str, str, str, str],
+                    total_files: int, config: RunConfig) -> str | None:
+
+    name = memory.get("date") or ""
+    with METRICS.item(idx, name) as record, \
+            profiling.span("memory", cat="memory", index=idx, date=name), \
+            profiling.profiled():
+        reason = _download_memory(idx, memory, total_files, config)
+
+        record.setdefault("status", "ok" if reason is None else "failed")
+        if reason is not None:
+            record["reason"] = reason
+
+    METRICS.add("memories_ok" if reason is None else "memories_failed")
+    if config.progress is not None:
+        # Files already on disk cost a request at most, far below their estimate
+        if record["status"] == "exists":
+            config.progress.skip(idx)
+        else:
+            config.progress.finish(idx)
+    return reason
 
-        if not date_str:
-            print(f"\nMemory {idx}: No date, skipping")
-            failed_downloads.append((idx, "No date"))
-            continue
-        try:
-            # Format: "2025-12-09 11:10:51 UTC" -> "2025-12-09-111051"
-            name = date_str.replace(" ", "-")[:-4]
-            name = name.replace(":", "")
-        except Exception as e:
-            print(f"\nMemory {idx}: Invalid date format '{date_str}', skipping")
-            failed_downloads.append((idx, f"Invalid date: {e}"))
-            continue
+# =========================================================================== #
+
+def _download_memory(idx: int, memory: dict[str, str, str, str, str],
+                     total_files: int, config: RunConfig) -> str | None:
+
+    # Imported here so a run that stops at a parse error never loads requests
+    import requests
+
+    url = memory["url"]
+    date_str = memory["date"]
+    lat = memory["lat"]
+    lon = memory["lon"]
 
-        # Implement retries if a download fails
-        max_retries = 3
-        retry_delay = 2 # seconds
+    if not url:
+        print(f"\nMemory {idx}: No download URL, skipping")
+        return "No URL"
 
+    if not date_str:
+        print(f"\nMemory {idx}: No date, skipping")
+        return "No date"
+    try:
+        # Format: "2025-12-09 11:10:51 UTC" -> "2025-12-09-111051"
+        name = memory_name(date_str)
+    except Exception as e:
+        print(f"\nMemory {idx}: Invalid date format '{date_str}', skipping")
+        return f"Invalid date: {e}"
+
+    # Folder for this Memory within the configured output layout
+    try:
+        out_dir = memory_dir(config.out_dir, name, config.layout)
+    except ValueError as e:
+        print(f"\nMemory {idx}: {e}, skipping")
+        return str(e)
+
+    # Packed Memories leave no file behind to find, only their manifest entry,
+    # whether or not this run packs too
+    if config.manifest is not None:
+        entry = config.manifest.get(memory)
+        if entry is not None and entry.get("packed"):
+            print(f"\nMemory {idx}: Already packed in {entry['packed']}, skipping\n")
+            METRICS.annotate(status="exists")
+            return None
+
+    # Implement retries if a download fails
+    max_retries = config.max_retries
+    retry_delay = config.retry_delay # seconds
+    reason = None
+
+    budget = config.budget
+    reserved = 0
+    # Bytes of the reservation on disk by now, so they are charged only once
+    on_disk = 0
+
+    def charge(nbytes: int) -> None:
+        nonlocal on_disk
+        on_disk += nbytes
+        budget.written(nbytes)
+
+    try:
         for attempt in range(0, max_retries):
+            last_attempt = attempt == max_retries - 1
             try:
-                print(f"\rDownloading {idx + 1}/{total_files}: {name}...", end="", flush=True)
+                progress = f" ({config.progress.describe()})" if config.progress is not None else ""
+                print(f"\rDownloading {idx + 1}/{total_files}: {name}...{progress}", end="", flush=True)
 
-                with requests.get(url, stream=True, timeout=30) as r:
+                with METRICS.stage("http_ttfb"):
+                    r = requests.get(url, stream=True, timeout=30)
+                with r:
                     r.raise_for_status() # Raise exception for 4xx/5xx status codes
 
                     # Determine file extension from Content-Type header
                     content_type = r.headers.get("Content-Type", "").lower()
-                    if "jpg" in content_type:
-                        ext = ".jpg"
-                    elif "png" in content_type:
-                        ext = ".png"
-                    elif "mp4" in content_type:
-                        ext = ".mp4"
-                    elif "zip" in content_type:
-                        ext = ".zip"
-                    else:
+                    ext = content_type_ext(content_type)
+                    if ext is None:
                         print(f"Memory {idx}: Unknown file type '{content_type}', skipping\n")
-                        failed_downloads.append((idx, f"Unknown type: {content_type}"))
-                        break
+                        return f"Unknown type: {content_type}"
+
+                    METRICS.annotate(type=ext)
 
                     filepath = out_dir / f"{name}{ext}"
                     filepath_no_ext = out_dir / name
 
                     if filepath.exists() or filepath_no_ext.exists():
-                        print(f"\nMemory {idx}: File already exists, skipping\n")
-                        download_count += 1
-                        break
+                        existing = filepath if filepath.exists() else filepath_no_ext
+                        owner = None
+                        if config.manifest is not None:
+                            owner = config.manifest.owner_of(filepath) or config.manifest.owner_of(filepath_no_ext)
+
+                        # A different Memory with the same timestamp (e.g. from another
+                        # account's export) is downloaded and compared by content below
+                        if owner is None or owner["id"] == memory_id(memory):
+                            print(f"\nMemory {idx}: File already exists, skipping\n")
+                            METRICS.annotate(status="exists")
+                            # Adopt files from earlier runs so the next sync skips them
+                            if config.manifest is not None and config.manifest.get(memory) is None:
+                                config.manifest.record(memory, existing, ext=ext, adopted=True)
+                            if config.catalog is not None and config.manifest is not None \
+                                    and memory_id(memory) not in config.catalog:
+                                catalog_memory(config, config.manifest.get(memory), existing)
+                            return None
 
                     try:
-                        with open(filepath, 'wb') as f:
-                            for chunk in r.iter_content(chunk_size=8192): # 8 KB chunks
-                                if chunk: # filter out keep-alive new chunks
-                                    f.write(chunk)
+                        out_dir.mkdir(parents=True, exist_ok=True)
+                    except OSError as e:
+                        raise DownloadError(f"Failed to create folder {out_dir}: {e}")
+
+                    content_length = r.headers.get("Content-Length")
+                    content_length = int(content_length) if content_length and content_length.isdigit() else None
+                    # Compressed transfers are decoded, so their length can't be compared
+                    if r.headers.get("Content-Encoding", "identity").lower() != "identity":
+                        content_length = None
+
+                    # Hold disk space for this Memory until it is fully processed.
+                    # Kept across retries so a retry never waits behind new work.
+                    if budget is not None and not reserved:
+                        estimate = estimate_download_bytes(content_length, ext)
+                        budget.reserve(estimate)
+                        reserved = estimate
+
+                    # Write to a temporary name so an interrupted download is never
+                    # mistaken for a finished one by the exists() check above. The
+                    # thread ID keeps workers sharing a file name apart.
+                    part_path = filepath.with_name(f"{filepath.name}.{threading.get_ident()}.part")
+                    try:
+                        with METRICS.stage("transfer"), open(part_path, 'wb') as f:
+                            written, sha256 = stream_to_file(
+                                r, f, content_length, on_disk=charge if budget is not None else None
+                            )
+                        METRICS.add("bytes_downloaded", written)
+                        if part_path.stat().st_size == 0:
+                            raise DownloadError("Downloaded file is empty\n")
+                        if content_length is not None and written != content_length:
+                            raise IncompleteDownloadError(
+                                f"Received {written} of {content_length} bytes"
+                            )
+
+                        placed, duplicate = place_download(
+                            part_path, memory, out_dir, name, ext, sha256, config.manifest,
+                            packed=config.packer is not None,
+                        )
+                        if placed != name:
+                            name = placed
+                            filepath = out_dir / f"{name}{ext}"
+                            filepath_no_ext = out_dir / name
+                            if not duplicate:
+                                print(f"\nMemory {idx}: Name taken by a different Memory, saving as {name}\n")
+                        if duplicate:
+                            print(f"\nMemory {idx}: Same content as {name}, skipping\n")
+                            METRICS.annotate(status="duplicate")
+                            METRICS.add("duplicates")
+                            existing = filepath_no_ext if ext == ".zip" else filepath
+                            owner = config.manifest.owner_of(existing)
+                            entry = config.manifest.record(
+                                memory, existing, ext=ext, sha256=sha256,
+                                duplicate_of=owner["id"] if owner else None,
+                            )
+                            if config.catalog is not None:
+                                catalog_memory(config, entry)
+                            return None
+                        # Tells afterwards whether post-processing rewrote the file
+                        downloaded = filepath.stat()
                     except OSError as e:
                         raise DownloadError(f"Failed to write file: {e}")
+                    finally:
+                        if part_path.exists():
+                            size = part_path.stat().st_size
+                            part_path.unlink()
+                            # A retry writes these bytes again
+                            if budget is not None and reserved:
+                                charge(-min(size, on_disk))
 
                     if not filepath.exists() or filepath.stat().st_size == 0:
                         raise DownloadError("Downloaded file is empty or missing\n")
 
+                # Replace the ZIP estimate with archive plus real extracted size
+                if budget is not None and ext == ".zip":
+                    actual = filepath.stat().st_size + zip_extracted_size(filepath)
+                    budget.resize(reserved, actual)
+                    reserved = actual
+
 
                 # Process the downloaded file
+                postprocess_error = None
                 try:
+                    tagged = True
                     if ext == ".zip":
-                        handle_zip(filepath, name, memory)
+                        with profiling.span("handle_zip"):
+                            handle_zip(filepath, name, memory, config.merge_governor,
+                                       config.store, sha256)
+                    elif config.store is not None:
+                        tagged = tag_with_store(filepath, memory, sha256, config.store)
                     else:
-                        write_exif(filepath, date_str, lat, lon)
+                        tagged = write_exif(filepath, date_str, lat, lon)
+                    # Recorded like any other post-processing failure for reprocess
+                    if not tagged:
+                        raise MemorEasyError(f"exiftool failed for {filepath.name}")
 
                 except Exception as e:
                     print(f"\nMemory {idx}: Post-processing failed: {e}\n")
+                    postprocess_error = str(e)
+
+                # Extracted and merged files are on disk now too
+                if budget is not None and reserved > on_disk:
+                    charge(reserved - on_disk)
+
+                # Memories that failed post-processing stay loose for reprocess
+                target = filepath_no_ext if ext == ".zip" else filepath
+
+                # exiftool and the store replace the file they write; one still
+                # holding the streamed bytes needs no hashing when verified.
+                # Successfully tagged files never qualify and are hashed by verify
+                if config.checksums is not None and config.packer is None and ext != ".zip":
+                    try:
+                        stat = filepath.stat()
+                        if (stat.st_ino, stat.st_size) == (downloaded.st_ino, downloaded.st_size):
+                            config.checksums.record_download(filepath, sha256)
+                    except OSError as e:
+                        print(f"\nMemory {idx}: Could not record checksum: {e}\n")
+                files = None
+                if config.catalog is not None:
+                    # Described before packing moves the files away
+                    try:
+                        files = describe_files(config.out_dir, target, sha256)
+                    except OSError as e:
+                        print(f"\nMemory {idx}: Could not catalog files: {e}\n")
+
+                volume, offsets = None, None
+                if config.packer is not None and not postprocess_error:
+                    try:
+                        with METRICS.stage("pack"):
+                            volume, offsets = config.packer.add(memory, target)
+                    except OSError as e:
+                        print(f"\nMemory {idx}: Packing failed: {e}\n")
+                        postprocess_error = f"Packing failed: {e}"
+
+                if config.manifest is not None:
+                    fields = {"bytes": written, "ext": ext, "sha256": sha256}
+                    if content_length is not None:
+                        fields["content_length"] = content_length
+                    if postprocess_error:
+                        fields["postprocess_error"] = postprocess_error
+                    if volume is not None:
+                        fields["packed"] = volume
+                    entry = config.manifest.record(memory, target, **fields)
+                    if config.catalog is not None and files is not None:
+                        catalog_memory(config, entry, files=files, volume=volume, offsets=offsets)
 
                 # successful download and processing, move onto next file
-                download_count += 1
-                break
+                return None
 
             except requests.exceptions.Timeout:
-                if attempt < max_retries:
-                    print(f"\nMemory {idx}: Timeout, retrying ({attempt}/{max_retries})...\n")
+                reason = "Timeout"
+                if not last_attempt:
+                    print(f"\nMemory {idx}: Timeout, retrying ({attempt + 1}/{max_retries})...\n")
+                    METRICS.add("retries")
                     time.sleep(retry_delay)
                 else:
                     print(f"\nMemory {idx}: Timeout after {max_retries} attempts, skipping\n")
-                    failed_downloads.append((idx, "Timeout"))
 
             except requests.exceptions.ConnectionError:
-                if attempt < max_retries:
-                    print(f"\nMemory {idx}: Connection error, retrying ({attempt}/{max_retries})...\n")
+                reason = "Connection error"
+                if not last_attempt:
+                    print(f"\nMemory {idx}: Connection error, retrying ({attempt + 1}/{max_retries})...\n")
+                    METRICS.add("retries")
                     time.sleep(retry_delay)
                 else:
                     print(f"\nMemory {idx}: Connection failed after {max_retries} attempts, skipping\n")
-                    failed_downloads.append((idx, "Connection error"))
+
+            except (IncompleteDownloadError, requests.exceptions.ChunkedEncodingError) as e:
+                # Connection dropped mid-body; the next attempt starts over
+                reason = f"Incomplete download: {e}"
+                if not last_attempt:
+                    print(f"\nMemory {idx}: Incomplete download, retrying ({attempt + 1}/{max_retries})...\n")
+                    METRICS.add("retries")
+                    time.sleep(retry_delay)
+                else:
+                    print(f"\nMemory {idx}: Incomplete after {max_retries} attempts, skipping\n")
 
             except requests.exceptions.HTTPError as e:
                 # Don't retry on 404, 403, etc.
 
                 # Retry on server errors. This seems to be most prevalent error when downloading
                 status = e.response.status_code
+                reason = f"HTTP {status}"
                 if 500 <= status < 600:
-                    if attempt < max_retries:
-                        print(f"\nMemory {idx}: Server error {status}, retry attempt {attempt}/{max_retries}")
+                    if not last_attempt:
+                        print(f"\nMemory {idx}: Server error {status}, retry attempt {attempt + 1}/{max_retries}")
+                        METRICS.add("retries")
                         time.sleep(retry_delay)
                         continue
 
-                print(f"\nMemory {idx}: HTTP error {e.response.status_code}, skipping\n")
-                failed_downloads.append((idx, f"HTTP {e.response.status_code}"))
-                break
+                print(f"\nMemory {idx}: HTTP error {status}, skipping\n")
+                return reason
 
             except requests.exceptions.RequestException as e:
                 print(f"\nMemory {idx}: Download failed: {e}, skipping\n")
-                failed_downloads.append((idx, str(e)))
-                break
+                return str(e)
 
             except Exception as e:
                 print(f"\nMemory {idx}: Unexpected error: {e}, skipping\n")
-                failed_downloads.append((idx, str(e)))
-                break
+                return str(e)
+
+        return reason
+
+    finally:
+        if reserved:
+            budget.release(reserved, on_disk)
+
+# =========================================================================== #
+
+"""
+Download Memories that are provided in list of dictionaries. Call subfunctions
+to handle metadata writing.
+
+Args:
+    memories: List of Memory dictionaries with keys: date, type, lat, lon, url
+    config: Run settings (output directory, layout, worker count). Defaults
+            are used when not provided
+    order: Indexes into memories in the order to process them (see
+           scheduling.schedule_order). Table order when not provided;
+           messages always use the table index
+
+Returns:
+    Tuple of (number of successful downloads, list of (index, reason) failures)
+
+Raises:
+    DownloadError: If the output directory cannot be created
+"""
+def memory_download(memories: list[dict[str, str, str, str, str]],
+                    config: RunConfig | None = None,
+                    order: list[int] | None = None) -> tuple[int, list[tuple[int, str]]]:
+
+    if config is None:
+        config = RunConfig()
+
+    total_files = len(memories)
+    if not memories or total_files <= 0:
+        print("No memories to download.")
+        return 0, []
+
+    print(f"\nStarting download of {total_files} memories...\n")
+
+    # Create output directory
+    try:
+        config.out_dir.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        raise DownloadError(f"Failed to create output directory: {e}")
+
+    download_count = 0
+    failed_downloads = []
+
+    # Logic to begin downloading begins here
+    if order is None:
+        order = range(total_files)
+
+    if config.workers <= 1:
+        for idx in order:
+            reason = download_memory(idx, memories[idx], total_files, config)
+            if reason is None:
+                download_count += 1
+            else:
+                failed_downloads.append((idx, reason))
+    else:
+        executor = ThreadPoolExecutor(max_workers=config.workers)
+        try:
+            # The executor starts queued work in submission order
+            futures = {
+                executor.submit(download_memory, idx, memories[idx], total_files, config): idx
+                for idx in order
+            }
+            for future in as_completed(futures):
+                reason = future.result()
+                if reason is None:
+                    download_count += 1
+                else:
+                    failed_downloads.append((futures[future], reason))
+        except BaseException:
+            # Don't start queued downloads after Ctrl+C or a fatal error
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+
+    # Scheduled or parallel runs finish out of table order
+    failed_downloads.sort()
 
     # Final summary
     print(f"\n\n{'='*50}")
@@ -343,4 +956,6 @@ def memory_download(memories: list[dict[str, str, str, str, str]]) -> None:
         print("All memories downloaded successfully!")
     print(f"{'='*50}\n")
 
+    return download_count, failed_downloads
+
 # =========================================================================== #
@@ -27,5 +27,11 @@ class VideoProcessingError(MemorEasyError):
 class ZipExtractionError(MemorEasyError):
     """Raised when ZIP extraction or processing fails"""
     pass
+class DiskSpaceError(MemorEasyError):
+    """Raised when free disk space does not recover while waiting for it"""
+    pass
+class IncompleteDownloadError(DownloadError):
+    """Raised when fewer bytes arrive than the server announced"""
+    pass
 
 # =========================================================================== #
@@ -0,0 +1,167 @@
+from .budget import format_size
+from pathlib import Path
+import threading
+import sys
+import os
+
+# =========================================================================== #
+
+# Peak bytes per output pixel of merge_jpg_with_overlay: the RGBA base, the
+# resized RGBA overlay and the RGBA composite are alive at the same time
+JPG_MERGE_BYTES_PER_PIXEL = 12
+
+# Bytes per pixel of the overlay PNG as decoded, before it is resized
+PNG_DECODE_BYTES_PER_PIXEL = 4
+
+# ffmpeg keeps roughly this many YUV 4:2:0 frames buffered for libx264
+# lookahead and reference frames, on top of a fixed process overhead
+FFMPEG_FRAMES_IN_FLIGHT = 60
+FFMPEG_BASE_BYTES = 64 * 1024 * 1024
+
+# Share of the detected memory limit given to merge work with "auto"
+AUTO_BUDGET_FRACTION = 0.5
+
+# =========================================================================== #
+
+"""
+Detect how much memory this process may use
+
+Checks the cgroup limit first (containers), then physical memory.
+
+Returns:
+    Memory limit in bytes, or None if it cannot be determined
+"""
+def detect_memory_limit() -> int | None:
+
+    # cgroup v2 and v1 container limits
+    for limit_file in ("/sys/fs/cgroup/memory.max",
+                       "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            value = Path(limit_file).read_text().strip()
+        except OSError:
+            continue
+        # Unlimited cgroups report "max" or a huge sentinel value
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+
+    if not sys.platform.startswith("win"):
+        try:
+            return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        except (ValueError, OSError, AttributeError):
+            pass
+
+    return None
+
+# =========================================================================== #
+
+"""
+Read image dimensions from the file header without decoding pixel data
+
+Args:
+    path: Path to image
+
+Returns:
+    Tuple of (width, height)
+"""
+def image_size(path: Path) -> tuple[int, int]:
+
+    from PIL import Image
+
+    # Image.open only parses the header; pixels are decoded on load()
+    with Image.open(path) as image:
+        return image.size
+
+# =========================================================================== #
+
+"""
+Estimate peak memory of merging a JPG with its overlay
+
+Args:
+    base_size: (width, height) of the base JPG as it will be decoded
+    overlay_size: (width, height) of the overlay PNG
+
+Returns:
+    Estimated peak bytes
+"""
+def estimate_jpg_merge_bytes(base_size: tuple[int, int],
+                             overlay_size: tuple[int, int]) -> int:
+
+    base_pixels = base_size[0] * base_size[1]
+    overlay_pixels = overlay_size[0] * overlay_size[1]
+    return (JPG_MERGE_BYTES_PER_PIXEL * base_pixels
+            + PNG_DECODE_BYTES_PER_PIXEL * overlay_pixels)
+
+# =========================================================================== #
+
+"""
+Estimate peak memory of overlaying a PNG onto a video with ffmpeg
+
+Args:
+    video_size: (width, height) of the video
+    overlay_size: (width, height) of the overlay PNG before resizing
+
+Returns:
+    Estimated peak bytes, including the ffmpeg process
+"""
+def estimate_mp4_merge_bytes(video_size: tuple[int, int],
+                             overlay_size: tuple[int, int]) -> int:
+
+    video_pixels = video_size[0] * video_size[1]
+    overlay_pixels = overlay_size[0] * overlay_size[1]
+
+    # Resizing the overlay holds the decoded and the resized copy
+    resize_bytes = PNG_DECODE_BYTES_PER_PIXEL * (overlay_pixels + video_pixels)
+    ffmpeg_bytes = FFMPEG_BASE_BYTES + int(video_pixels * 1.5 * FFMPEG_FRAMES_IN_FLIGHT)
+    return max(resize_bytes, ffmpeg_bytes)
+
+# =========================================================================== #
+
+class MemoryGovernor:
+    """
+    Admission control for merge jobs based on their estimated peak memory
+
+    Jobs wait until their estimate fits in what is left of the budget. A job
+    larger than the whole budget is admitted alone so it can never deadlock.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes: int) -> None:
+        """Wait until nbytes fit in the budget, then claim them"""
+        with self._condition:
+            while self.in_use > 0 and self.in_use + nbytes > self.limit:
+                self._condition.wait()
+            self.in_use += nbytes
+
+    def release(self, nbytes: int) -> None:
+        """Return nbytes to the budget and wake up waiting jobs"""
+        with self._condition:
+            self.in_use = max(0, self.in_use - nbytes)
+            self._condition.notify_all()
+
+# =========================================================================== #
+
+"""
+Build a governor from a command line setting
+
+Args:
+    limit: Budget in bytes, or None to use a share of the detected memory limit
+
+Returns:
+    MemoryGovernor, or None if no limit was given and none could be detected
+"""
+def make_governor(limit: int | None) -> MemoryGovernor | None:
+
+    if limit is None:
+        detected = detect_memory_limit()
+        if detected is None:
+            return None
+        limit = int(detected * AUTO_BUDGET_FRACTION)
+        print(f"Merge memory budget: {format_size(limit)}")
+
+    return MemoryGovernor(limit)
+
+# =========================================================================== #
@@ -0,0 +1,96 @@
+from urllib.parse import urlsplit, parse_qs
+import hashlib
+
+# =========================================================================== #
+
+# Query parameters that identify a Memory independent of the signed download
+# link, checked in order of preference
+URL_ID_PARAMS = ("mid", "sid")
+
+# =========================================================================== #
+
+"""
+Derive a stable ID from a Memory download URL
+
+Download links are signed and change between exports, so only the Memory ID
+query parameter is kept. URLs without one fall back to host, path and query,
+so Memories served from one path with different queries stay apart.
+
+Args:
+    url: Download URL from memories_history.html (may be None)
+
+Returns:
+    URL-derived ID, or an empty string if there is no URL
+"""
+def url_id(url: str | None) -> str:
+
+    if not url:
+        return ""
+
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    for param in URL_ID_PARAMS:
+        if query.get(param):
+            return query[param][0]
+
+    # Without a query the ID is unchanged from before queries were included
+    if not parts.query:
+        return f"{parts.netloc}{parts.path}"
+    return f"{parts.netloc}{parts.path}?{parts.query}"
+
+# =========================================================================== #
+
+"""
+Compute a stable identity for a Memory
+
+The identity is the same for a Memory across separate exports, hosts and
+processes, so it can be used for sharding and for tracking completed work.
+
+Args:
+    memory: Memory dictionary with keys: date, type, lat, lon, url
+
+Returns:
+    Hex SHA-1 digest of the Memory's date, type and URL-derived ID
+"""
+def memory_id(memory: dict[str, str, str, str, str]) -> str:
+
+    key = "|".join((
+        memory.get("date") or "",
+        memory.get("type") or "",
+        url_id(memory.get("url")),
+    ))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+# =========================================================================== #
+
+"""
+Merge Memory lists from several exports, keeping one copy of each Memory
+
+Overlapping exports of the same account list the same Memories with freshly
+signed URLs; they collapse to one entry because memory_id() ignores the
+signature. The first occurrence wins, so earlier exports take precedence.
+
+Args:
+    memory_lists: Memory lists in the order the exports were given
+
+Returns:
+    Tuple of (merged Memories, number of duplicates dropped)
+"""
+def dedupe_memories(memory_lists: list[list[dict]]) -> tuple[list[dict], int]:
+
+    seen = set()
+    merged = []
+    duplicates = 0
+
+    for memories in memory_lists:
+        for memory in memories:
+            key = memory_id(memory)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            merged.append(memory)
+
+    return merged, duplicates
+
+# =========================================================================== #
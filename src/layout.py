@@ -0,0 +1,170 @@
+from .exceptions import *
+from pathlib import Path
+import hashlib
+import re
+
+# =========================================================================== #
+
+# Supported output layouts:
+#   flat: memories/2025-12-09-111051.jpg
+#   date: memories/2025/12/2025-12-09-111051.jpg
+#   hash: memories/3f/2025-12-09-111051.jpg (first byte of SHA-1 of the name)
+LAYOUTS = ("flat", "date", "hash")
+
+# Files and folders written for a Memory start with its "YYYY-MM-DD-HHMMSS" name
+MEMORY_NAME_PATTERN = re.compile(r"^(\d{4})-(\d{2})-\d{2}-\d{6}")
+
+# Leftovers of interrupted writes; never Memories themselves
+TEMP_SUFFIXES = (".part", ".link", ".tmp")
+
+# =========================================================================== #
+
+"""
+Get the base file name of a Memory from its export date
+
+Args:
+    date_str: Date from memories_history.html, e.g. "2025-12-09 11:10:51 UTC"
+
+Returns:
+    Name in format "YYYY-MM-DD-HHMMSS", e.g. "2025-12-09-111051"
+"""
+def memory_name(date_str: str) -> str:
+
+    name = date_str.replace(" ", "-")[:-4]
+    return name.replace(":", "")
+
+# =========================================================================== #
+
+"""
+Get the directory a Memory's file or ZIP folder belongs in
+
+Args:
+    out_dir: Root output directory
+    name: Memory base name in format "YYYY-MM-DD-HHMMSS"
+    layout: One of LAYOUTS
+
+Returns:
+    Directory path for the Memory (not created)
+
+Raises:
+    ValueError: If layout is unknown or name does not start with a date
+"""
+def memory_dir(out_dir: Path, name: str, layout: str = "flat") -> Path:
+
+    if layout == "flat":
+        return out_dir
+
+    if layout == "date":
+        match = MEMORY_NAME_PATTERN.match(name)
+        if not match:
+            raise ValueError(f"Cannot derive date folder from name '{name}'")
+        year, month = match.groups()
+        return out_dir / year / month
+
+    if layout == "hash":
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        return out_dir / digest[:2]
+
+    raise ValueError(f"Unknown layout '{layout}'. Expected one of: {', '.join(LAYOUTS)}")
+
+# =========================================================================== #
+
+"""
+Find every Memory file and ZIP folder in an output tree, in any layout
+
+Folders whose names start with a Memory date are treated as extracted ZIP
+Memories and are not descended into. Hidden folders are skipped. Leftover
+partial files (TEMP_SUFFIXES) are yielded too; callers skip them as needed.
+
+Args:
+    out_dir: Root output directory
+
+Yields:
+    Paths of top-level Memory entries (files and ZIP folders)
+"""
+def iter_memory_entries(out_dir: Path):
+
+    pending = [out_dir]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = sorted(directory.iterdir())
+        except OSError as e:
+            print(f"Warning: Could not read {directory}: {e}")
+            continue
+
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if MEMORY_NAME_PATTERN.match(entry.name):
+                yield entry
+            elif entry.is_dir():
+                pending.append(entry)
+
+# =========================================================================== #
+
+"""
+Move an existing output tree into a different layout
+
+Works from any layout (including the original flat tree) to any other and is
+safe to re-run: entries already in place are left alone and entries whose
+destination is taken are reported and skipped.
+
+Args:
+    out_dir: Root output directory
+    layout: Target layout, one of LAYOUTS
+
+Returns:
+    List of (old path, new path) for every entry moved
+
+Raises:
+    FileNotFoundError: If out_dir does not exist
+    ValueError: If layout is unknown
+"""
+def migrate_layout(out_dir: Path, layout: str) -> list[tuple[Path, Path]]:
+
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}'. Expected one of: {', '.join(LAYOUTS)}")
+    if not out_dir.is_dir():
+        raise FileNotFoundError(f"Output directory not found: {out_dir}")
+
+    moves = []
+    old_dirs = set()
+
+    # Collect first so moves don't disturb the walk
+    for entry in list(iter_memory_entries(out_dir)):
+        # Partial downloads are removed or redone by the next run, never moved
+        if entry.suffix in TEMP_SUFFIXES:
+            continue
+        name = MEMORY_NAME_PATTERN.match(entry.name).group(0)
+        target_dir = memory_dir(out_dir, name, layout)
+        target = target_dir / entry.name
+
+        if entry.parent == target_dir:
+            continue
+        if target.exists():
+            print(f"Warning: {target} already exists, leaving {entry} in place")
+            continue
+
+        try:
+            target_dir.mkdir(parents=True, exist_ok=True)
+            entry.rename(target)
+        except OSError as e:
+            print(f"Warning: Could not move {entry} to {target}: {e}")
+            continue
+
+        old_dirs.add(entry.parent)
+        moves.append((entry, target))
+
+    # Remove layout folders left empty by the move, deepest first
+    for directory in sorted(old_dirs, key=lambda d: len(d.parts), reverse=True):
+        while directory != out_dir and out_dir in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:
+                break
+            directory = directory.parent
+
+    return moves
+
+# =========================================================================== #
@@ -1,4 +1,6 @@
 import traceback
+import argparse
+import shutil
 import sys
 
 from .exceptions import *
@@ -8,41 +10,814 @@ from .parsers import *
 from .metadata import *
 from .media_processing import *
 from .downloaders import *
+from .config import *
+from .sharding import *
+from .layout import *
+from .budget import *
+from .governor import *
+from .metrics import METRICS
+from . import profiling
+from .manifest import *
+from .blobstore import *
+from .reprocess import *
+from .verify import *
+from .planner import *
+from .packing import *
+from .catalog import *
+from .scheduling import *
 
 # =========================================================================== #
 
-def main():
+# Process exit codes
+EXIT_OK = 0           # Every Memory downloaded
+EXIT_ERROR = 1        # Fatal error (bad input, parse error, crash)
+EXIT_USAGE = 2        # Invalid command line (raised by argparse)
+EXIT_PARTIAL = 3      # Run finished but some Memories failed
+EXIT_INTERRUPTED = 130
 
-    print(r"""
+# Subcommands; "run" is assumed when none is given
+COMMANDS = ("run", "migrate", "reprocess", "verify", "plan", "extract", "catalog")
+
+# Free space always left on the output volume unless overridden
+DEFAULT_MIN_FREE = "256M"
+
+# =========================================================================== #
+
+"""
+argparse type for byte sizes such as "512M" or "2G"
+
+Args:
+    text: Size given on the command line
+
+Returns:
+    Size in bytes
+
+Raises:
+    argparse.ArgumentTypeError: If text is not a valid size
+"""
+def size_arg(text: str) -> int:
+
+    try:
+        return parse_size(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+# =========================================================================== #
+
+"""
+argparse type for a location such as "48.8584,2.2945"
+
+Args:
+    text: Latitude and longitude in decimal degrees, separated by a comma
+
+Returns:
+    Tuple of (lat, lon)
+
+Raises:
+    argparse.ArgumentTypeError: If text is not a valid location
+"""
+def location_arg(text: str) -> tuple[float, float]:
+
+    try:
+        lat, lon = (float(part) for part in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid location '{text}', expected LAT,LON")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise argparse.ArgumentTypeError(f"Location '{text}' is out of range")
+    return lat, lon
+
+# =========================================================================== #
+
+"""
+Build the command line parser
+
+Returns:
+    Configured ArgumentParser
+"""
+def build_parser() -> argparse.ArgumentParser:
+
+    parser = argparse.ArgumentParser(
+        prog="MemorEasy",
+        description="Download Snapchat Memories and tag them with their metadata.",
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+
+    run = subparsers.add_parser("run", help="Download and process Memories (default)")
+    run.add_argument(
+        "-i", "--input", type=Path, nargs="+", default=[DEFAULT_INPUT],
+        help="Path(s) to memories_history.html; several exports are merged, "
+             f"listing each Memory once (default: {DEFAULT_INPUT})"
+    )
+    run.add_argument(
+        "-o", "--output", type=Path, default=DEFAULT_OUTPUT,
+        help=f"Output directory (default: {DEFAULT_OUTPUT})"
+    )
+    run.add_argument(
+        "--layout", choices=LAYOUTS, default="flat",
+        help="Folder layout inside the output directory (default: flat)"
+    )
+    run.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="Number of Memories downloaded and processed concurrently (default: 1)"
+    )
+    run.add_argument(
+        "--max-inflight", metavar="SIZE", type=size_arg, default=None,
+        help="Limit bytes being downloaded or extracted at once, e.g. '2G' (default: no limit)"
+    )
+    run.add_argument(
+        "--min-free", metavar="SIZE", type=size_arg, default=DEFAULT_MIN_FREE,
+        help="Pause new downloads while free disk space would drop below this "
+             f"(default: {DEFAULT_MIN_FREE})"
+    )
+    run.add_argument(
+        "--merge-memory", metavar="SIZE", type=size_arg, default=None,
+        help="Memory budget shared by overlay merges, e.g. '1G' "
+             f"(default: {int(AUTO_BUDGET_FRACTION * 100)}%% of available memory)"
+    )
+    run.add_argument(
+        "--report", metavar="PATH", type=Path, default=None,
+        help="Write a JSON run report with per-stage and per-Memory timings"
+    )
+    run.add_argument(
+        "--prometheus", metavar="PATH", type=Path, default=None,
+        help="Write stage latency histograms and counters in Prometheus text format"
+    )
+    run.add_argument(
+        "--profile", metavar="PATH", type=Path, default=None,
+        help="Write a Chrome/Perfetto trace of every stage and subprocess call"
+    )
+    run.add_argument(
+        "--profile-python", metavar="PATH", type=Path, default=None,
+        help="Write cProfile statistics (pstats format) for the Python-side work"
+    )
+    run.add_argument(
+        "--schedule", choices=SCHEDULES, default="table",
+        help="Order to process Memories in, by estimated cost from a cached plan or the Memory "
+             "type: table (export order, default), longest (slow overlay encodes first, for the "
+             "shortest total time) or smallest (most Memories done early)"
+    )
+    run.add_argument(
+        "--sync", action="store_true",
+        help="Only download Memories not yet recorded as completed in the output directory"
+    )
+    run.add_argument(
+        "--store", action="store_true",
+        help="Keep tagged files in a content-addressed store, hardlinked to the output, "
+             "reusing tagging and overlay merges of identical media"
+    )
+    run.add_argument(
+        "--pack", choices=PACK_FORMATS, default=None,
+        help="Move finished Memories into rolling tar or uncompressed zip volumes with a "
+             "sidecar index instead of keeping them as loose files"
+    )
+    run.add_argument(
+        "--volume-size", metavar="SIZE", type=size_arg, default=DEFAULT_VOLUME_SIZE,
+        help="Size at which --pack starts a new volume (default: 4G)"
+    )
+    run.add_argument(
+        "--no-catalog", dest="catalog", action="store_false",
+        help="Don't add completed Memories to the output's SQLite catalog"
+    )
+    run.add_argument(
+        "--shard", metavar="i/N", default=None,
+        help="Only process shard i of N, partitioned by a stable hash of each Memory"
+    )
+    run.add_argument(
+        "--batch", action="store_true",
+        help="Non-interactive mode: no banner and no 'Press Enter' prompt"
+    )
+
+    migrate = subparsers.add_parser(
+        "migrate", help="Move an existing output tree into a different layout"
+    )
+    migrate.add_argument(
+        "-o", "--output", type=Path, default=DEFAULT_OUTPUT,
+        help=f"Output directory to reorganise (default: {DEFAULT_OUTPUT})"
+    )
+    migrate.add_argument(
+        "--layout", choices=LAYOUTS, required=True, help="Target layout"
+    )
+    migrate.add_argument(
+        "--batch", action="store_true",
+        help="Non-interactive mode: no banner and no 'Press Enter' prompt"
+    )
+
+    reprocess = subparsers.add_parser(
+        "reprocess",
+        help="Redo missing tags and overlay merges in an existing output tree (offline)"
+    )
+    reprocess.add_argument(
+        "-o", "--output", type=Path, default=DEFAULT_OUTPUT,
+        help=f"Output directory to reprocess (default: {DEFAULT_OUTPUT})"
+    )
+    reprocess.add_argument(
+        "-i", "--input", type=Path, nargs="+", default=None,
+        help="Export(s) to take metadata from for files not in the output's manifest "
+             f"(default: {DEFAULT_INPUT} if it exists)"
+    )
+    reprocess.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="Number of Memories processed concurrently (default: 1)"
+    )
+    reprocess.add_argument(
+        "--merge-memory", metavar="SIZE", type=size_arg, default=None,
+        help="Memory budget shared by overlay merges (default: automatic)"
+    )
+    reprocess.add_argument(
+        "--dry-run", action="store_true",
+        help="Only list what would be redone"
+    )
+    reprocess.add_argument(
+        "--batch", action="store_true",
+        help="Non-interactive mode: no banner and no 'Press Enter' prompt"
+    )
+
+    verify = subparsers.add_parser(
+        "verify", help="Check an output tree for missing, truncated or corrupted files"
+    )
+    verify.add_argument(
+        "-o", "--output", type=Path, default=DEFAULT_OUTPUT,
+        help=f"Output directory to verify (default: {DEFAULT_OUTPUT})"
+    )
+    verify.add_argument(
+        "-w", "--workers", type=int, default=4,
+        help="Number of files checked concurrently (default: 4)"
+    )
+    verify.add_argument(
+        "--no-decode", dest="decode", action="store_false",
+        help="Only hash files; skip decoding images and checking video structure"
+    )
+    verify.add_argument(
+        "--rehash", action="store_true",
+        help="Also re-hash files unchanged since the last pass, to detect silent corruption"
+    )
+    verify.add_argument(
+        "--batch", action="store_true",
+        help="Non-interactive mode: no banner and no 'Press Enter' prompt"
+    )
+
+    plan = subparsers.add_parser(
+        "plan", help="Estimate download size and run time without downloading (dry run)"
+    )
+    plan.add_argument(
+        "-i", "--input", type=Path, nargs="+", default=[DEFAULT_INPUT],
+        help=f"Path(s) to memories_history.html (default: {DEFAULT_INPUT})"
+    )
+    plan.add_argument(
+        "-o", "--output", type=Path, default=DEFAULT_OUTPUT,
+        help=f"Output directory the run will use; the plan is cached there (default: {DEFAULT_OUTPUT})"
+    )
+    plan.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="Worker count of the planned run, used for the time estimate (default: 1)"
+    )
+    plan.add_argument(
+        "--schedule", choices=SCHEDULES, default="table",
+        help="Processing order of the planned run, used for the time estimate (default: table)"
+    )
+    plan.add_argument(
+        "--concurrency", type=int, default=16,
+        help="Number of probe requests in flight (default: 16)"
+    )
+    plan.add_argument(
+        "--sync", action="store_true",
+        help="Only plan Memories not yet recorded as completed"
+    )
+    plan.add_argument(
+        "--refresh", action="store_true",
+        help="Probe every Memory again instead of reusing cached results"
+    )
+    plan.add_argument(
+        "--calibrate", metavar="REPORT", type=Path, default=None,
+        help="Take stage rates from a run report (--report) instead of the last run"
+    )
+    plan.add_argument(
+        "--batch", action="store_true",
+        help="Non-interactive mode: no banner and no 'Press Enter' prompt"
+    )
+
+    extract = subparsers.add_parser(
+        "extract", help="Copy Memories out of packed volumes using their index"
+    )
+    extract.add_argument(
+        "names", nargs="*",
+        help="Memories to extract, e.g. 2024-05-01-120000 (default: all)"
+    )
+    extract.add_argument(
+        "-o", "--output", type=Path, default=DEFAULT_OUTPUT,
+        help=f"Output directory holding the volumes (default: {DEFAULT_OUTPUT})"
+    )
+    extract.add_argument(
+        "--to", type=Path, default=Path("."),
+        help="Directory to extract into (default: current directory)"
+    )
+    extract.add_argument(
+        "--list", action="store_true",
+        help="Only list matching packed files"
+    )
+    extract.add_argument(
+        "--batch", action="store_true",
+        help="Non-interactive mode: no banner and no 'Press Enter' prompt"
+    )
+
+    catalog = subparsers.add_parser(
+        "catalog", help="Find Memories by place, date and type in the output's catalog"
+    )
+    catalog.add_argument(
+        "-o", "--output", type=Path, default=DEFAULT_OUTPUT,
+        help=f"Output directory to search (default: {DEFAULT_OUTPUT})"
+    )
+    catalog.add_argument(
+        "--near", metavar="LAT,LON", type=location_arg, default=None,
+        help="Only Memories within --radius of this location"
+    )
+    catalog.add_argument(
+        "--radius", metavar="KM", type=float, default=1.0,
+        help="Search radius for --near in kilometres (default: 1)"
+    )
+    catalog.add_argument(
+        "--from", dest="date_from", metavar="DATE", default=None,
+        help="Only Memories from this date on, e.g. 2022 or 2022-06-01"
+    )
+    catalog.add_argument(
+        "--to", dest="date_to", metavar="DATE", default=None,
+        help="Only Memories up to this date; 2022 includes the whole year"
+    )
+    catalog.add_argument(
+        "--type", choices=("Image", "Video"), default=None, help="Only Memories of this type"
+    )
+    catalog.add_argument(
+        "--limit", type=int, default=100, help="Maximum number of results (default: 100, 0 for all)"
+    )
+    catalog.add_argument(
+        "--thumbs", action="store_true",
+        help="Also make (or reuse) a thumbnail for every result"
+    )
+    catalog.add_argument(
+        "--thumb-size", metavar="PX", type=int, default=DEFAULT_THUMB_SIZE,
+        help=f"Longest side of thumbnails in pixels (default: {DEFAULT_THUMB_SIZE})"
+    )
+    catalog.add_argument(
+        "-w", "--workers", type=int, default=4,
+        help="Number of thumbnails made concurrently (default: 4)"
+    )
+    catalog.add_argument(
+        "--rebuild", action="store_true",
+        help="Fill the catalog from the manifest first, e.g. for output from older versions"
+    )
+    catalog.add_argument(
+        "--batch", action="store_true",
+        help="Non-interactive mode: no banner and no 'Press Enter' prompt"
+    )
+
+    return parser
+
+# =========================================================================== #
+
+"""
+Parse command line arguments, defaulting to the "run" command
+
+Args:
+    argv: Arguments without the program name (sys.argv[1:] if None)
+
+Returns:
+    Parsed arguments namespace
+"""
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Keep "MemorEasy" and "MemorEasy --output x" working without a subcommand
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv = ["run", *argv]
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command in ("run", "reprocess", "verify", "plan", "catalog"):
+        if args.workers < 1:
+            parser.error("--workers must be at least 1")
+        if args.command == "run" and args.shard is not None:
+            try:
+                args.shard = parse_shard(args.shard)
+            except ValueError as e:
+                parser.error(str(e))
+
+    return args
+
+# =========================================================================== #
+
+"""
+Download, tag and extract Memories as configured on the command line
+
+Args:
+    args: Parsed "run" arguments
+
+Returns:
+    Process exit code
+"""
+def run(args: argparse.Namespace) -> int:
+
+    if args.profile or args.profile_python:
+        profiling.enable(trace=bool(args.profile), python=bool(args.profile_python))
+    try:
+        return _run(args)
+    finally:
+        tracer, profiler = profiling.disable()
+        if tracer is not None:
+            tracer.write(args.profile)
+            print(f"Trace written to {args.profile} (open in https://ui.perfetto.dev)")
+        if profiler is not None:
+            profiler.write(args.profile_python)
+            print(f"Python profile written to {args.profile_python}")
+
+# =========================================================================== #
+
+def _run(args: argparse.Namespace) -> int:
+
+    with profiling.profiled(), profiling.span("parse_exports", exports=len(args.input)):
+        memories = parse_exports(args.input)
+
+    # Each shard keeps its own manifest file and volumes so hosts never share one
+    writer = "manifest"
+    volume_prefix = VOLUME_PREFIX
+    if args.shard is not None:
+        index, count = args.shard
+        memories = shard_memories(memories, index, count)
+        print(f"Shard {index}/{count}: {len(memories)} memories assigned")
+        writer = f"manifest-shard{index}of{count}"
+        volume_prefix = f"{VOLUME_PREFIX}-shard{index}of{count}"
+        # SQLite locking is unreliable on network filesystems; the catalog is
+        # filled from the shard manifests once every shard has finished
+        if args.catalog:
+            print("Catalog: not written by sharded runs; fill it with 'catalog --rebuild' afterwards")
+
+    manifest = Manifest(args.output, writer)
+    if args.sync:
+        total = len(memories)
+        memories = manifest.pending(memories)
+        print(f"Sync: {total - len(memories)} of {total} memories already completed, "
+              f"{len(memories)} to download")
+
+    # A plan made earlier tells the download size up front
+    plan_cache = PlanCache(args.output)
+    planned = [plan_cache.get(memory) for memory in memories]
+    if plan_cache and all(planned):
+        planned_bytes = sum(entry.get("bytes") or 0 for entry in planned)
+        free = shutil.disk_usage(args.output if args.output.exists() else Path(".")).free
+        print(f"Planned download: {format_size(planned_bytes)} ({format_size(free)} free)")
+        if planned_bytes > free:
+            print("Warning: the planned download is larger than the free disk space")
+
+    # Estimated cost per Memory orders the queue and weights the progress ETA
+    costs = estimate_costs(memories, plan_cache, load_rates(args.output)[0])
+    order = schedule_order(costs, args.schedule)
+    if args.schedule != "table":
+        print(f"Schedule: {args.schedule} first, estimated "
+              f"~{format_duration(simulate_makespan([costs[idx] for idx in order], args.workers))} "
+              f"(table order ~{format_duration(simulate_makespan(costs, args.workers))})")
+
+    budget = ByteBudget(args.output, limit=args.max_inflight, headroom=args.min_free)
+    config = RunConfig(
+        out_dir=args.output, workers=args.workers, layout=args.layout, budget=budget,
+        merge_governor=make_governor(args.merge_memory), manifest=manifest,
+        store=BlobStore(args.output) if args.store else None,
+        packer=Packer(args.output, args.pack, args.volume_size, volume_prefix) if args.pack else None,
+        catalog=Catalog(args.output) if args.catalog and args.shard is None else None,
+        # Shards never write to one shared file
+        checksums=ChecksumManifest(args.output) if args.shard is None else None,
+        progress=ProgressETA(costs, args.workers),
+    )
+
+    METRICS.reset()
+    try:
+        with profiling.span("memory_download", workers=config.workers):
+            _, failed_downloads = memory_download(memories, config, order)
+    finally:
+        # Leaves the last volume readable by tar and unzip, not only the index
+        if config.packer is not None:
+            config.packer.close()
+        if config.catalog is not None:
+            config.catalog.close()
+        # Blobs of retagged, packed or deleted files only take up space
+        if config.store is not None:
+            removed, freed = config.store.collect_garbage()
+            if removed:
+                print(f"Blob store: removed {removed} unreferenced blobs ({format_size(freed)})")
+        # Also written for cancelled runs, which are often the slow ones
+        if args.report:
+            METRICS.write_json(args.report)
+            print(f"Run report written to {args.report}")
+        if args.prometheus:
+            METRICS.write_prometheus(args.prometheus)
+        # Calibrates the time estimates of later plans
+        save_rates(args.output, METRICS.report())
+
+    return EXIT_PARTIAL if failed_downloads else EXIT_OK
+
+# =========================================================================== #
+
+"""
+Reorganise an existing output tree into the requested layout
+
+Args:
+    args: Parsed "migrate" arguments
+
+Returns:
+    Process exit code
+"""
+def migrate(args: argparse.Namespace) -> int:
+
+    print(f"Migrating {args.output} to '{args.layout}' layout...")
+    moves = migrate_layout(args.output, args.layout)
+    print(f"Moved {len(moves)} memories")
+
+    # Keep the sync manifest pointing at the new locations
+    manifest = Manifest(args.output)
+    if manifest.files():
+        manifest.relocate(dict(moves))
+    if (state_dir(args.output) / CATALOG_NAME).exists():
+        catalog = Catalog(args.output)
+        catalog.relocate(dict(moves))
+        catalog.close()
+    # Moved files would otherwise look new to verify and be hashed again
+    checksums = ChecksumManifest(args.output)
+    if checksums.entries:
+        checksums.relocate(dict(moves))
+
+    return EXIT_OK
+
+# =========================================================================== #
+
+"""
+Redo missing tags and overlay merges in an existing output tree, offline
+
+Args:
+    args: Parsed "reprocess" arguments
+
+Returns:
+    Process exit code
+"""
+def reprocess_tree(args: argparse.Namespace) -> int:
+
+    # Fail before scanning: without exiftool nothing can be fixed
+    try:
+        find_dependency("exiftool")
+    except DependencyError as e:
+        print(f"\n{e}")
+        return EXIT_ERROR
+
+    inputs = args.input
+    if inputs is None:
+        inputs = [DEFAULT_INPUT] if DEFAULT_INPUT.exists() else []
+    memories = parse_exports(inputs) if inputs else []
+
+    manifest = Manifest(args.output)
+    print(f"Scanning {args.output}...")
+    items, unmatched = find_reprocess_work(args.output, memories, manifest)
+
+    if unmatched:
+        print(f"{unmatched} file(s) could not be matched to a Memory and are left as-is")
+    print(f"{len(items)} memories need reprocessing: "
+          f"{sum(len(item.tag) for item in items)} to tag, "
+          f"{sum(len(item.touch) for item in items)} already tagged, "
+          f"{sum(len(item.merge) for item in items)} to merge, "
+          f"{sum(item.unzip for item in items)} to extract")
+
+    if args.dry_run:
+        for item in items:
+            print(f"  - {item.path}")
+        return EXIT_OK
+
+    done, failed = reprocess(items, args.workers, make_governor(args.merge_memory), manifest)
+
+    # Tags and merges changed the files; refresh their catalog rows
+    if (state_dir(args.output) / CATALOG_NAME).exists():
+        catalog = Catalog(args.output)
+        failed_paths = {path for path, _ in failed}
+        for item in items:
+            entry = manifest.get(item.memory)
+            if entry is not None and item.path not in failed_paths and manifest.resolve(entry).exists():
+                catalog.add(entry, describe_files(args.output, manifest.resolve(entry), entry.get("sha256")))
+        catalog.close()
+
+    print(f"Reprocessed: {done}/{len(items)}")
+    for path, reason in failed:
+        print(f"  - {path.name}: {reason}")
+
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+# =========================================================================== #
+
+"""
+Check an output tree for missing, truncated or corrupted files
+
+Args:
+    args: Parsed "verify" arguments
+
+Returns:
+    Process exit code
+"""
+def verify(args: argparse.Namespace) -> int:
+
+    print(f"Verifying {args.output}...")
+    checked, skipped, failures = verify_tree(args.output, args.workers, args.decode, args.rehash)
+
+    print(f"Checked {checked} file(s), {skipped} unchanged since the last pass")
+    if failures:
+        print(f"Problems found: {len(failures)}")
+        for path, problem in failures:
+            print(f"  - {path}: {problem}")
+        return EXIT_PARTIAL
+
+    print("All files verified successfully!")
+    return EXIT_OK
+
+# =========================================================================== #
+
+"""
+Probe every Memory's type and size and estimate the run, without downloading
+
+Args:
+    args: Parsed "plan" arguments
+
+Returns:
+    Process exit code
+"""
+def plan(args: argparse.Namespace) -> int:
+
+    memories = parse_exports(args.input)
+    if args.sync:
+        memories = Manifest(args.output).pending(memories)
+
+    cache = PlanCache(args.output)
+    print(f"Probing {len(memories)} memories ({len(cache)} cached)...")
+    failures = probe_memories(memories, cache, args.concurrency, args.refresh)
+
+    rates, rates_source = load_rates(args.output, args.calibrate)
+    summary = summarize_plan(memories, cache, rates, args.workers, args.schedule)
+    print_plan(summary, rates_source)
+
+    if failures:
+        print(f"Could not probe {len(failures)} memories:")
+        for memory, reason in failures[:20]:
+            print(f"  - {memory.get('date')}: {reason}")
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+# =========================================================================== #
+
+"""
+Copy Memories out of packed volumes, seeking straight to each file
+
+Args:
+    args: Parsed "extract" arguments
+
+Returns:
+    Process exit code
+"""
+def extract(args: argparse.Namespace) -> int:
+
+    index = load_pack_index(args.output)
+    if not index:
+        print(f"No packed volumes found in {args.output}")
+        return EXIT_ERROR
+
+    # A Memory name selects its file and, for ZIP Memories, its whole folder
+    by_name = {}
+    for member, entry in index.items():
+        path = Path(member)
+        key = path.parent.name if MEMORY_NAME_PATTERN.match(path.parent.name) else path.stem
+        by_name.setdefault(key, []).append(entry)
+        by_name.setdefault(member, []).append(entry)
+
+    missing = []
+    if args.names:
+        entries = []
+        for name in args.names:
+            if name not in by_name:
+                missing.append(name)
+            entries.extend(by_name.get(name, []))
+    else:
+        entries = list(index.values())
+
+    for entry in entries:
+        if args.list:
+            print(f"{entry['name']}  {format_size(entry['size'])}  {entry['volume']}")
+        else:
+            dest = extract_packed(args.output, entry, args.to)
+            print(f"Extracted {dest}")
+
+    for name in missing:
+        print(f"Not found in any volume: {name}")
+    return EXIT_PARTIAL if missing else EXIT_OK
+
+# =========================================================================== #
+
+"""
+Find Memories by place, date and type with index queries on the catalog
+
+Args:
+    args: Parsed "catalog" arguments
+
+Returns:
+    Process exit code
+"""
+def catalog(args: argparse.Namespace) -> int:
+
+    catalog = Catalog(args.output)
+    try:
+        if args.rebuild:
+            print(f"Cataloging {args.output}...")
+            print(f"Cataloged {rebuild_catalog(args.output, catalog)} memories")
+        elif not len(catalog):
+            print(f"The catalog of {args.output} is empty; fill it from existing output with --rebuild")
+            return EXIT_ERROR
+
+        rows = catalog.query(args.near, args.radius, args.date_from, args.date_to, args.type, args.limit)
+    finally:
+        catalog.close()
+
+    thumbs, failures = {}, []
+    if args.thumbs:
+        thumbs, failures = make_thumbnails(args.output, rows, args.thumb_size, args.workers)
+
+    for row in rows:
+        source = thumbnail_source(row)
+        line = f"{row['date']}  {row['type'] or '?':<5}  "
+        if row["lat"] is not None:
+            line += f"{row['lat']:.5f},{row['lon']:.5f}  "
+        if "distance_km" in row:
+            line += f"{row['distance_km']:.2f} km  "
+        line += source["path"] if source else row["path"]
+        if row["volume"] or (source and source["volume"]):
+            line += f"  [{row['volume'] or source['volume']}]"
+        if row["id"] in thumbs:
+            line += f"  -> {thumbs[row['id']]}"
+        print(line)
+    print(f"{len(rows)} memories found")
+
+    for memory, problem in failures:
+        print(f"  - No thumbnail for {memory}: {problem}")
+    return EXIT_PARTIAL if failures else EXIT_OK
+
+# =========================================================================== #
+
+def main(argv: list[str] | None = None):
+
+    args = parse_args(argv)
+
+    # Only block on "Press Enter" when someone is there to press it
+    interactive = not args.batch and sys.stdin.isatty()
+
+    def pause():
+        if interactive:
+            input("\nPress Enter to exit...")
+
+    if not args.batch:
+        print(r"""
 ███╗   ███╗███████╗███╗   ███╗ ██████╗ ██████╗ ███████╗ █████╗ ███████╗██╗   ██╗
 ████╗ ████║██╔════╝████╗ ████║██╔═══██╗██╔══██╗██╔════╝██╔══██╗██╔════╝╚██╗ ██╔╝
 ██╔████╔██║█████╗  ██╔████╔██║██║   ██║██████╔╝█████╗  ███████║███████╗ ╚████╔╝
 ██║╚██╔╝██║██╔══╝  ██║╚██╔╝██║██║   ██║██╔══██╗██╔══╝  ██╔══██║╚════██║  ╚██╔╝
 ██║ ╚═╝ ██║███████╗██║ ╚═╝ ██║╚██████╔╝██║  ██║███████╗██║  ██║███████║   ██║
 ╚═╝     ╚═╝╚══════╝╚═╝     ╚═╝ ╚═════╝ ╚═╝  ╚═╝╚══════╝╚═╝  ╚═╝╚══════╝   ╚═╝
-    """)
+        """)
 
     try:
-        html_text = parse_html()
-        memories = parse_snapchat_memories(html_text)
-        memory_download(memories)
-        input("\nPress Enter to exit...")
+        if args.command == "migrate":
+            exit_code = migrate(args)
+        elif args.command == "reprocess":
+            exit_code = reprocess_tree(args)
+        elif args.command == "verify":
+            exit_code = verify(args)
+        elif args.command == "plan":
+            exit_code = plan(args)
+        elif args.command == "extract":
+            exit_code = extract(args)
+        elif args.command == "catalog":
+            exit_code = catalog(args)
+        else:
+            exit_code = run(args)
+        pause()
+        sys.exit(exit_code)
 
     except InvalidInputFileError as e:
         print(f"\nInvalid file: {e}")
-        input("\nPress Enter to exit...")
-        sys.exit(1)
+        pause()
+        sys.exit(EXIT_ERROR)
     except ParseError as e:
         print(f"\nParse error: {e}")
-        input("\nPress Enter to exit...")
-        sys.exit(1)
+        pause()
+        sys.exit(EXIT_ERROR)
     except KeyboardInterrupt:
         print("\n\nDownload cancelled by user")
-        sys.exit(130)
+        sys.exit(EXIT_INTERRUPTED)
     except Exception as e:
         print(f"\nUnexpected error: {e}")
         traceback.print_exc()
-        input("\nPress Enter to exit...")
-        sys.exit(1)
+        pause()
+        sys.exit(EXIT_ERROR)
 
 # =========================================================================== #
@@ -0,0 +1,209 @@
+from .identity import memory_id
+from pathlib import Path
+import threading
+import json
+import time
+import os
+
+# =========================================================================== #
+
+# Bookkeeping folder inside the output directory
+STATE_DIR_NAME = ".memoreasy"
+
+# =========================================================================== #
+
+"""
+Get the bookkeeping folder of an output directory
+
+Args:
+    out_dir: Root output directory
+
+Returns:
+    Path to the state folder (not created)
+"""
+def state_dir(out_dir: Path) -> Path:
+
+    return Path(out_dir) / STATE_DIR_NAME
+
+# =========================================================================== #
+
+class Manifest:
+    """
+    Record of completed Memories, keyed by their stable identity
+
+    Stored as JSON lines under <out_dir>/.memoreasy/. Each writer (one per
+    shard) appends to its own file so processes on different hosts never
+    write to the same file; loading merges all of them. Paths are stored
+    relative to the output directory.
+    """
+
+    def __init__(self, out_dir: Path, writer: str = "manifest"):
+        self.out_dir = Path(out_dir)
+        self.path = state_dir(out_dir) / f"{writer}.jsonl"
+        self.entries = {}
+        self.paths = {}
+        self._claims = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def files(self) -> list[Path]:
+        """Every manifest file in the output directory, from all writers"""
+        return sorted(state_dir(self.out_dir).glob("manifest*.jsonl"))
+
+    def load(self) -> None:
+        """Read all manifest files; later lines win over earlier ones"""
+        entries = {}
+        for path in self.files():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut off by a crash; the Memory is redone
+                        continue
+                    entries[entry["id"]] = entry
+        with self._lock:
+            self.entries = entries
+            self._index_paths()
+
+    def _index_paths(self) -> None:
+        # First Memory recorded for a path owns it; duplicates point at it too
+        self.paths = {}
+        for entry in self.entries.values():
+            if "duplicate_of" not in entry:
+                self.paths.setdefault(entry["path"], entry)
+
+    def _relative(self, path: Path) -> str:
+        return Path(os.path.relpath(path, self.out_dir)).as_posix()
+
+    def __contains__(self, memory: dict) -> bool:
+        return memory_id(memory) in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, memory: dict) -> dict | None:
+        """Get the entry for a Memory, or None if it was never completed"""
+        return self.entries.get(memory_id(memory))
+
+    def pending(self, memories: list[dict]) -> list[dict]:
+        """Filter Memories down to those not yet completed"""
+        return [memory for memory in memories if memory_id(memory) not in self.entries]
+
+    def record(self, memory: dict, path: Path, **fields) -> dict:
+        """
+        Mark a Memory completed
+
+        Args:
+            memory: Memory dictionary with keys: date, type, lat, lon, url
+            path: Downloaded file, or folder for ZIP Memories
+            **fields: Extra details stored with the entry (bytes, hashes, ...)
+
+        Returns:
+            The stored entry
+        """
+        entry = {
+            "id": memory_id(memory),
+            "date": memory.get("date"),
+            "type": memory.get("type"),
+            "lat": memory.get("lat"),
+            "lon": memory.get("lon"),
+            "path": self._relative(path),
+            "completed": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **fields,
+        }
+        line = json.dumps(entry) + "\n"
+
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.entries[entry["id"]] = entry
+            if "duplicate_of" not in entry:
+                self.paths.setdefault(entry["path"], entry)
+
+        return entry
+
+    def update(self, entry: dict, drop: tuple[str, ...] = (), **fields) -> dict:
+        """
+        Change fields of a stored entry
+
+        Args:
+            entry: Entry as returned by get() or owner_of()
+            drop: Names of fields to remove
+            **fields: Fields to set
+
+        Returns:
+            The updated entry
+        """
+        updated = {key: value for key, value in entry.items() if key not in drop}
+        updated.update(fields)
+        line = json.dumps(updated) + "\n"
+
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.entries[updated["id"]] = updated
+            self._index_paths()
+
+        return updated
+
+    def owner_of(self, path: Path) -> dict | None:
+        """Get the entry of the Memory stored at path, if one was recorded or claimed"""
+        relative = self._relative(path)
+        return self._claims.get(relative) or self.paths.get(relative)
+
+    def claim(self, memory: dict, path: Path, digest: str) -> None:
+        """Note the Memory and content digest of a file placed this run, before it is recorded"""
+        with self._lock:
+            self._claims[self._relative(path)] = {"id": memory_id(memory), "sha256": digest}
+
+    def digest_at(self, path: Path) -> str | None:
+        """Content digest (as downloaded) of the Memory stored at path, if known"""
+        owner = self.owner_of(path)
+        return owner.get("sha256") if owner else None
+
+    def relocate(self, moves: dict[Path, Path]) -> int:
+        """
+        Update stored paths after files were moved (e.g. by a layout migration)
+        and compact all manifest files into this writer's file
+
+        Args:
+            moves: Mapping of old path -> new path
+
+        Returns:
+            Number of entries whose path changed
+        """
+        relative_moves = {
+            self._relative(old): self._relative(new) for old, new in moves.items()
+        }
+
+        with self._lock:
+            changed = 0
+            for entry in self.entries.values():
+                new_path = relative_moves.get(entry["path"])
+                if new_path is not None:
+                    entry["path"] = new_path
+                    changed += 1
+
+            old_files = [path for path in self.files() if path != self.path]
+
+            # Write the compacted manifest atomically before removing the others
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            tmp_path.replace(self.path)
+            for path in old_files:
+                path.unlink()
+            self._index_paths()
+
+        return changed
+
+    def resolve(self, entry: dict) -> Path:
+        """Absolute path of an entry's file or folder"""
+        return self.out_dir / entry["path"]
+
+# =========================================================================== #
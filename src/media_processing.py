@@ -1,11 +1,16 @@
-from moviepy import VideoFileClip
 from .dependencies import *
 from .exceptions import *
+from .governor import *
+from .metrics import METRICS
+from . import profiling
 from pathlib import Path
-from PIL import Image
 import subprocess
+import time
 import os
 
+# Pillow and moviepy (which drags in numpy and imageio) are imported inside the
+# merge functions so that startup and runs without overlays never pay for them.
+
 # =========================================================================== #
 
 """
@@ -14,6 +19,9 @@ Overlay PNG layer onto JPG image
 Args:
     jpg_path: Path to base JPG image (must end with "-main.jpg")
     png_path: Path to overlay PNG
+    governor: Optional memory governor. The merge waits until its estimated
+              peak memory fits; a JPG too large for the whole budget is
+              merged alone, always at full size
 
 Returns:
     Path to combined image (ends with "-combined.jpg")
@@ -23,7 +31,10 @@ Raises:
     ImageProcessingError: If any various parts of image processing fails
     ValueError: If jpg_path does not end with "-main.jpg"
 """
-def merge_jpg_with_overlay(jpg_path: Path, png_path: Path) -> Path:
+def merge_jpg_with_overlay(jpg_path: Path, png_path: Path,
+                           governor: MemoryGovernor | None = None) -> Path:
+
+    from PIL import Image
 
     if isinstance(jpg_path, str):
         jpg_path = Path(jpg_path)
@@ -46,8 +57,21 @@ def merge_jpg_with_overlay(jpg_path: Path, png_path: Path) -> Path:
 
     if combined_path.exists():
         print(f"Combined image already exists: {combined_path.name}, skipping merge")
-        return
+        return combined_path
+
+    # Estimate peak memory from the image headers and wait for room to merge
+    admitted = 0
+    if governor is not None:
+        try:
+            base_size = image_size(jpg_path)
+            overlay_size = image_size(png_path)
+        except Exception as e:
+            raise ImageProcessingError(f"Failed to read image dimensions: {e}")
+
+        admitted = estimate_jpg_merge_bytes(base_size, overlay_size)
+        governor.acquire(admitted)
 
+    merge_started = time.perf_counter()
     try:
 
         # Open images
@@ -83,7 +107,9 @@ def merge_jpg_with_overlay(jpg_path: Path, png_path: Path) -> Path:
         # Resize overlay if dimensions do not match
         if base_jpg.size != overlay.size:
             try:
-                overlay = overlay.resize(base_jpg.size, Image.LANCZOS)
+                resized = overlay.resize(base_jpg.size, Image.LANCZOS)
+                overlay.close()
+                overlay = resized
             except Exception as e:
                 raise ImageProcessingError(f"Failed to resize overlay from {overlay.size} to {base_jpg.size}: {e}")
 
@@ -93,6 +119,10 @@ def merge_jpg_with_overlay(jpg_path: Path, png_path: Path) -> Path:
         except Exception as e:
             raise ImageProcessingError(f"Failed to composite images: {e}")
 
+        # Inputs are no longer needed; free them before the RGB copy is made
+        base_jpg.close()
+        overlay.close()
+
         # Convert JPG back to RGB profile
         try:
             combined = combined.convert("RGB")
@@ -135,6 +165,9 @@ def merge_jpg_with_overlay(jpg_path: Path, png_path: Path) -> Path:
                 combined.close()
         except Exception:
             pass
+        METRICS.observe("merge_jpg", time.perf_counter() - merge_started)
+        if admitted:
+            governor.release(admitted)
 
 # =========================================================================== #
 
@@ -144,6 +177,8 @@ Overlay PNG layer onto MP4 video
 Args:
     mp4_path: Path to base MP4 video (must end with "-main.mp4")
     png_path: Path to overlay PNG
+    governor: Optional memory governor. The overlay resize and ffmpeg encode
+              wait until their estimated peak memory fits
 
 Returns:
     Path to combined video (ends with "-combined.mp4")
@@ -154,7 +189,11 @@ Raises:
     VideoProcessingError: If any various parts of image processing fails
     ValueError: If mp4_path does not end with "-main.mp4"
 """
-def merge_mp4_with_overlay(mp4_path: Path, png_path: Path) -> Path:
+def merge_mp4_with_overlay(mp4_path: Path, png_path: Path,
+                           governor: MemoryGovernor | None = None) -> Path:
+
+    from moviepy import VideoFileClip
+    from PIL import Image
 
     # Validate inputs are Path objects
     if isinstance(mp4_path, str):
@@ -189,11 +228,14 @@ def merge_mp4_with_overlay(mp4_path: Path, png_path: Path) -> Path:
 
     video = None
     overlay = None
+    admitted = 0
 
     try:
         # Get MP4 dimensions using moviepy
         try:
-            video = VideoFileClip(mp4_path)
+            # moviepy probes the file by running ffmpeg
+            with profiling.span("probe_video", cat="subprocess"):
+                video = VideoFileClip(mp4_path)
             video_width, video_height = video.size
 
             if video_width <= 0 or video_height <= 0:
@@ -207,6 +249,15 @@ def merge_mp4_with_overlay(mp4_path: Path, png_path: Path) -> Path:
                 except Exception:
                     pass
 
+        # Wait until the resize and ffmpeg encode fit in the memory budget
+        if governor is not None:
+            try:
+                overlay_size = image_size(png_path)
+            except Exception as e:
+                raise VideoProcessingError(f"Failed to read overlay dimensions: {e}")
+            admitted = estimate_mp4_merge_bytes((video_width, video_height), overlay_size)
+            governor.acquire(admitted)
+
         # Resize png file to mp4 dimensions
         try:
             overlay = Image.open(png_path)
@@ -237,7 +288,8 @@ def merge_mp4_with_overlay(mp4_path: Path, png_path: Path) -> Path:
         ]
 
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            with METRICS.stage("ffmpeg"):
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
             if result.returncode != 0:
                 # Check if error is HEVC decoder issue
                 if "hevc" in result.stderr.lower() and "decoder" in result.stderr.lower():
@@ -273,5 +325,8 @@ def merge_mp4_with_overlay(mp4_path: Path, png_path: Path) -> Path:
     except Exception as e:
         # Catch any unexpected errors
         raise VideoProcessingError(f"Unexpected error merging video with overlay: {e}")
+    finally:
+        if admitted:
+            governor.release(admitted)
 
 # =========================================================================== #
@@ -1,6 +1,8 @@
 from datetime import datetime
 from .dependencies import *
 from .exceptions import *
+from .metrics import METRICS
+from .tags import *
 from pathlib import Path
 import subprocess
 import os
@@ -64,13 +66,17 @@ Args:
     lat: Latitude decimal as a string
     lon: Longitude decimal as a string
 
+Returns:
+    True if the tags were written or already matched, False if the format
+    is unsupported or exiftool reported an error
+
 Raises:
     FileNotFoundError: If file or directory doesn't exist
     DependencyError: If exiftool not found
     ValueError: If coordinates are invalid
     MemorEasyError: If exiftool fails
 """
-def write_exif(file_path: Path, date_time_str: str, lat: str, lon: str) -> None:
+def write_exif(file_path: Path, date_time_str: str, lat: str, lon: str) -> bool:
 
     if isinstance(file_path, str):
         file_path = Path(file_path)
@@ -84,11 +90,20 @@ def write_exif(file_path: Path, date_time_str: str, lat: str, lon: str) -> None:
     # Blank ext accounts for directories/folders
     if ext not in ['', '.jpg', '.jpeg', '.mp4', '.png']:
         print(f"Skipping EXIF for {file_path} for unsupported format: {ext}")
-        return
+        return False
 
     if ext == '.jpeg':
         ext = 'jpg'
 
+    # Files tagged by an earlier run are left alone, so reruns don't rewrite them
+    if ext and tags_match(read_tags(file_path), date_time_str, lat, lon):
+        METRICS.add("exif_skipped")
+        try:
+            set_file_timestamp(file_path, date_time_str[:-4])
+        except Exception as e:
+            print(f"Warning: Could not set modified-date timestamp for {file_path}: {e}.")
+        return True
+
     try:
         exiftool_path = find_dependency("exiftool")
     except DependencyError:
@@ -138,21 +153,29 @@ def write_exif(file_path: Path, date_time_str: str, lat: str, lon: str) -> None:
     cmd.extend(["-overwrite_original", str(file_path)])
 
     # run exiftool program to update metadata tags on file
+    tagged = False
     try:
         # Skip when it is a directory
         if len(ext) > 0:
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            with METRICS.stage("exiftool"):
+                result = subprocess.run(cmd, capture_output=True, text=True)
 
             if result.returncode != 0:
                 print(f"Exiftool error for {file_path}: {result.stderr.strip()}")
+            else:
+                tagged = True
 
     except Exception as e:
         raise MemorEasyError(f"Exiftool failed for {file_path}: {e}")
 
-    try:
-        set_file_timestamp(file_path, date_time_str[:-4])
+    # The Memory date as mtime marks the file as tagged (see reprocess.needs_tags)
+    if tagged:
+        try:
+            set_file_timestamp(file_path, date_time_str[:-4])
 
-    except Exception as e:
-        print(f"Warning: Could not set modified-date timestamp for {file_path}: {e}.")
+        except Exception as e:
+            print(f"Warning: Could not set modified-date timestamp for {file_path}: {e}.")
+
+    return tagged
 
 # =========================================================================== #
@@ -0,0 +1,211 @@
+from contextlib import contextmanager
+from . import profiling
+from pathlib import Path
+import threading
+import json
+import time
+
+# =========================================================================== #
+
+# Pipeline stages that are timed
+#   http_ttfb: request sent until response headers received
+#   transfer:  response body streamed to disk
+#   unzip:     ZIP Memory extracted
+#   exiftool:  one exiftool invocation
+#   merge_jpg: Pillow overlay merge
+#   ffmpeg:    ffmpeg overlay encode
+STAGES = ("http_ttfb", "transfer", "unzip", "exiftool", "merge_jpg", "ffmpeg")
+
+# Stages that are external processes, shown as such in profiling traces
+SUBPROCESS_STAGES = ("exiftool", "ffmpeg")
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# =========================================================================== #
+
+"""
+Get a percentile from sorted samples using linear interpolation
+
+Args:
+    samples: Sorted list of values
+    percent: Percentile between 0 and 100
+
+Returns:
+    Percentile value, or 0.0 if there are no samples
+"""
+def percentile(samples: list[float], percent: float) -> float:
+
+    if not samples:
+        return 0.0
+
+    rank = (len(samples) - 1) * percent / 100
+    low = int(rank)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (rank - low)
+
+# =========================================================================== #
+
+class Histogram:
+    """Latency histogram that also keeps raw samples for exact percentiles"""
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.samples = []
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.total += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+
+    def summary(self) -> dict:
+        samples = sorted(self.samples)
+        return {
+            "count": len(samples),
+            "total_seconds": round(self.total, 6),
+            "mean_seconds": round(self.total / len(samples), 6) if samples else 0.0,
+            "p50_seconds": round(percentile(samples, 50), 6),
+            "p90_seconds": round(percentile(samples, 90), 6),
+            "p99_seconds": round(percentile(samples, 99), 6),
+            "max_seconds": round(samples[-1], 6) if samples else 0.0,
+            "buckets": {str(bound): count for bound, count in zip(BUCKETS, self.bucket_counts)},
+        }
+
+# =========================================================================== #
+
+class Metrics:
+    """
+    Thread-safe recorder for per-stage timings, counters and per-Memory records
+
+    Stage timings are attributed to the Memory being processed on the current
+    thread (see item()), so each entry of the run report shows where its time
+    went.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded so far and restart the run clock"""
+        with self._lock:
+            self.started = time.time()
+            self.histograms = {stage: Histogram() for stage in STAGES}
+            self.counters = {}
+            self.items = []
+
+    def _current_item(self) -> dict | None:
+        return getattr(self._local, "item", None)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one timing for a stage (and a trace span when profiling)"""
+        cat = "subprocess" if stage in SUBPROCESS_STAGES else "stage"
+        profiling.record_span(stage, time.perf_counter() - seconds, seconds, cat)
+        with self._lock:
+            self.histograms.setdefault(stage, Histogram()).observe(seconds)
+        item = self._current_item()
+        if item is not None:
+            item["stages"][stage] = round(item["stages"].get(stage, 0.0) + seconds, 6)
+
+    def add(self, counter: str, value: int = 1) -> None:
+        """Increase a run-wide counter (and the current Memory's, if any)"""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+        item = self._current_item()
+        if item is not None:
+            item[counter] = item.get(counter, 0) + value
+
+    def annotate(self, **fields) -> None:
+        """Attach fields (file type, status, ...) to the current Memory's record"""
+        item = self._current_item()
+        if item is not None:
+            item.update(fields)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as one occurrence of a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    @contextmanager
+    def item(self, idx: int, name: str):
+        """Collect everything recorded on this thread into one Memory's record"""
+        record = {"index": idx, "name": name, "stages": {}}
+        self._local.item = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 6)
+            self._local.item = None
+            with self._lock:
+                self.items.append(record)
+
+    def report(self) -> dict:
+        """Build the machine-readable run report"""
+        with self._lock:
+            elapsed = time.time() - self.started
+            stages = {name: hist.summary() for name, hist in self.histograms.items()}
+            counters = dict(self.counters)
+            items = sorted(self.items, key=lambda record: record["index"])
+
+        transfer_seconds = stages.get("transfer", {}).get("total_seconds", 0.0)
+        bytes_downloaded = counters.get("bytes_downloaded", 0)
+
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started)),
+            "elapsed_seconds": round(elapsed, 3),
+            "memories": len(items),
+            "counters": counters,
+            "throughput_mb_per_s": round(bytes_downloaded / transfer_seconds / 1e6, 3)
+                                   if transfer_seconds else 0.0,
+            "stages": stages,
+            "items": items,
+        }
+
+    def write_json(self, path: Path) -> None:
+        """Write the run report as JSON"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_prometheus(self, path: Path) -> None:
+        """Write stage histograms and counters in Prometheus text format"""
+        with self._lock:
+            histograms = {name: hist for name, hist in self.histograms.items() if hist.samples}
+            counters = dict(self.counters)
+
+        lines = [
+            "# HELP memoreasy_stage_seconds Time spent in each pipeline stage.",
+            "# TYPE memoreasy_stage_seconds histogram",
+        ]
+        for name, hist in histograms.items():
+            for bound, count in zip(BUCKETS, hist.bucket_counts):
+                lines.append(f'memoreasy_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+            lines.append(f'memoreasy_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {len(hist.samples)}')
+            lines.append(f'memoreasy_stage_seconds_sum{{stage="{name}"}} {hist.total:.6f}')
+            lines.append(f'memoreasy_stage_seconds_count{{stage="{name}"}} {len(hist.samples)}')
+
+        for counter, value in sorted(counters.items()):
+            metric = f"memoreasy_{counter}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+# =========================================================================== #
+
+# Metrics for the current run, shared by every stage of the pipeline
+METRICS = Metrics()
+
+# =========================================================================== #
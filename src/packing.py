@@ -0,0 +1,225 @@
+from .identity import memory_id
+from pathlib import Path
+import threading
+import tarfile
+import zipfile
+import struct
+import shutil
+import json
+import os
+import re
+
+# =========================================================================== #
+
+# Supported archive formats for packed output
+PACK_FORMATS = ("tar", "zip")
+
+# Volumes roll over once they reach this size
+DEFAULT_VOLUME_SIZE = 4 * 1024 ** 3
+
+# Volume file names: memories-0001.tar, memories-0002.tar, ... Sharded runs
+# use memories-shard1of4-0001.tar, ... so hosts never number the same volume
+VOLUME_PREFIX = "memories"
+
+# Sidecar index next to each volume
+INDEX_SUFFIX = ".index.jsonl"
+
+# Size of a ZIP local file header before its name and extra field
+ZIP_LOCAL_HEADER_SIZE = 30
+
+# =========================================================================== #
+
+class Packer:
+    """
+    Appends finished Memories to rolling tar or uncompressed zip volumes
+
+    Files are stored without compression (media doesn't compress), so each
+    one is a contiguous byte range of its volume. A sidecar index with the
+    offset and size of every file, plus the Memory's date and location, is
+    written next to each volume as files are added, so single Memories can
+    be extracted without reading the archive, even from a volume left
+    unfinished by a crash.
+    """
+
+    def __init__(self, out_dir: Path, fmt: str = "tar", volume_size: int = DEFAULT_VOLUME_SIZE,
+                 prefix: str = VOLUME_PREFIX):
+        if fmt not in PACK_FORMATS:
+            raise ValueError(f"Unknown pack format '{fmt}'. Expected one of: {', '.join(PACK_FORMATS)}")
+        self.out_dir = Path(out_dir)
+        self.fmt = fmt
+        self.volume_size = volume_size
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._archive = None
+        self._volume_path = None
+        self._index = None
+
+        # Never append to volumes of earlier runs; continue the numbering
+        pattern = re.compile(rf"^{re.escape(prefix)}-(\d{{4,}})\.(tar|zip)$")
+        numbers = [int(match.group(1)) for match in
+                   (pattern.match(path.name) for path in self.out_dir.glob(f"{prefix}-*"))
+                   if match]
+        self._next_number = max(numbers, default=0) + 1
+
+    def _open_volume(self) -> None:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        while True:
+            self._volume_path = self.out_dir / f"{self.prefix}-{self._next_number:04d}.{self.fmt}"
+            self._next_number += 1
+            # Created exclusively: a volume started by another run since the
+            # numbering was read is skipped, never overwritten
+            try:
+                if self.fmt == "tar":
+                    self._archive = tarfile.open(self._volume_path, "x", format=tarfile.PAX_FORMAT)
+                else:
+                    self._archive = zipfile.ZipFile(self._volume_path, "x", zipfile.ZIP_STORED, allowZip64=True)
+            except FileExistsError:
+                continue
+            break
+        self._index = open(self._volume_path.with_name(self._volume_path.name + INDEX_SUFFIX),
+                           "a", encoding="utf-8")
+
+    def _close_volume(self) -> None:
+        if self._archive is not None:
+            self._archive.close()
+            self._index.close()
+            self._archive = None
+            self._index = None
+
+    def _add_file(self, path: Path, arcname: str) -> tuple[int, int]:
+        # Returns (data offset, size) of the file within the volume
+        size = path.stat().st_size
+        if self.fmt == "tar":
+            info = self._archive.gettarinfo(str(path), arcname)
+            header = info.tobuf(self._archive.format, self._archive.encoding, self._archive.errors)
+            offset = self._archive.offset + len(header)
+            with open(path, "rb") as f:
+                self._archive.addfile(info, f)
+            return offset, size
+
+        self._archive.write(path, arcname)
+        info = self._archive.getinfo(arcname)
+        # The local header's extra field can differ from the central one
+        self._archive.fp.flush()
+        with open(self._volume_path, "rb") as f:
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+        return info.header_offset + ZIP_LOCAL_HEADER_SIZE + name_length + extra_length, size
+
+    def add(self, memory: dict, path: Path) -> tuple[str, dict[str, int]]:
+        """
+        Move a finished Memory file or ZIP folder into the current volume
+
+        Args:
+            memory: Memory dictionary with keys: date, type, lat, lon, url
+            path: Tagged file, or folder of an extracted ZIP Memory
+
+        Returns:
+            Tuple of (name of the volume the Memory was added to, dictionary
+            of archive member name -> data offset)
+        """
+        files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+        offsets = {}
+
+        with self._lock:
+            if self._archive is None:
+                self._open_volume()
+
+            for file in files:
+                arcname = Path(os.path.relpath(file, self.out_dir)).as_posix()
+                offset, size = self._add_file(file, arcname)
+                offsets[arcname] = offset
+                entry = {
+                    "name": arcname,
+                    "offset": offset,
+                    "size": size,
+                    "id": memory_id(memory),
+                    "date": memory.get("date"),
+                    "lat": memory.get("lat"),
+                    "lon": memory.get("lon"),
+                    "mtime": int(file.stat().st_mtime),
+                }
+                self._index.write(json.dumps(entry) + "\n")
+
+            # Index lines only ever point at data already on disk
+            if self.fmt == "zip":
+                self._archive.fp.flush()
+            else:
+                self._archive.fileobj.flush()
+            self._index.flush()
+            volume = self._volume_path.name
+
+            if self._volume_path.stat().st_size >= self.volume_size:
+                self._close_volume()
+
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+        return volume, offsets
+
+    def close(self) -> None:
+        """Finish the current volume (tar end blocks / zip central directory)"""
+        with self._lock:
+            self._close_volume()
+
+# =========================================================================== #
+
+"""
+Load the sidecar indexes of every volume in an output directory
+
+Args:
+    out_dir: Output directory holding the volumes
+    prefix: Volume name prefix; shard volumes extend it, so they are included
+
+Returns:
+    Dictionary of archive member name -> index entry (with "volume" added)
+"""
+def load_pack_index(out_dir: Path, prefix: str = VOLUME_PREFIX) -> dict[str, dict]:
+
+    index = {}
+    for index_path in sorted(Path(out_dir).glob(f"{prefix}-*{INDEX_SUFFIX}")):
+        volume = index_path.name[:-len(INDEX_SUFFIX)]
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entry["volume"] = volume
+                index[entry["name"]] = entry
+    return index
+
+# =========================================================================== #
+
+"""
+Copy one packed file out of its volume by seeking straight to it
+
+Args:
+    out_dir: Output directory holding the volumes
+    entry: Index entry from load_pack_index
+    dest_dir: Directory to extract into; the member's relative path is kept
+
+Returns:
+    Path of the extracted file
+"""
+def extract_packed(out_dir: Path, entry: dict, dest_dir: Path) -> Path:
+
+    dest = Path(dest_dir) / entry["name"]
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(Path(out_dir) / entry["volume"], "rb") as src, open(dest, "wb") as dst:
+        src.seek(entry["offset"])
+        remaining = entry["size"]
+        while remaining:
+            chunk = src.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                raise OSError(f"{entry['volume']} ends before {entry['name']} is complete")
+            dst.write(chunk)
+            remaining -= len(chunk)
+
+    if entry.get("mtime"):
+        os.utime(dest, (entry["mtime"], entry["mtime"]))
+    return dest
+
+# =========================================================================== #
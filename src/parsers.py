@@ -1,22 +1,27 @@
 from .exceptions import *
 from .validators import *
-from bs4 import BeautifulSoup
+from .identity import dedupe_memories
+from . import profiling
 import re
+import os
 
 # =========================================================================== #
 
 """
 Parse user-provided HTML file for user-specific image info
 
+Args:
+    file_path: Path to memories_history.html
+
 Returns:
     html_text: Raw HTML content from memories_history.html
 Raises:
     InvalidInputFileError: If HTML structure does not match expected pattern
 """
-def parse_html() -> str:
+def parse_html(file_path: str = "./memories_history.html") -> str:
     target_string = "<div id='mem-info-bar'"
 
-    valid_user_file = validate_input_file("./memories_history.html")
+    valid_user_file = validate_input_file(file_path)
 
     # Read through user file to find relevant image/video data and API links
     html_text = None
@@ -51,8 +56,11 @@ Raises:
 """
 def parse_snapchat_memories(html_text) -> list[dict[str, str, str, str, str]]:
 
+    from bs4 import BeautifulSoup
+
     try:
-        soup = BeautifulSoup(html_text, "html.parser")
+        with profiling.span("BeautifulSoup"):
+            soup = BeautifulSoup(html_text, "html.parser")
     except Exception as e:
         raise ParseError(f"Failed to parse HTML: {e}")
 
@@ -62,7 +70,8 @@ def parse_snapchat_memories(html_text) -> list[dict[str, str, str, str, str]]:
             "No table found in HTML. The memories_history.html file may be corrupted or incorrect."
         )
 
-    rows = soup.find_all("tr")
+    with profiling.span("find_rows"):
+        rows = soup.find_all("tr")
     if len(rows) < 2:
         raise ParseError(
             "Table has no data rows. The relevant section of memories_history.html file appears to be empty."
@@ -154,3 +163,61 @@ def parse_snapchat_memories(html_text) -> list[dict[str, str, str, str, str]]:
     return memories
 
 # =========================================================================== #
+
+"""
+Read and parse one export file into Memories
+
+Args:
+    file_path: Path to a memories_history.html
+
+Returns:
+    List of Memory dictionaries with keys: date, type, lat, lon, url
+
+Raises:
+    InvalidInputFileError: If the file is missing or not a Snapchat export
+    ParseError: If the Memories table is invalid
+"""
+def parse_export(file_path) -> list[dict[str, str, str, str, str]]:
+
+    with profiling.span("parse_html"):
+        html_text = parse_html(file_path)
+    with profiling.span("parse_snapchat_memories"):
+        return parse_snapchat_memories(html_text)
+
+# =========================================================================== #
+
+"""
+Parse several exports and merge them into one deduplicated Memory list
+
+Exports are parsed in separate processes since BeautifulSoup is CPU bound and
+holds the GIL; a single export is parsed in-process.
+
+Args:
+    file_paths: Paths to memories_history.html files, in order of precedence
+    workers: Maximum number of parser processes (default: one per CPU)
+
+Returns:
+    Merged list of Memory dictionaries, each Memory listed once
+
+Raises:
+    InvalidInputFileError: If any file is missing or not a Snapchat export
+    ParseError: If any export's Memories table is invalid
+"""
+def parse_exports(file_paths: list, workers: int | None = None) -> list[dict[str, str, str, str, str]]:
+
+    if len(file_paths) == 1:
+        return parse_export(file_paths[0])
+
+    # Loads multiprocessing, which single-export runs never need
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(len(file_paths), workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        memory_lists = list(executor.map(parse_export, file_paths))
+
+    memories, duplicates = dedupe_memories(memory_lists)
+    print(f"Merged {len(file_paths)} exports: {len(memories)} unique memories, "
+          f"{duplicates} duplicate(s) dropped")
+    return memories
+
+# =========================================================================== #
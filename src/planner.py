@@ -0,0 +1,418 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .downloaders import content_type_ext
+from .identity import memory_id
+from .manifest import state_dir
+from .budget import format_size
+from .scheduling import *
+from pathlib import Path
+import threading
+import json
+import time
+import re
+
+# =========================================================================== #
+
+# Cached probe results and calibrated rates, inside the bookkeeping folder
+PLAN_NAME = "plan.json"
+RATES_NAME = "rates.json"
+
+# Rough per-stage costs used until a run has been measured
+#   ttfb_seconds:          request sent until response headers, per Memory
+#   transfer_bytes_per_s:  download speed of one connection
+#   exiftool_seconds:      one exiftool call
+#   unzip_seconds:         extracting one ZIP Memory
+#   merge_jpg_seconds:     one Pillow overlay merge
+#   ffmpeg_seconds_per_mb: overlay encode time per MB of ZIP archive
+DEFAULT_RATES = {
+    "ttfb_seconds": 0.5,
+    "transfer_bytes_per_s": 5e6,
+    "exiftool_seconds": 0.3,
+    "unzip_seconds": 0.05,
+    "merge_jpg_seconds": 0.5,
+    "ffmpeg_seconds_per_mb": 1.5,
+}
+
+# Download size assumed for Memories that haven't been probed, by type
+TYPICAL_SIZES = {"Image": 1_500_000, "Video": 8_000_000}
+
+# Content-Range: bytes 0-0/12345
+CONTENT_RANGE_PATTERN = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+# =========================================================================== #
+
+"""
+Derive per-stage rates from a run report (see Metrics.report)
+
+Args:
+    report: Parsed run report
+
+Returns:
+    Rates with the keys of DEFAULT_RATES; stages the run never reached keep
+    their default
+"""
+def rates_from_report(report: dict) -> dict:
+
+    rates = dict(DEFAULT_RATES)
+    stages = report.get("stages", {})
+
+    def mean(stage):
+        summary = stages.get(stage, {})
+        return summary.get("mean_seconds") if summary.get("count") else None
+
+    for stage, key in (("http_ttfb", "ttfb_seconds"), ("exiftool", "exiftool_seconds"),
+                       ("unzip", "unzip_seconds"), ("merge_jpg", "merge_jpg_seconds")):
+        if mean(stage) is not None:
+            rates[key] = mean(stage)
+
+    transfer_seconds = stages.get("transfer", {}).get("total_seconds", 0)
+    bytes_downloaded = report.get("counters", {}).get("bytes_downloaded", 0)
+    if transfer_seconds and bytes_downloaded:
+        rates["transfer_bytes_per_s"] = bytes_downloaded / transfer_seconds
+
+    ffmpeg_seconds = 0.0
+    ffmpeg_bytes = 0
+    for item in report.get("items", []):
+        if item.get("stages", {}).get("ffmpeg"):
+            ffmpeg_seconds += item["stages"]["ffmpeg"]
+            ffmpeg_bytes += item.get("bytes_downloaded", 0)
+    if ffmpeg_bytes:
+        rates["ffmpeg_seconds_per_mb"] = ffmpeg_seconds / (ffmpeg_bytes / 1e6)
+
+    return rates
+
+# =========================================================================== #
+
+"""
+Load calibrated rates
+
+Args:
+    out_dir: Output directory whose last run's rates are used
+    report_path: Run report to calibrate from instead
+
+Returns:
+    Tuple of (rates, description of where they came from)
+"""
+def load_rates(out_dir: Path, report_path: Path | None = None) -> tuple[dict, str]:
+
+    if report_path is not None:
+        with open(report_path, "r", encoding="utf-8") as f:
+            return rates_from_report(json.load(f)), f"run report {report_path}"
+
+    path = state_dir(out_dir) / RATES_NAME
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return {**DEFAULT_RATES, **json.load(f)}, "the last run in this output directory"
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    return dict(DEFAULT_RATES), "default rates (no run measured yet)"
+
+# =========================================================================== #
+
+"""
+Save the rates measured by a run for later plans
+
+Args:
+    out_dir: Output directory of the run
+    report: The run's report
+"""
+def save_rates(out_dir: Path, report: dict) -> None:
+
+    if not report.get("items"):
+        return
+    path = state_dir(out_dir) / RATES_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rates_from_report(report), f, indent=2)
+
+# =========================================================================== #
+
+class PlanCache:
+    """
+    Probed type and size of each Memory, keyed by its stable identity
+
+    Stored as one JSON file in the bookkeeping folder and reused by later
+    plans and runs.
+    """
+
+    def __init__(self, out_dir: Path):
+        self.path = state_dir(out_dir) / PLAN_NAME
+        self.entries = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self.entries = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, memory: dict) -> dict | None:
+        """Probe result for a Memory (keys ext, bytes), or None if never probed"""
+        return self.entries.get(memory_id(memory))
+
+    def set(self, memory: dict, ext: str | None, size: int | None) -> None:
+        with self._lock:
+            self.entries[memory_id(memory)] = {"ext": ext, "bytes": size, "probed": int(time.time())}
+
+    def save(self) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            tmp_path.replace(self.path)
+
+# =========================================================================== #
+
+"""
+Learn a download's type and size without fetching its body
+
+Sends a HEAD request; if the server refuses it or leaves out the length,
+falls back to a GET for the first byte and reads the total from
+Content-Range.
+
+Args:
+    session: requests Session
+    url: Download URL
+
+Returns:
+    Tuple of (extension or None, size in bytes or None)
+
+Raises:
+    requests.exceptions.RequestException: If both requests fail
+"""
+def probe_url(session, url: str) -> tuple[str | None, int | None]:
+
+    import requests
+
+    content_type = None
+    try:
+        r = session.head(url, allow_redirects=True, timeout=30)
+        if r.ok:
+            content_type = r.headers.get("Content-Type")
+            length = r.headers.get("Content-Length")
+            if content_type and length and length.isdigit():
+                return content_type_ext(content_type), int(length)
+    except requests.exceptions.RequestException:
+        pass
+
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=30) as r:
+        r.raise_for_status()
+        content_type = r.headers.get("Content-Type") or content_type or ""
+        match = CONTENT_RANGE_PATTERN.match(r.headers.get("Content-Range", ""))
+        if match:
+            size = int(match.group(1))
+        else:
+            # Server ignored the range and is sending the whole body
+            length = r.headers.get("Content-Length")
+            size = int(length) if length and length.isdigit() else None
+        return content_type_ext(content_type), size
+
+# =========================================================================== #
+
+"""
+Probe every Memory concurrently, skipping those already in the cache
+
+Args:
+    memories: Memory dictionaries with keys: date, type, lat, lon, url
+    cache: Plan cache to read from and update
+    concurrency: Number of requests in flight
+    refresh: Probe Memories even if they are cached
+
+Returns:
+    List of (Memory, reason) for Memories that could not be probed; they are
+    left out of the cache and probed again next time
+"""
+def probe_memories(memories: list[dict], cache: PlanCache, concurrency: int = 16,
+                   refresh: bool = False) -> list[tuple[dict, str]]:
+
+    import requests
+
+    todo = [memory for memory in memories
+            if memory.get("url") and (refresh or cache.get(memory) is None)]
+    failures = []
+    if not todo:
+        return failures
+
+    # One keep-alive session per thread
+    local = threading.local()
+
+    def probe(memory):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        ext, size = probe_url(local.session, memory["url"])
+        cache.set(memory, ext, size)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(probe, memory): memory for memory in todo}
+        try:
+            for count, future in enumerate(as_completed(futures), 1):
+                try:
+                    future.result()
+                except Exception as e:
+                    # Odd responses (bad headers, unknown types, ...) leave
+                    # the Memory unprobed and counted as unknown in the plan
+                    failures.append((futures[future], str(e) or type(e).__name__))
+                print(f"\rProbed {count}/{len(todo)}", end="", flush=True)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            cache.save()
+
+    print()
+    return failures
+
+# =========================================================================== #
+
+"""
+Estimate the seconds one Memory takes to download and process
+
+Args:
+    memory: Memory dictionary with keys: date, type, lat, lon, url
+    probed: Cached probe result (keys ext, bytes) or None
+    rates: Per-stage rates (see DEFAULT_RATES)
+
+Returns:
+    Estimated seconds
+"""
+def estimate_memory_seconds(memory: dict, probed: dict | None, rates: dict) -> float:
+
+    probed = probed or {}
+    size = probed.get("bytes") or 0
+    seconds = rates["ttfb_seconds"] + size / rates["transfer_bytes_per_s"] + rates["exiftool_seconds"]
+
+    if probed.get("ext") == ".zip":
+        # Main file and combined file are both tagged
+        seconds += rates["unzip_seconds"] + rates["exiftool_seconds"]
+        if memory.get("type") == "Video":
+            seconds += size / 1e6 * rates["ffmpeg_seconds_per_mb"]
+        else:
+            seconds += rates["merge_jpg_seconds"]
+
+    return seconds
+
+# =========================================================================== #
+
+"""
+Estimate the processing time of every Memory
+
+Memories that haven't been probed are assumed to have the average size of
+the probed Memories of their type (or a typical size if none were probed)
+and no overlay.
+
+Args:
+    memories: Memories to be downloaded
+    cache: Plan cache holding probe results
+    rates: Per-stage rates
+
+Returns:
+    Estimated seconds per Memory, in the order of memories
+"""
+def estimate_costs(memories: list[dict], cache: PlanCache, rates: dict) -> list[float]:
+
+    probes = [cache.get(memory) for memory in memories]
+
+    sizes = {}
+    for memory, probed in zip(memories, probes):
+        if probed and probed.get("bytes"):
+            sizes.setdefault(memory.get("type"), []).append(probed["bytes"])
+    typical = {**TYPICAL_SIZES, **{kind: sum(values) / len(values) for kind, values in sizes.items()}}
+
+    costs = []
+    for memory, probed in zip(memories, probes):
+        if not probed or not probed.get("bytes"):
+            probed = {"ext": None, "bytes": typical.get(memory.get("type"), TYPICAL_SIZES["Image"])}
+        costs.append(estimate_memory_seconds(memory, probed, rates))
+    return costs
+
+# =========================================================================== #
+
+"""
+Summarise a plan: totals, breakdown by type and estimated wall time
+
+Args:
+    memories: Memories to be downloaded
+    cache: Plan cache holding their probe results
+    rates: Per-stage rates
+    workers: Worker count the run will use
+    schedule: Order the run will process Memories in (see SCHEDULES)
+
+Returns:
+    Plan summary dictionary
+"""
+def summarize_plan(memories: list[dict], cache: PlanCache, rates: dict, workers: int = 1,
+                   schedule: str = "table") -> dict:
+
+    by_type = {}
+    unknown = 0
+    total_bytes = 0
+    ffmpeg_jobs = 0
+    ffmpeg_bytes = 0
+    costs = estimate_costs(memories, cache, rates)
+
+    for memory in memories:
+        probed = cache.get(memory)
+        if probed is None or probed.get("ext") is None:
+            unknown += 1
+        else:
+            size = probed.get("bytes") or 0
+            stats = by_type.setdefault(probed["ext"], {"count": 0, "bytes": 0})
+            stats["count"] += 1
+            stats["bytes"] += size
+            total_bytes += size
+            if probed["ext"] == ".zip" and memory.get("type") == "Video":
+                ffmpeg_jobs += 1
+                ffmpeg_bytes += size
+
+    total_seconds = sum(costs)
+    wall_seconds = simulate_makespan([costs[idx] for idx in schedule_order(costs, schedule)], workers)
+    # What the run would take with the slowest Memories started first
+    longest_seconds = simulate_makespan(sorted(costs, reverse=True), workers)
+
+    return {
+        "memories": len(memories),
+        "unknown": unknown,
+        "bytes": total_bytes,
+        "by_type": by_type,
+        "ffmpeg_jobs": ffmpeg_jobs,
+        "ffmpeg_bytes": ffmpeg_bytes,
+        "ffmpeg_seconds": ffmpeg_bytes / 1e6 * rates["ffmpeg_seconds_per_mb"],
+        "work_seconds": total_seconds,
+        "wall_seconds": wall_seconds,
+        "longest_seconds": longest_seconds,
+        "workers": workers,
+        "schedule": schedule,
+    }
+
+# =========================================================================== #
+
+"""
+Print a plan summary
+
+Args:
+    summary: Result of summarize_plan
+    rates_source: Where the rates came from
+"""
+def print_plan(summary: dict, rates_source: str) -> None:
+
+    print(f"\n{'='*50}")
+    print(f"Memories: {summary['memories']}  Total download: {format_size(summary['bytes'])}")
+    for ext, stats in sorted(summary["by_type"].items()):
+        print(f"  {ext[1:].upper():>4}: {stats['count']:>7}  {format_size(stats['bytes']):>10}")
+    if summary["unknown"]:
+        print(f"  Unknown: {summary['unknown']} (could not be probed)")
+    print(f"ffmpeg overlay encodes: {summary['ffmpeg_jobs']} "
+          f"({format_size(summary['ffmpeg_bytes'])}, ~{format_duration(summary['ffmpeg_seconds'])})")
+    print(f"Estimated time with {summary['workers']} worker(s), {summary['schedule']} order: "
+          f"~{format_duration(summary['wall_seconds'])}")
+    if summary["longest_seconds"] < summary["wall_seconds"] * 0.95:
+        print(f"  --schedule longest would take ~{format_duration(summary['longest_seconds'])}")
+    print(f"  (rates from {rates_source})")
+    print(f"{'='*50}\n")
+
+# =========================================================================== #
@@ -0,0 +1,245 @@
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import threading
+import json
+import sys
+import time
+import os
+
+# =========================================================================== #
+
+# Returned by span() while tracing is off; nullcontext is reusable, so the
+# disabled path costs one global lookup and no allocation
+NULL_SPAN = nullcontext()
+
+# From Python 3.12 cProfile is built on sys.monitoring: only one profiler
+# can be active per process, and it sees the calls of every thread
+SHARED_PROFILER = sys.version_info >= (3, 12)
+
+# Active tracer and Python profiler, or None when profiling is off
+_tracer = None
+_profiler = None
+
+# =========================================================================== #
+
+class Tracer:
+    """
+    Collects spans as Chrome trace events ("X" complete events)
+
+    The output loads in chrome://tracing and https://ui.perfetto.dev, with one
+    track per worker thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._threads = {}
+        self.events = []
+
+    def add(self, name: str, start: float, duration: float, cat: str, args: dict | None) -> None:
+        """Record a span from perf_counter() start time and duration in seconds"""
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 3),
+            "dur": round(duration * 1e6, 3),
+            "pid": self._pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, cat: str, args: dict | None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter() - start, cat, args)
+
+    def write(self, path: Path) -> None:
+        """Write the trace as a Chrome/Perfetto JSON file"""
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+             "args": {"name": thread_name}}
+            for tid, thread_name in threads.items()
+        ]
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+
+# =========================================================================== #
+
+class PythonProfiler:
+    """
+    cProfile across threads: each thread that enters profiled() gets its own
+    profiler, and all of them are merged into one pstats file at the end.
+    Where only one profiler can be active (SHARED_PROFILER), all threads
+    share one that runs while any of them is inside profiled().
+    """
+
+    def __init__(self, shared: bool = SHARED_PROFILER):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.shared = shared
+        self.profiles = []
+        self._active_threads = 0
+
+    @contextmanager
+    def profiled(self):
+        # Nested calls on the same thread are already being profiled
+        if getattr(self._local, "active", False):
+            yield
+            return
+
+        self._local.active = True
+        try:
+            with self._shared_profile() if self.shared else self._thread_profile():
+                yield
+        finally:
+            self._local.active = False
+
+    @contextmanager
+    def _thread_profile(self):
+        import cProfile
+
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = cProfile.Profile()
+            self._local.profile = profile
+            with self._lock:
+                self.profiles.append(profile)
+
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    @contextmanager
+    def _shared_profile(self):
+        import cProfile
+
+        with self._lock:
+            if not self.profiles:
+                self.profiles.append(cProfile.Profile())
+            if self._active_threads == 0:
+                self.profiles[0].enable()
+            self._active_threads += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active_threads -= 1
+                if self._active_threads == 0:
+                    self.profiles[0].disable()
+
+    def write(self, path: Path) -> None:
+        """Merge every thread's profile and dump it in pstats format"""
+        import pstats
+
+        with self._lock:
+            profiles = [profile for profile in self.profiles if profile.getstats()]
+        if not profiles:
+            return
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stats = pstats.Stats(*profiles)
+        stats.dump_stats(str(path))
+
+# =========================================================================== #
+
+"""
+Turn on span tracing and/or Python profiling for this process
+
+Args:
+    trace: Collect Chrome trace spans
+    python: Collect cProfile statistics
+"""
+def enable(trace: bool = True, python: bool = False) -> None:
+
+    global _tracer, _profiler
+    if trace:
+        _tracer = Tracer()
+    if python:
+        _profiler = PythonProfiler()
+
+# =========================================================================== #
+
+"""
+Turn profiling off and return what was collected
+
+Returns:
+    Tuple of (Tracer or None, PythonProfiler or None)
+"""
+def disable() -> tuple[Tracer | None, PythonProfiler | None]:
+
+    global _tracer, _profiler
+    collected = (_tracer, _profiler)
+    _tracer = None
+    _profiler = None
+    return collected
+
+# =========================================================================== #
+
+"""
+Trace the enclosed block as a span when tracing is on
+
+Args:
+    name: Span name shown in the trace viewer
+    cat: Span category (e.g. "stage", "subprocess", "memory")
+    **args: Extra details shown when the span is selected
+
+Returns:
+    Context manager
+"""
+def span(name: str, cat: str = "stage", **args):
+
+    if _tracer is None:
+        return NULL_SPAN
+    return _tracer.span(name, cat, args or None)
+
+# =========================================================================== #
+
+"""
+Record an already-timed block as a span when tracing is on
+
+Args:
+    name: Span name
+    start: time.perf_counter() value when the block started
+    duration: Duration in seconds
+    cat: Span category
+"""
+def record_span(name: str, start: float, duration: float, cat: str = "stage") -> None:
+
+    if _tracer is not None:
+        _tracer.add(name, start, duration, cat, None)
+
+# =========================================================================== #
+
+"""
+Profile the enclosed block with cProfile when Python profiling is on
+
+Returns:
+    Context manager
+"""
+def profiled():
+
+    if _profiler is None:
+        return NULL_SPAN
+    return _profiler.profiled()
+
+# =========================================================================== #
@@ -0,0 +1,285 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from .media_processing import *
+from .exceptions import *
+from .metadata import *
+from .tags import *
+from .layout import TEMP_SUFFIXES, iter_memory_entries, memory_name
+from .downloaders import handle_zip
+from .manifest import Manifest
+from pathlib import Path
+
+# =========================================================================== #
+
+# Allowed difference between a file's mtime and its Memory date. FAT and
+# exFAT only store modification times to 2 seconds.
+MTIME_TOLERANCE = 2
+
+# =========================================================================== #
+
+@dataclass
+class ReprocessItem:
+    """Work left to do for one Memory file or folder in an output tree"""
+
+    # Memory file, ZIP folder or leftover ZIP archive
+    path: Path
+
+    # Metadata to write, with keys: date, lat, lon
+    memory: dict
+
+    # Manifest entry of the Memory, if one was recorded
+    entry: dict | None = None
+
+    # Files whose tags are missing
+    tag: list[Path] = field(default_factory=list)
+
+    # Files that are tagged but whose modified time was lost (e.g. copied)
+    touch: list[Path] = field(default_factory=list)
+
+    # (main file, overlay PNG) pairs that were never merged
+    merge: list[tuple[Path, Path]] = field(default_factory=list)
+
+    # ZIP archive that was downloaded but never extracted
+    unzip: bool = False
+
+# =========================================================================== #
+
+"""
+Check whether a file may still lack the tags write_exif would give it
+
+write_exif sets the file's modified time to the Memory date only once
+exiftool succeeded, so a different mtime means tagging failed or never ran,
+or that the mtime was lost since (e.g. by a copy). check_existing_tags tells
+these apart by reading the tags.
+
+Args:
+    path: Memory file
+    date_str: Memory date, e.g. "2025-12-09 11:10:51 UTC"
+
+Returns:
+    True if the file should be tagged again
+"""
+def needs_tags(path: Path, date_str: str) -> bool:
+
+    try:
+        expected = parse_memory_date(date_str)
+        return abs(path.stat().st_mtime - expected.timestamp()) > MTIME_TOLERANCE
+    except (OSError, ValueError):
+        return True
+
+# =========================================================================== #
+
+"""
+Work out what is missing for one extracted ZIP folder
+
+Args:
+    item: Item for the folder; its tag and merge lists are filled in
+    force: Tag every file even if its mtime looks right
+"""
+def plan_zip_folder(item: ReprocessItem, force: bool = False) -> None:
+
+    date_str = item.memory["date"]
+    for ext in (".jpg", ".mp4"):
+        for main in sorted(item.path.glob(f"*-main{ext}")):
+            overlay = main.with_name(main.name.replace(f"-main{ext}", "-overlay.png"))
+            combined = main.with_name(main.name.replace(f"-main{ext}", f"-combined{ext}"))
+
+            if force or needs_tags(main, date_str):
+                item.tag.append(main)
+
+            # A merge removes the overlay, so one still present was never merged
+            if overlay.exists():
+                item.merge.append((main, overlay))
+            elif combined.exists() and (force or needs_tags(combined, date_str)):
+                item.tag.append(combined)
+
+# =========================================================================== #
+
+"""
+Scan an output tree for Memories whose tags or overlay merges are missing
+
+Files are matched to their metadata through the manifest, or else by name
+through the export(s). Nothing is downloaded.
+
+Args:
+    out_dir: Root output directory, in any layout
+    memories: Memories parsed from the export(s); may be empty if the
+              manifest covers the tree
+    manifest: Manifest of the output directory, or None
+
+Returns:
+    Tuple of (items with work to do, number of entries with unknown metadata)
+"""
+def find_reprocess_work(out_dir: Path, memories: list[dict],
+                        manifest: Manifest | None = None) -> tuple[list[ReprocessItem], int]:
+
+    # First Memory wins for names shared by several; suffixed copies are
+    # only known to the manifest
+    by_name = {}
+    for memory in memories:
+        if memory.get("date"):
+            by_name.setdefault(memory_name(memory["date"]), memory)
+
+    items = []
+    unmatched = 0
+
+    for path in iter_memory_entries(out_dir):
+        if path.suffix in TEMP_SUFFIXES:
+            continue
+
+        entry = None
+        if manifest is not None:
+            # ZIP Memories are recorded by the folder they extract to
+            entry = manifest.owner_of(path.with_suffix("") if path.suffix == ".zip" else path)
+        memory = entry or by_name.get(path.name if path.is_dir() else path.stem)
+        if memory is None or not memory.get("date"):
+            unmatched += 1
+            continue
+
+        # Without a location write_exif can never succeed
+        if not memory.get("lat") or not memory.get("lon"):
+            continue
+
+        item = ReprocessItem(path=path, memory=memory, entry=entry)
+        force = bool(entry and entry.get("postprocess_error"))
+
+        if path.is_dir():
+            plan_zip_folder(item, force)
+        elif path.suffix == ".zip":
+            item.unzip = True
+        elif force or needs_tags(path, memory["date"]):
+            item.tag.append(path)
+
+        if item.tag or item.merge or item.unzip:
+            items.append(item)
+
+    check_existing_tags(items)
+    return items, unmatched
+
+# =========================================================================== #
+
+"""
+Move files that already carry the right tags from item.tag to item.touch
+
+Tags are read natively where possible (JPEG EXIF, MP4 moov atoms); the rest
+are read with one exiftool call per batch. Files that cannot be read either
+way stay in item.tag.
+
+Args:
+    items: Items found by find_reprocess_work, updated in place
+"""
+def check_existing_tags(items: list[ReprocessItem]) -> None:
+
+    tags = {}
+    unknown = []
+    for item in items:
+        for path in item.tag:
+            tags[path] = read_tags(path)
+            if tags[path] is None:
+                unknown.append(path)
+
+    if unknown:
+        try:
+            tags.update(read_tags_exiftool(unknown))
+        except DependencyError:
+            pass
+
+    for item in items:
+        memory = item.memory
+        item.touch = [path for path in item.tag
+                      if tags_match(tags.get(path), memory["date"], memory["lat"], memory["lon"])]
+        item.tag = [path for path in item.tag if path not in item.touch]
+
+# =========================================================================== #
+
+"""
+Redo the missing post-processing of one Memory
+
+Args:
+    item: Work found by find_reprocess_work
+    governor: Optional memory governor passed on to the overlay merges
+    manifest: Manifest whose post-processing error is cleared on success
+
+Returns:
+    None if everything succeeded, otherwise a short reason
+"""
+def reprocess_item(item: ReprocessItem, governor: MemoryGovernor | None = None,
+                   manifest: Manifest | None = None) -> str | None:
+
+    date_str = item.memory["date"]
+    lat = item.memory["lat"]
+    lon = item.memory["lon"]
+
+    try:
+        if item.unzip:
+            handle_zip(item.path, item.path.stem, item.memory, governor)
+
+        for path in item.touch:
+            set_file_timestamp(path, date_str.replace(" UTC", "").strip())
+
+        for path in item.tag:
+            if not write_exif(path, date_str, lat, lon):
+                return f"exiftool failed for {path.name}"
+
+        for main, overlay in item.merge:
+            if main.suffix == ".mp4":
+                combined = merge_mp4_with_overlay(main, overlay, governor)
+            else:
+                combined = merge_jpg_with_overlay(main, overlay, governor)
+            if not write_exif(combined, date_str, lat, lon):
+                return f"exiftool failed for {combined.name}"
+
+        if item.path.is_dir():
+            set_file_timestamp(item.path, date_str.replace(" UTC", "").strip())
+
+    except Exception as e:
+        return str(e)
+
+    if manifest is not None and item.entry is not None and item.entry.get("postprocess_error"):
+        manifest.update(item.entry, drop=("postprocess_error",))
+
+    return None
+
+# =========================================================================== #
+
+"""
+Re-tag and re-merge Memories in parallel without any network access
+
+Args:
+    items: Work found by find_reprocess_work
+    workers: Number of Memories processed concurrently
+    governor: Optional memory governor shared by the overlay merges
+    manifest: Manifest updated as Memories are fixed
+
+Returns:
+    Tuple of (number of Memories fixed, list of (path, reason) failures)
+"""
+def reprocess(items: list[ReprocessItem], workers: int = 1,
+              governor: MemoryGovernor | None = None,
+              manifest: Manifest | None = None) -> tuple[int, list[tuple[Path, str]]]:
+
+    done = 0
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(reprocess_item, item, governor, manifest): item
+            for item in items
+        }
+        try:
+            for count, future in enumerate(as_completed(futures), 1):
+                item = futures[future]
+                reason = future.result()
+                if reason is None:
+                    done += 1
+                else:
+                    failed.append((item.path, reason))
+                print(f"\rReprocessed {count}/{len(items)}: {item.path.name}", end="", flush=True)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    print()
+    return done, failed
+
+# =========================================================================== #
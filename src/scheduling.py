@@ -0,0 +1,131 @@
+import threading
+import heapq
+import time
+
+# =========================================================================== #
+
+# Orders Memories can be processed in
+#   table:    as listed in the export
+#   longest:  most expensive first, so slow overlay encodes don't start last
+#             and stretch the end of the run
+#   smallest: cheapest first, so most Memories are done early
+SCHEDULES = ("table", "longest", "smallest")
+
+# =========================================================================== #
+
+"""
+Order Memory indexes by a scheduling policy
+
+Args:
+    costs: Estimated seconds per Memory, in table order
+    schedule: One of SCHEDULES
+
+Returns:
+    Indexes into costs in processing order; ties keep table order
+"""
+def schedule_order(costs: list[float], schedule: str = "table") -> list[int]:
+
+    order = list(range(len(costs)))
+    if schedule == "longest":
+        order.sort(key=lambda idx: -costs[idx])
+    elif schedule == "smallest":
+        order.sort(key=lambda idx: costs[idx])
+    elif schedule != "table":
+        raise ValueError(f"Unknown schedule '{schedule}'. Expected one of: {', '.join(SCHEDULES)}")
+    return order
+
+# =========================================================================== #
+
+"""
+Simulate workers taking Memories from a queue in order
+
+Args:
+    costs: Estimated seconds per Memory, in processing order
+    workers: Number of Memories processed concurrently
+
+Returns:
+    Estimated seconds until the last Memory finishes
+"""
+def simulate_makespan(costs: list[float], workers: int = 1) -> float:
+
+    # Finish time of each worker; the next Memory goes to the first one free
+    finish = [0.0] * max(1, workers)
+    for cost in costs:
+        heapq.heapreplace(finish, finish[0] + cost)
+    return max(finish)
+
+# =========================================================================== #
+
+"""
+Format seconds as a short duration, e.g. "2h 05m" or "42s"
+
+Args:
+    seconds: Duration
+
+Returns:
+    Human readable duration
+"""
+def format_duration(seconds: float) -> str:
+
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+# =========================================================================== #
+
+class ProgressETA:
+    """
+    Completed share and remaining time of a run, weighted by estimated cost
+
+    The estimates are calibrated while the run goes: the remaining estimated
+    seconds are divided by how many estimated seconds of work have been
+    finished per second so far. Because progress is counted in estimated
+    cost rather than in Memories, the ETA stays meaningful whichever order
+    the Memories are processed in. Memories skipped because they already
+    exist took no real work, so their cost leaves the total instead of
+    counting as finished.
+    """
+
+    def __init__(self, costs: list[float], workers: int = 1):
+        self.costs = costs
+        self.total = sum(costs)
+        self.workers = max(1, workers)
+        self.completed = 0.0
+        self.done = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def finish(self, idx: int) -> None:
+        """Count the Memory at table index idx as finished"""
+        with self._lock:
+            self.completed += self.costs[idx]
+            self.done += 1
+
+    def skip(self, idx: int) -> None:
+        """Drop the Memory at table index idx from the work, as it needed none"""
+        with self._lock:
+            self.total -= self.costs[idx]
+            self.skipped += 1
+
+    def remaining_seconds(self) -> float:
+        """Estimated wall seconds until the run finishes"""
+        with self._lock:
+            remaining = self.total - self.completed
+            elapsed = time.perf_counter() - self._start
+            if self.completed <= 0 or elapsed <= 0:
+                # Nothing measured yet: trust the estimates
+                return remaining / self.workers
+            return remaining * elapsed / self.completed
+
+    def describe(self) -> str:
+        """Progress suffix for status lines, such as: 42% done, ETA 5m 10s"""
+        share = self.completed / self.total if self.total else 0.0
+        return f"{share:.0%} done, ETA {format_duration(self.remaining_seconds())}"
+
+# =========================================================================== #
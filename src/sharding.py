@@ -0,0 +1,57 @@
+from .identity import memory_id
+
+# =========================================================================== #
+
+"""
+Parse a shard specification given on the command line
+
+Args:
+    spec: Shard in the form "i/N" where 1 <= i <= N
+
+Returns:
+    Tuple of (shard index, shard count), with the index 1-based
+
+Raises:
+    ValueError: If spec is malformed or out of range
+"""
+def parse_shard(spec: str) -> tuple[int, int]:
+
+    try:
+        index_str, count_str = spec.split("/")
+        index, count = int(index_str), int(count_str)
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}'. Expected 'i/N', e.g. '1/4'.")
+
+    if count < 1 or not (1 <= index <= count):
+        raise ValueError(f"Invalid shard '{spec}'. Index must be between 1 and {max(count, 1)}.")
+
+    return index, count
+
+# =========================================================================== #
+
+"""
+Select the Memories that belong to one shard
+
+Memories are assigned by their stable identity, so every process or host that
+parses the same export computes the same partition without coordinating.
+
+Args:
+    memories: List of Memory dictionaries with keys: date, type, lat, lon, url
+    index: 1-based shard index
+    count: Total number of shards
+
+Returns:
+    The Memories assigned to this shard, in their original order
+"""
+def shard_memories(memories: list[dict[str, str, str, str, str]],
+                   index: int, count: int) -> list[dict[str, str, str, str, str]]:
+
+    if count <= 1:
+        return list(memories)
+
+    return [
+        memory for memory in memories
+        if int(memory_id(memory), 16) % count == index - 1
+    ]
+
+# =========================================================================== #
@@ -0,0 +1,360 @@
+from .dependencies import *
+from datetime import datetime, timedelta
+from pathlib import Path
+import subprocess
+import struct
+import json
+import re
+import os
+
+# =========================================================================== #
+
+# Coordinates within this many degrees (~20 m) count as the same. exiftool
+# writes ISO 6709 locations in MP4s with 4 decimals.
+GPS_TOLERANCE = 2e-4
+
+# MP4 times count seconds from this date
+MP4_EPOCH = datetime(1904, 1, 1)
+
+# Key exiftool's Keys:GPSCoordinates is stored under
+MP4_LOCATION_KEY = b"com.apple.quicktime.location.ISO6709"
+
+# EXIF tag IDs
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+DATE_TIME_ORIGINAL = 0x9003
+
+# Files passed to one bulk exiftool call
+EXIFTOOL_BATCH = 500
+
+# =========================================================================== #
+
+"""
+Parse a Memory date into a naive datetime
+
+Args:
+    date_str: Date like "2025-12-09 11:10:51 UTC"
+
+Returns:
+    datetime without time zone
+
+Raises:
+    ValueError: If the date format is invalid
+"""
+def parse_memory_date(date_str: str) -> datetime:
+
+    return datetime.strptime(date_str.replace(" UTC", "").strip(), "%Y-%m-%d %H:%M:%S")
+
+# =========================================================================== #
+
+"""
+Convert EXIF GPS degrees/minutes/seconds to decimal degrees
+
+Args:
+    dms: Three rationals (degrees, minutes, seconds)
+    ref: "N"/"S" or "E"/"W"
+
+Returns:
+    Signed decimal degrees
+"""
+def _dms_to_degrees(dms, ref) -> float:
+
+    degrees, minutes, seconds = (float(value) for value in dms)
+    value = degrees + minutes / 60 + seconds / 3600
+    return -value if ref in ("S", "W") else value
+
+# =========================================================================== #
+
+"""
+Read the date and GPS tags of a JPEG from its EXIF header
+
+Args:
+    path: JPEG file
+
+Returns:
+    Dictionary with keys date (datetime or None), lat, lon (floats or None)
+"""
+def read_jpg_tags(path: Path) -> dict:
+
+    from PIL import Image
+
+    # Only the header is parsed; pixel data is never decoded
+    with Image.open(path) as image:
+        exif = image.getexif()
+
+    tags = {"date": None, "lat": None, "lon": None}
+
+    date = exif.get_ifd(EXIF_IFD).get(DATE_TIME_ORIGINAL)
+    if date:
+        try:
+            tags["date"] = datetime.strptime(str(date).strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+        except ValueError:
+            pass
+
+    gps = exif.get_ifd(GPS_IFD)
+    try:
+        tags["lat"] = _dms_to_degrees(gps[2], gps.get(1, "N"))
+        tags["lon"] = _dms_to_degrees(gps[4], gps.get(3, "E"))
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        pass
+
+    return tags
+
+# =========================================================================== #
+
+"""
+Iterate over the boxes (atoms) in a range of an MP4 file
+
+Args:
+    f: File opened in binary mode
+    start: Offset of the first box
+    end: Offset where the range ends
+
+Yields:
+    Tuples of (box type, payload offset, payload size). A box whose size runs
+    past end is still yielded, as declared, and ends the iteration
+"""
+def iter_boxes(f, start: int, end: int):
+
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            large_size = f.read(8)
+            if len(large_size) < 8:
+                return
+            size = struct.unpack(">Q", large_size)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+
+# =========================================================================== #
+
+"""
+Read the creation time and ISO 6709 location of an MP4 from its moov box
+
+Only box headers and the few small boxes involved are read, so this is fast
+even for large videos.
+
+Args:
+    path: MP4 file
+
+Returns:
+    Dictionary with keys date (datetime or None), lat, lon (floats or None),
+    or None if the file has no readable moov box
+"""
+def read_mp4_tags(path: Path) -> dict | None:
+
+    tags = {"date": None, "lat": None, "lon": None}
+
+    with open(path, "rb") as f:
+        file_size = f.seek(0, 2)
+        moov = next(((start, size) for box_type, start, size in iter_boxes(f, 0, file_size)
+                     if box_type == b"moov"), None)
+        if moov is None:
+            return None
+
+        for box_type, start, size in iter_boxes(f, moov[0], moov[0] + moov[1]):
+            if box_type == b"mvhd":
+                f.seek(start)
+                version = f.read(1)[0]
+                f.seek(start + 4)
+                created = struct.unpack(">Q" if version == 1 else ">I", f.read(8 if version == 1 else 4))[0]
+                if created:
+                    tags["date"] = MP4_EPOCH + timedelta(seconds=created)
+
+            # exiftool writes Keys to moov/meta; other tools use moov/udta/meta
+            elif box_type in (b"meta", b"udta"):
+                metas = [(start, size)] if box_type == b"meta" else [
+                    (child_start, child_size)
+                    for child_type, child_start, child_size in iter_boxes(f, start, start + size)
+                    if child_type == b"meta"
+                ]
+                for meta_start, meta_size in metas:
+                    location = _read_mp4_location(f, meta_start, meta_size)
+                    if location is not None and tags["lat"] is None:
+                        tags["lat"], tags["lon"] = location
+
+    return tags
+
+# =========================================================================== #
+
+"""
+Find the ISO 6709 location in an MP4 moov/meta box (QuickTime keys + ilst)
+
+Args:
+    f: File opened in binary mode
+    start: Offset of the meta box payload
+    size: Size of the meta box payload
+
+Returns:
+    Tuple of (lat, lon), or None if no location is stored
+"""
+def _read_mp4_location(f, start: int, size: int) -> tuple[float, float] | None:
+
+    # QuickTime meta boxes start with their children; ISO ones with version/flags
+    f.seek(start + 4)
+    if f.read(4) != b"hdlr":
+        start, size = start + 4, size - 4
+
+    keys = {}
+    values = {}
+    for box_type, child_start, child_size in iter_boxes(f, start, start + size):
+        if box_type == b"keys":
+            f.seek(child_start + 4)
+            count = struct.unpack(">I", f.read(4))[0]
+            for index in range(1, count + 1):
+                key_size = struct.unpack(">I", f.read(4))[0]
+                f.read(4)  # namespace, e.g. "mdta"
+                keys[index] = f.read(key_size - 8)
+        elif box_type == b"ilst":
+            for item_type, item_start, item_size in iter_boxes(f, child_start, child_start + child_size):
+                for data_type, data_start, data_size in iter_boxes(f, item_start, item_start + item_size):
+                    if data_type == b"data" and data_size > 8:
+                        f.seek(data_start + 8)  # type and locale
+                        values[struct.unpack(">I", item_type)[0]] = f.read(data_size - 8)
+
+    for index, key in keys.items():
+        if key == MP4_LOCATION_KEY and index in values:
+            match = re.match(rb"([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)", values[index])
+            if match:
+                return float(match.group(1)), float(match.group(2))
+
+    return None
+
+# =========================================================================== #
+
+"""
+Read the date and location tags of a Memory file without exiftool
+
+Args:
+    path: Memory file
+
+Returns:
+    Dictionary with keys date, lat, lon (each None if missing), or None if
+    the format cannot be read natively (PNG, damaged files)
+"""
+def read_tags(path: Path) -> dict | None:
+
+    ext = path.suffix.lower()
+    try:
+        if ext in (".jpg", ".jpeg"):
+            return read_jpg_tags(path)
+        if ext == ".mp4":
+            return read_mp4_tags(path)
+    except Exception:
+        # Damaged or unusual files are left to exiftool
+        return None
+    return None
+
+# =========================================================================== #
+
+"""
+Normalise a file name for comparison with exiftool's SourceFile
+
+exiftool reports Windows paths with forward slashes, and file names there
+are case-insensitive.
+
+Args:
+    name: File name as passed to exiftool or reported by it
+
+Returns:
+    Comparable form of the name
+"""
+def _source_key(name: str) -> str:
+
+    return os.path.normcase(os.path.normpath(name))
+
+# =========================================================================== #
+
+"""
+Read the date and location tags of many files with one exiftool call per batch
+
+Args:
+    paths: Memory files
+
+Returns:
+    Dictionary of path -> tags (keys date, lat, lon) for every file exiftool
+    could read
+
+Raises:
+    DependencyError: If exiftool is not found
+"""
+def read_tags_exiftool(paths: list[Path]) -> dict[Path, dict]:
+
+    exiftool_path = find_dependency("exiftool")
+    by_name = {_source_key(str(path)): path for path in paths}
+    results = {}
+
+    for i in range(0, len(paths), EXIFTOOL_BATCH):
+        batch = paths[i:i + EXIFTOOL_BATCH]
+        # File names are passed on stdin so long batches never hit the
+        # command line length limit
+        cmd = [
+            exiftool_path, "-json", "-n", "-charset", "filename=utf8",
+            "-DateTimeOriginal", "-CreateDate", "-GPSLatitude", "-GPSLongitude",
+            "-@", "-",
+        ]
+        result = subprocess.run(
+            cmd, input="\n".join(str(path) for path in batch),
+            capture_output=True, text=True, encoding="utf-8",
+        )
+        try:
+            records = json.loads(result.stdout or "[]")
+        except json.JSONDecodeError:
+            continue
+
+        for record in records:
+            source = record.get("SourceFile")
+            path = by_name.get(_source_key(source)) if isinstance(source, str) else None
+            if path is None:
+                continue
+            tags = {"date": None, "lat": record.get("GPSLatitude"), "lon": record.get("GPSLongitude")}
+            date = record.get("DateTimeOriginal") or record.get("CreateDate")
+            if isinstance(date, str):
+                try:
+                    tags["date"] = datetime.strptime(date[:19], "%Y:%m:%d %H:%M:%S")
+                except ValueError:
+                    pass
+            results[path] = tags
+
+    return results
+
+# =========================================================================== #
+
+"""
+Check whether tags already hold a Memory's date and location
+
+Args:
+    tags: Tags from read_tags or read_tags_exiftool
+    date_str: Memory date, e.g. "2025-12-09 11:10:51 UTC"
+    lat: Latitude decimal as a string
+    lon: Longitude decimal as a string
+
+Returns:
+    True if the date and both coordinates match
+"""
+def tags_match(tags: dict | None, date_str: str, lat: str, lon: str) -> bool:
+
+    if not tags or tags.get("date") is None or tags.get("lat") is None or tags.get("lon") is None:
+        return False
+
+    try:
+        return (
+            tags["date"] == parse_memory_date(date_str)
+            and abs(float(tags["lat"]) - float(lat)) <= GPS_TOLERANCE
+            and abs(float(tags["lon"]) - float(lon)) <= GPS_TOLERANCE
+        )
+    except (TypeError, ValueError):
+        return False
+
+# =========================================================================== #
@@ -0,0 +1,359 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .layout import TEMP_SUFFIXES, iter_memory_entries
+from .manifest import Manifest, state_dir
+from .tags import iter_boxes
+from pathlib import Path
+import threading
+import hashlib
+import json
+import os
+
+# =========================================================================== #
+
+# Verification results, kept next to the sync manifest
+CHECKSUMS_NAME = "checksums.jsonl"
+
+# Read size used when hashing files
+HASH_CHUNK = 1024 * 1024
+
+# Photos are decoded at 1/8 scale: enough to reach the end of the data
+DECODE_SCALE = 8
+
+# =========================================================================== #
+
+"""
+Hash a file with SHA-256
+
+Args:
+    path: File to hash
+
+Returns:
+    Hex digest
+"""
+def file_sha256(path: Path) -> str:
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# =========================================================================== #
+
+"""
+Check that an image decodes completely
+
+Args:
+    path: JPG or PNG file
+
+Returns:
+    None if the image is intact, otherwise the problem found
+"""
+def check_image(path: Path) -> str | None:
+
+    from PIL import Image
+
+    try:
+        # verify() checks the structure but not whether the data is complete
+        with Image.open(path) as image:
+            image.verify()
+        with Image.open(path) as image:
+            if image.format == "JPEG":
+                width, height = image.size
+                image.draft("RGB", (width // DECODE_SCALE, height // DECODE_SCALE))
+            image.load()
+    except Exception as e:
+        return f"Image does not decode: {e}"
+    return None
+
+# =========================================================================== #
+
+"""
+Check that an MP4 has a movie header and no box running past the end of file
+
+Args:
+    path: MP4 file
+
+Returns:
+    None if the video looks intact, otherwise the problem found
+"""
+def check_mp4(path: Path) -> str | None:
+
+    with open(path, "rb") as f:
+        file_size = f.seek(0, 2)
+        boxes = set()
+        end = 0
+        for box_type, start, size in iter_boxes(f, 0, file_size):
+            boxes.add(box_type)
+            end = start + size
+
+    if end > file_size:
+        return f"Truncated: last box ends at {end} of {file_size} bytes"
+    if b"moov" not in boxes:
+        return "No moov box (movie header missing)"
+    if b"mdat" not in boxes:
+        return "No mdat box (media data missing)"
+    return None
+
+# =========================================================================== #
+
+"""
+Decode-check a Memory file by type
+
+Args:
+    path: Memory file
+
+Returns:
+    None if the file is intact or of a type that isn't checked, otherwise
+    the problem found
+"""
+def check_media(path: Path) -> str | None:
+
+    ext = path.suffix.lower()
+    if ext in (".jpg", ".jpeg", ".png"):
+        return check_image(path)
+    if ext == ".mp4":
+        return check_mp4(path)
+    return None
+
+# =========================================================================== #
+
+class ChecksumManifest:
+    """
+    Verification results per file, keyed by path relative to the output
+
+    A file whose size and modification time are unchanged since it last
+    verified is skipped on the next pass, so re-verifying a tree only
+    reads what changed. Downloads record the digest computed while they
+    streamed (without "ok"), so their first pass decode-checks them
+    without hashing them again. That only holds for files post-processing
+    left untouched: exiftool rewrites every file it tags, so in practice
+    only files whose tagging failed or was skipped are recorded, and
+    tagged files are hashed on their first pass.
+    """
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = Path(out_dir)
+        self.path = state_dir(out_dir) / CHECKSUMS_NAME
+        self.entries = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["path"]] = entry
+
+    def relative(self, path: Path) -> str:
+        return Path(os.path.relpath(path, self.out_dir)).as_posix()
+
+    def unchanged(self, path: Path, stat: os.stat_result) -> dict | None:
+        """Entry for a file whose size and modification time haven't changed since"""
+        entry = self.entries.get(self.relative(path))
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry
+        return None
+
+    def record_download(self, path: Path, sha256: str) -> None:
+        """Record a file that still holds exactly the bytes hashed while it streamed"""
+        stat = path.stat()
+        self.record({
+            "path": self.relative(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+        })
+
+    def record(self, entry: dict) -> None:
+        """Append one result; the file is compacted by save()"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.entries[entry["path"]] = entry
+
+    def relocate(self, moves: dict[Path, Path]) -> int:
+        """
+        Update stored paths after files were moved by a layout migration,
+        so moved files don't look new to the next pass
+
+        Args:
+            moves: Mapping of old path -> new path (files and ZIP folders)
+
+        Returns:
+            Number of entries whose path changed
+        """
+        relative_moves = {self.relative(old): self.relative(new) for old, new in moves.items()}
+        changed = 0
+        with self._lock:
+            entries = {}
+            for path, entry in self.entries.items():
+                folder, _, name = path.rpartition("/")
+                if path in relative_moves:
+                    entry["path"] = relative_moves[path]
+                    changed += 1
+                elif folder in relative_moves:
+                    # Files of a ZIP folder move with it
+                    entry["path"] = f"{relative_moves[folder]}/{name}"
+                    changed += 1
+                entries[entry["path"]] = entry
+            self.entries = entries
+        self.save(set(entries))
+        return changed
+
+    def save(self, keep: set[str]) -> None:
+        """Rewrite the file with one line per path, dropping paths not in keep"""
+        with self._lock:
+            self.entries = {path: entry for path, entry in self.entries.items() if path in keep}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            tmp_path.replace(self.path)
+
+# =========================================================================== #
+
+"""
+List every file of the Memories in an output tree
+
+Args:
+    out_dir: Root output directory, in any layout
+
+Returns:
+    Files, with extracted ZIP folders expanded to the files inside them
+"""
+def memory_files(out_dir: Path) -> list[Path]:
+
+    files = []
+    for entry in iter_memory_entries(out_dir):
+        if entry.is_dir():
+            files.extend(path for path in sorted(entry.iterdir()) if path.is_file())
+        elif entry.suffix not in TEMP_SUFFIXES:
+            files.append(entry)
+    return files
+
+# =========================================================================== #
+
+"""
+Verify one file, reusing its last result when it hasn't changed
+
+Args:
+    path: Memory file
+    checksums: Results of earlier passes
+    decode: Also decode-check images and videos
+    rehash: Hash files even when size and mtime are unchanged, to catch
+            silent corruption
+
+Returns:
+    Tuple of (result entry, whether the file was actually checked)
+"""
+def verify_file(path: Path, checksums: ChecksumManifest, decode: bool = True,
+                rehash: bool = False) -> tuple[dict, bool]:
+
+    try:
+        stat = path.stat()
+    except OSError as e:
+        # Vanished or unreadable: a failure of this file, not of the pass
+        entry = {"path": checksums.relative(path), "size": None, "mtime_ns": None,
+                 "sha256": None, "ok": False, "problem": f"Could not read file: {e}"}
+        checksums.record(entry)
+        return entry, True
+
+    previous = checksums.unchanged(path, stat)
+    if previous is not None and previous.get("ok") and not rehash:
+        return previous, False
+    if previous is not None and previous.get("ok") is False:
+        # Failed last time: check it afresh
+        previous = None
+
+    # Recorded by its download from the streaming digest, not checked yet
+    streamed = previous is not None and "ok" not in previous
+
+    entry = {
+        "path": checksums.relative(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": None,
+    }
+
+    problem = None
+    try:
+        entry["sha256"] = previous["sha256"] if streamed and not rehash else file_sha256(path)
+        if stat.st_size == 0:
+            problem = "Empty file"
+        elif previous is not None and previous["sha256"] != entry["sha256"]:
+            problem = "Content changed without a change in size or modified time"
+        elif decode:
+            problem = check_media(path)
+    except OSError as e:
+        problem = f"Could not read file: {e}"
+
+    entry["ok"] = problem is None
+    if problem:
+        entry["problem"] = problem
+    checksums.record(entry)
+    return entry, True
+
+# =========================================================================== #
+
+"""
+Verify an output tree in parallel
+
+Every Memory file is hashed and (optionally) decode-checked; files unchanged
+since they last verified are skipped, and files left as downloaded reuse the
+digest recorded while they streamed. Manifest entries whose files are
+missing are reported.
+
+Args:
+    out_dir: Root output directory
+    workers: Number of files checked concurrently
+    decode: Decode-check images and videos
+    rehash: Re-hash unchanged files too
+
+Returns:
+    Tuple of (number of files checked, number skipped as unchanged,
+    list of (path, problem) failures)
+"""
+def verify_tree(out_dir: Path, workers: int = 1, decode: bool = True,
+                rehash: bool = False) -> tuple[int, int, list[tuple[str, str]]]:
+
+    out_dir = Path(out_dir)
+    checksums = ChecksumManifest(out_dir)
+    manifest = Manifest(out_dir)
+    files = memory_files(out_dir)
+
+    failures = []
+    for entry in manifest.entries.values():
+        if entry.get("packed"):
+            if not (out_dir / entry["packed"]).exists():
+                failures.append((entry["path"], f"Missing volume {entry['packed']}"))
+        elif not manifest.resolve(entry).exists():
+            failures.append((entry["path"], "Missing"))
+
+    checked = 0
+    skipped = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(verify_file, path, checksums, decode, rehash) for path in files]
+
+        try:
+            for count, future in enumerate(as_completed(futures), 1):
+                result, was_checked = future.result()
+                checked += was_checked
+                skipped += not was_checked
+                if not result["ok"]:
+                    failures.append((result["path"], result["problem"]))
+                print(f"\rVerified {count}/{len(files)}", end="", flush=True)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    print()
+    checksums.save({checksums.relative(path) for path in files})
+    failures.sort()
+    return checked, skipped, failures
+
+# =========================================================================== #
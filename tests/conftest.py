@@ -0,0 +1,6 @@
+from pathlib import Path
+import sys
+
+# Run against the working tree, not an installed copy
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
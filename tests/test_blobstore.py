@@ -0,0 +1,50 @@
+from src.blobstore import BlobStore, metadata_tag
+from src import downloaders
+
+MEMORY = {"date": "2024-01-02 03:04:05 UTC", "type": "Image", "lat": "1.5", "lon": "2.5", "url": ""}
+DIGEST = "ab" * 32
+
+
+def test_only_tagged_file_is_stored(tmp_path, monkeypatch):
+    def fake_write_exif(path, date, lat, lon):
+        path.write_bytes(b"tagged")
+        return True
+
+    monkeypatch.setattr(downloaders, "write_exif", fake_write_exif)
+    store = BlobStore(tmp_path)
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"download")
+
+    assert downloaders.tag_with_store(photo, MEMORY, DIGEST, store)
+
+    blobs = list(store.root.glob("*/*"))
+    assert blobs == [store.path(DIGEST, ".jpg", metadata_tag(MEMORY))]
+    # The blob is the output file itself, not a second copy
+    assert blobs[0].samefile(photo)
+
+
+def test_failed_tagging_stores_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloaders, "write_exif", lambda *args: False)
+    store = BlobStore(tmp_path)
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"download")
+
+    assert not downloaders.tag_with_store(photo, MEMORY, DIGEST, store)
+    assert not store.root.exists()
+
+
+def test_collect_garbage_keeps_linked_blobs(tmp_path):
+    store = BlobStore(tmp_path)
+    kept = tmp_path / "kept.jpg"
+    kept.write_bytes(b"kept")
+    gone = tmp_path / "gone.jpg"
+    gone.write_bytes(b"gone!")
+    store.put(kept, DIGEST, ".jpg", "a")
+    store.put(gone, DIGEST, ".jpg", "b")
+
+    # Retagging or packing replaces the output file and orphans its blob
+    gone.unlink()
+
+    assert store.collect_garbage() == (1, 5)
+    assert store.get(DIGEST, ".jpg", "a") is not None
+    assert store.get(DIGEST, ".jpg", "b") is None
@@ -0,0 +1,76 @@
+from src.budget import ByteBudget
+
+
+class FakeDisk:
+    """Free space that shrinks as bytes are written"""
+
+    def __init__(self, free: int):
+        self.free = free
+
+    def write(self, budget: ByteBudget, nbytes: int) -> None:
+        self.free -= nbytes
+        budget.written(nbytes)
+
+
+def make_budget(tmp_path, disk: FakeDisk, **kwargs) -> ByteBudget:
+    budget = ByteBudget(tmp_path, poll_interval=0.01, stall_timeout=0, **kwargs)
+    budget._free_space = lambda: disk.free
+    return budget
+
+
+def test_written_bytes_are_charged_once(tmp_path):
+    disk = FakeDisk(100)
+    budget = make_budget(tmp_path, disk)
+
+    assert budget.try_reserve(60)
+    disk.write(budget, 60)
+
+    # 40 bytes are still free; the 60 written ones must not count again
+    assert budget.try_reserve(40)
+    assert not budget.try_reserve(1)
+
+
+def test_unwritten_reservations_hold_disk_space(tmp_path):
+    disk = FakeDisk(100)
+    budget = make_budget(tmp_path, disk)
+
+    assert budget.try_reserve(60)
+    assert not budget.try_reserve(41)
+    assert budget.try_reserve(40)
+
+
+def test_release_returns_only_the_unwritten_part(tmp_path):
+    disk = FakeDisk(100)
+    budget = make_budget(tmp_path, disk)
+
+    assert budget.try_reserve(60)
+    disk.write(budget, 20)
+    budget.release(60, written=20)
+
+    assert budget.in_flight == 0
+    assert budget.unwritten == 0
+    assert budget.try_reserve(80)
+
+
+def test_deleted_attempt_is_charged_again(tmp_path):
+    disk = FakeDisk(100)
+    budget = make_budget(tmp_path, disk)
+
+    assert budget.try_reserve(60)
+    disk.write(budget, 60)
+    # The partial file is removed before a retry
+    disk.free += 60
+    budget.written(-60)
+
+    assert not budget.try_reserve(41)
+
+
+def test_in_flight_limit_counts_whole_reservations(tmp_path):
+    disk = FakeDisk(10_000)
+    budget = make_budget(tmp_path, disk, limit=100)
+
+    assert budget.try_reserve(100)
+    disk.write(budget, 100)
+    assert not budget.try_reserve(1)
+    budget.release(100, written=100)
+    assert budget.try_reserve(100)
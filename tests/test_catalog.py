@@ -0,0 +1,61 @@
+import pytest
+
+from src.catalog import Catalog, describe_files, make_thumbnails, rebuild_catalog
+from src.manifest import Manifest
+
+MEMORY = {"date": "2024-01-02 03:04:05 UTC", "type": "Image", "lat": "48.8584", "lon": "2.2945",
+          "url": "https://example.com/dmd?mid=abc"}
+DIGEST = "cd" * 32
+
+
+def test_files_get_download_digest(tmp_path):
+    photo = tmp_path / "2024-01-02-030405.jpg"
+    photo.write_bytes(b"tagged")
+    folder = tmp_path / "2024-01-03-030405"
+    folder.mkdir()
+    (folder / "2024-01-03-030405-main.jpg").write_bytes(b"main")
+
+    assert describe_files(tmp_path, photo, DIGEST) == [
+        {"role": "main", "path": photo.name, "size": 6, "sha256": DIGEST}
+    ]
+    # The archive's digest is not that of the files extracted from it
+    assert [file["sha256"] for file in describe_files(tmp_path, folder, DIGEST)] == [None]
+
+
+def test_rebuild_and_relocate(tmp_path):
+    photo = tmp_path / "2024-01-02-030405.jpg"
+    photo.write_bytes(b"tagged")
+    Manifest(tmp_path).record(MEMORY, photo, ext=".jpg", sha256=DIGEST, bytes=6)
+
+    catalog = Catalog(tmp_path)
+    assert rebuild_catalog(tmp_path, catalog) == 1
+    catalog.relocate({photo: tmp_path / "2024" / photo.name})
+
+    [row] = catalog.query(near=(48.8584, 2.2945), radius_km=1)
+    catalog.close()
+    assert row["path"] == f"2024/{photo.name}"
+    assert row["files"][0]["path"] == f"2024/{photo.name}"
+    assert row["files"][0]["sha256"] == DIGEST
+
+
+def test_thumbnail_errors_fail_only_their_memory(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    small = tmp_path / "2024-01-02-030405.jpg"
+    large = tmp_path / "2024-01-03-030405.jpg"
+    Image.new("RGB", (8, 8)).save(small, "JPEG")
+    Image.new("RGB", (64, 64)).save(large, "JPEG")
+    manifest = Manifest(tmp_path)
+    manifest.record(MEMORY, small, ext=".jpg")
+    manifest.record(dict(MEMORY, date="2024-01-03 03:04:05 UTC", url="https://example.com/dmd?mid=def"),
+                    large, ext=".jpg")
+    catalog = Catalog(tmp_path)
+    rebuild_catalog(tmp_path, catalog)
+    rows = catalog.query()
+    catalog.close()
+
+    # Pillow raises DecompressionBombError, not an OSError, past twice this
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    thumbs, failures = make_thumbnails(tmp_path, rows, size=4, workers=2)
+
+    assert [row["path"] for row in rows if row["id"] in thumbs] == [small.name]
+    assert [memory_id for memory_id, _ in failures] == [row["id"] for row in rows if row["path"] == large.name]
@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+import hashlib
+import gzip
+import io
+
+import pytest
+
+from src import downloaders
+from src.downloaders import place_download, preallocate, stream_to_file
+from src.manifest import Manifest
+
+NAME = "2024-01-02-030405"
+
+
+def memory(mid: str, date: str = "2024-01-02 03:04:05 UTC") -> dict:
+    return {"date": date, "type": "Image", "lat": "1.5", "lon": "2.5",
+            "url": f"https://example.com/dmd?mid={mid}"}
+
+
+def place(tmp_path, manifest, mid: str, content: bytes, name: str = NAME, date: str = "2024-01-02 03:04:05 UTC"):
+    part_path = tmp_path / f"{name}.jpg.{mid}.part"
+    part_path.write_bytes(content)
+    return place_download(part_path, memory(mid, date), tmp_path, name, ".jpg",
+                          hashlib.sha256(content).hexdigest(), manifest)
+
+
+# --- place_download -------------------------------------------------------------
+
+def test_same_timestamp_is_compared_by_content(tmp_path):
+    manifest = Manifest(tmp_path)
+
+    assert place(tmp_path, manifest, "a", b"photo") == (NAME, False)
+    assert place(tmp_path, manifest, "b", b"photo") == (NAME, True)
+    assert place(tmp_path, manifest, "c", b"other") == (f"{NAME}_2", False)
+    assert not list(tmp_path.glob("*.part"))
+    assert (tmp_path / f"{NAME}_2.jpg").read_bytes() == b"other"
+
+
+def test_same_content_under_another_timestamp_is_kept(tmp_path):
+    manifest = Manifest(tmp_path)
+    later = "2024-01-03-030405"
+
+    assert place(tmp_path, manifest, "a", b"photo") == (NAME, False)
+    # A different Memory, tagged with its own date
+    assert place(tmp_path, manifest, "b", b"photo", later, "2024-01-03 03:04:05 UTC") == (later, False)
+    assert (tmp_path / f"{later}.jpg").exists()
+
+
+# --- stream_to_file -------------------------------------------------------------
+
+BODY = bytes(range(256)) * 40
+
+
+class NoRaw:
+    def readinto(self, buffer):
+        raise AssertionError("encoded body read raw")
+
+
+def response(body: bytes, **headers) -> SimpleNamespace:
+    return SimpleNamespace(
+        headers=headers, raw=io.BytesIO(body),
+        iter_content=lambda chunk_size: (body[i:i + chunk_size] for i in range(0, len(body), chunk_size)),
+    )
+
+
+def test_stream_to_file(tmp_path):
+    pytest.importorskip("urllib3")
+    path = tmp_path / "body"
+    with open(path, "wb") as f:
+        written, digest = stream_to_file(response(BODY), f, len(BODY), buffer_size=1000)
+
+    assert (written, digest) == (len(BODY), hashlib.sha256(BODY).hexdigest())
+    assert path.read_bytes() == BODY
+
+
+def test_encoded_body_goes_through_requests(tmp_path):
+    pytest.importorskip("urllib3")
+    # requests decodes the body; raw holds the compressed bytes
+    r = response(BODY, **{"Content-Encoding": "gzip"})
+    r.raw = NoRaw()
+    path = tmp_path / "body"
+    with open(path, "wb") as f:
+        written, digest = stream_to_file(r, f, len(gzip.compress(BODY)), buffer_size=1000)
+
+    assert (written, digest) == (len(BODY), hashlib.sha256(BODY).hexdigest())
+    assert path.read_bytes() == BODY
+
+
+def test_short_body_is_cut_back(tmp_path):
+    pytest.importorskip("urllib3")
+    charged = []
+    path = tmp_path / "body"
+    with open(path, "wb") as f:
+        written, _ = stream_to_file(response(BODY[:300]), f, len(BODY), on_disk=charged.append)
+
+    # The caller compares written with Content-Length and retries
+    assert written == 300
+    assert path.stat().st_size == 300
+    assert sum(charged) == 300
+
+
+def test_without_fallocate_chunks_are_reported(tmp_path, monkeypatch):
+    pytest.importorskip("urllib3")
+    monkeypatch.delattr(downloaders.os, "posix_fallocate", raising=False)
+    charged = []
+    with open(tmp_path / "body", "wb") as f:
+        assert not preallocate(f, len(BODY))
+        written, _ = stream_to_file(response(BODY), f, len(BODY), buffer_size=4096, on_disk=charged.append)
+
+    assert written == len(BODY)
+    assert charged == [4096, 4096, len(BODY) - 8192]
+
+
+def test_unsupported_fallocate_is_ignored(tmp_path, monkeypatch):
+    def unsupported(fd, offset, size):
+        raise OSError(95, "Operation not supported")
+
+    monkeypatch.setattr(downloaders.os, "posix_fallocate", unsupported, raising=False)
+    with open(tmp_path / "body", "wb") as f:
+        assert not preallocate(f, len(BODY))
+        assert not preallocate(f, None)
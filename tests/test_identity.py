@@ -0,0 +1,23 @@
+from src.identity import dedupe_memories, memory_id
+
+
+def memory(date: str, mid: str, signature: str) -> dict:
+    return {"date": date, "type": "Image", "lat": "1.5", "lon": "2.5",
+            "url": f"https://example.com/dmd?mid={mid}&sig={signature}"}
+
+
+def test_overlapping_exports_list_each_memory_once():
+    old = [memory("2024-01-02 03:04:05 UTC", "a", "old"), memory("2024-01-03 03:04:05 UTC", "b", "old")]
+    # The later export re-signs the shared Memory and adds one taken the same second
+    new = [memory("2024-01-03 03:04:05 UTC", "b", "new"), memory("2024-01-03 03:04:05 UTC", "c", "new")]
+
+    merged, duplicates = dedupe_memories([old, new])
+
+    assert duplicates == 1
+    assert [m["url"] for m in merged] == [old[0]["url"], old[1]["url"], new[1]["url"]]
+    assert memory_id(old[1]) == memory_id(new[0])
+
+
+def test_repeats_within_one_export_are_dropped():
+    first = memory("2024-01-02 03:04:05 UTC", "a", "one")
+    assert dedupe_memories([[first, dict(first)], []]) == ([first], 1)
@@ -0,0 +1,72 @@
+import hashlib
+
+import pytest
+
+from src.layout import memory_dir, migrate_layout
+from src.verify import ChecksumManifest
+
+NAME = "2024-05-01-120000"
+
+
+def test_memory_dir(tmp_path):
+    assert memory_dir(tmp_path, NAME, "flat") == tmp_path
+    assert memory_dir(tmp_path, NAME, "date") == tmp_path / "2024" / "05"
+    assert memory_dir(tmp_path, f"{NAME}_2", "date") == tmp_path / "2024" / "05"
+    assert memory_dir(tmp_path, NAME, "hash") == tmp_path / hashlib.sha1(NAME.encode()).hexdigest()[:2]
+
+
+@pytest.mark.parametrize("name, layout", [("not-a-date", "date"), (NAME, "nested")])
+def test_memory_dir_rejects(tmp_path, name, layout):
+    with pytest.raises(ValueError):
+        memory_dir(tmp_path, name, layout)
+
+
+def make_tree(out_dir):
+    (out_dir / f"{NAME}.jpg").write_bytes(b"photo")
+    folder = out_dir / "2024-06-02-080000"
+    folder.mkdir()
+    (folder / "2024-06-02-080000-main.jpg").write_bytes(b"main")
+    # Left behind by an interrupted download
+    (out_dir / f"{NAME}.mp4.1234.part").write_bytes(b"partial")
+
+
+def test_migrate_layout_is_idempotent(tmp_path):
+    make_tree(tmp_path)
+
+    moves = migrate_layout(tmp_path, "date")
+    assert sorted(new.relative_to(tmp_path).as_posix() for _, new in moves) == [
+        f"2024/05/{NAME}.jpg", "2024/06/2024-06-02-080000",
+    ]
+    assert (tmp_path / f"{NAME}.mp4.1234.part").exists()
+    assert migrate_layout(tmp_path, "date") == []
+
+    # And back, removing the emptied date folders
+    assert len(migrate_layout(tmp_path, "flat")) == 2
+    assert not (tmp_path / "2024").exists()
+
+
+def test_migrate_layout_leaves_conflicts(tmp_path, capsys):
+    make_tree(tmp_path)
+    taken = tmp_path / "2024" / "05" / f"{NAME}.jpg"
+    taken.parent.mkdir(parents=True)
+    taken.write_bytes(b"other")
+
+    moves = migrate_layout(tmp_path, "date")
+
+    assert [old.name for old, _ in moves] == ["2024-06-02-080000"]
+    assert (tmp_path / f"{NAME}.jpg").read_bytes() == b"photo"
+    assert taken.read_bytes() == b"other"
+    assert "already exists" in capsys.readouterr().out
+
+
+def test_checksums_follow_migration(tmp_path):
+    make_tree(tmp_path)
+    checksums = ChecksumManifest(tmp_path)
+    for path in (tmp_path / f"{NAME}.jpg", tmp_path / "2024-06-02-080000" / "2024-06-02-080000-main.jpg"):
+        checksums.record_download(path, "ab" * 32)
+
+    assert checksums.relocate(dict(migrate_layout(tmp_path, "date"))) == 2
+
+    assert set(ChecksumManifest(tmp_path).entries) == {
+        f"2024/05/{NAME}.jpg", "2024/06/2024-06-02-080000/2024-06-02-080000-main.jpg",
+    }
@@ -0,0 +1,55 @@
+import pytest
+
+from src import main
+from src.exceptions import ParseError
+
+# Exports hold the whole table on the line that opens mem-info-bar
+EXPORT = (
+    "<html><body><div id='mem-info-bar'><table><tr><th>Date</th><th>Type</th><th>Location</th>"
+    "<th>Download</th></tr><tr><td>2024-01-02 03:04:05 UTC</td><td>Image</td>"
+    "<td>Latitude, Longitude: 1.5, 2.5</td><td><a href='#' onclick=\"downloadMemories("
+    "'https://example.com/dmd?mid=abc', this, true);\">Download</a></td></tr></table></div></body></html>"
+)
+
+
+def exit_code(argv: list[str]) -> int:
+    with pytest.raises(SystemExit) as exit_info:
+        main.main(argv)
+    return exit_info.value.code
+
+
+def export(tmp_path):
+    path = tmp_path / "memories_history.html"
+    path.write_text(EXPORT, encoding="utf-8")
+    return ["--batch", "--input", str(path), "--output", str(tmp_path / "out")]
+
+
+def test_failed_memories_exit_partial(tmp_path, monkeypatch):
+    pytest.importorskip("bs4")
+    monkeypatch.setattr(main, "memory_download", lambda memories, config, order: (0, [memories[0]]))
+    assert exit_code(export(tmp_path)) == main.EXIT_PARTIAL
+
+    monkeypatch.setattr(main, "memory_download", lambda memories, config, order: (1, []))
+    assert exit_code(export(tmp_path)) == main.EXIT_OK
+
+
+def test_bad_input_exits_error(tmp_path):
+    assert exit_code(["--batch", "--input", str(tmp_path / "missing.html")]) == main.EXIT_ERROR
+
+
+@pytest.mark.parametrize("error, expected", [
+    (ParseError("no table"), main.EXIT_ERROR),
+    (RuntimeError("crash"), main.EXIT_ERROR),
+    (KeyboardInterrupt(), main.EXIT_INTERRUPTED),
+])
+def test_errors_map_to_exit_codes(tmp_path, monkeypatch, error, expected):
+    def fail(args):
+        raise error
+
+    monkeypatch.setattr(main, "run", fail)
+    assert exit_code(export(tmp_path)) == expected
+
+
+@pytest.mark.parametrize("argv", [["--shard", "5/4"], ["--workers", "0"], ["--no-such-option"]])
+def test_invalid_command_line_exits_usage(argv):
+    assert exit_code(["--batch", *argv]) == main.EXIT_USAGE
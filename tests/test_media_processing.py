@@ -0,0 +1,22 @@
+import pytest
+
+from src.governor import MemoryGovernor
+from src.media_processing import merge_jpg_with_overlay
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def test_merge_keeps_full_size_under_small_budget(tmp_path):
+    jpg_path = tmp_path / "2024-01-02-030405-main.jpg"
+    png_path = tmp_path / "2024-01-02-030405-overlay.png"
+    Image.new("RGB", (2000, 1500), "blue").save(jpg_path, "JPEG")
+    Image.new("RGBA", (400, 300), (255, 0, 0, 128)).save(png_path, "PNG")
+
+    # Far below the merge's estimated peak: admitted alone, never downscaled
+    governor = MemoryGovernor(1024 * 1024)
+    combined_path = merge_jpg_with_overlay(jpg_path, png_path, governor)
+
+    with Image.open(combined_path) as combined:
+        assert combined.size == (2000, 1500)
+    assert governor.in_use == 0
+    assert not png_path.exists()
@@ -0,0 +1,48 @@
+import zipfile
+import sys
+import os
+
+import pytest
+
+from src import metadata
+from src.downloaders import handle_zip
+from src.exceptions import ZipExtractionError
+from src.reprocess import needs_tags
+
+pytestmark = pytest.mark.skipif(sys.platform.startswith("win"), reason="fake exiftool is a shell script")
+
+MEMORY = {"date": "2024-01-02 03:04:05 UTC", "type": "Image", "lat": "1.5", "lon": "2.5", "url": ""}
+JPEG = b"\xff\xd8\xff\xd9"
+EARLIER = 1_000_000_000
+
+
+@pytest.fixture
+def failing_exiftool(tmp_path, monkeypatch):
+    exiftool = tmp_path / "bin" / "exiftool"
+    exiftool.parent.mkdir()
+    exiftool.write_text("#!/bin/sh\necho 'Error: Not a valid JPG' >&2\nexit 1\n")
+    exiftool.chmod(0o755)
+    monkeypatch.setattr(metadata, "find_dependency", lambda name: str(exiftool))
+
+
+def test_failed_exiftool_leaves_file_untagged(tmp_path, failing_exiftool):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(JPEG)
+    os.utime(photo, (EARLIER, EARLIER))
+
+    assert not metadata.write_exif(photo, MEMORY["date"], MEMORY["lat"], MEMORY["lon"])
+
+    # The Memory date is only set as mtime once the tags are written
+    assert photo.stat().st_mtime == EARLIER
+    assert needs_tags(photo, MEMORY["date"])
+
+
+def test_failed_exiftool_fails_zip_memory(tmp_path, failing_exiftool):
+    archive = tmp_path / "memory.zip"
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("abc-main.jpg", JPEG)
+
+    with pytest.raises(ZipExtractionError, match="exiftool failed"):
+        handle_zip(archive, "2024-01-02-030405", MEMORY)
+
+    assert needs_tags(tmp_path / "2024-01-02-030405" / "2024-01-02-030405-main.jpg", MEMORY["date"])
@@ -0,0 +1,78 @@
+import tarfile
+
+import pytest
+
+from src.config import RunConfig
+from src.downloaders import download_memory
+from src.manifest import Manifest
+from src.packing import Packer, load_pack_index
+
+MEMORY = {"date": "2024-01-02 03:04:05 UTC", "type": "Image", "lat": "1.5", "lon": "2.5",
+          "url": "https://example.com/dmd?mid=abc"}
+
+
+def add_file(packer: Packer, out_dir, name: str, content: bytes):
+    path = out_dir / name
+    path.write_bytes(content)
+    return packer.add(MEMORY, path)
+
+
+def test_shards_write_separate_volumes(tmp_path):
+    first = Packer(tmp_path, prefix="memories-shard1of2")
+    second = Packer(tmp_path, prefix="memories-shard2of2")
+
+    assert add_file(first, tmp_path, "a.jpg", b"a")[0] == "memories-shard1of2-0001.tar"
+    assert add_file(second, tmp_path, "b.jpg", b"b")[0] == "memories-shard2of2-0001.tar"
+    first.close()
+    second.close()
+
+    assert set(load_pack_index(tmp_path)) == {"a.jpg", "b.jpg"}
+
+
+def test_volume_taken_since_numbering_is_skipped(tmp_path):
+    # Both read the numbering before either opened a volume
+    first = Packer(tmp_path)
+    second = Packer(tmp_path)
+
+    assert add_file(first, tmp_path, "a.jpg", b"a")[0] == "memories-0001.tar"
+    assert add_file(second, tmp_path, "b.jpg", b"b")[0] == "memories-0002.tar"
+    first.close()
+    second.close()
+
+    with tarfile.open(tmp_path / "memories-0001.tar") as tar:
+        assert tar.getnames() == ["a.jpg"]
+
+
+def test_add_returns_data_offsets(tmp_path):
+    for fmt in ("tar", "zip"):
+        out_dir = tmp_path / fmt
+        out_dir.mkdir()
+        packer = Packer(out_dir, fmt)
+        volume, offsets = add_file(packer, out_dir, "a.jpg", b"payload")
+        packer.close()
+
+        with open(out_dir / volume, "rb") as f:
+            f.seek(offsets["a.jpg"])
+            assert f.read(7) == b"payload"
+
+
+def test_packed_memory_is_skipped_without_packer(tmp_path, monkeypatch):
+    pytest.importorskip("requests")
+    manifest = Manifest(tmp_path)
+    manifest.record(MEMORY, tmp_path / "2024-01-02-030405.jpg", packed="memories-0001.tar")
+
+    def fail_to_get(*args, **kwargs):
+        raise AssertionError("packed Memory was downloaded again")
+
+    monkeypatch.setattr("requests.get", fail_to_get)
+    # Resumed without --pack: the loose file is gone, the volume still has it
+    assert download_memory(0, MEMORY, 1, RunConfig(out_dir=tmp_path, manifest=manifest)) is None
+
+
+def test_load_pack_index_uses_prefix(tmp_path):
+    packer = Packer(tmp_path, prefix="other-shard1of2")
+    add_file(packer, tmp_path, "a.jpg", b"a")
+    packer.close()
+
+    assert load_pack_index(tmp_path) == {}
+    assert set(load_pack_index(tmp_path, prefix="other")) == {"a.jpg"}
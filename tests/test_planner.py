@@ -0,0 +1,97 @@
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from benchmarks.mock_cdn import MockCDN
+from src import planner
+from src.planner import DEFAULT_RATES, PlanCache, estimate_costs, probe_memories, probe_url
+
+BODY = b"\xff\xd8" + b"x" * 998
+
+
+def memory(mid: str, memory_type: str = "Image", kind: str = "jpg", base: str = "http://cdn") -> dict:
+    return {"date": "2024-01-02 03:04:05 UTC", "type": memory_type, "lat": "1.5", "lon": "2.5",
+            "url": f"{base}/dmd?mid={mid}&kind={kind}"}
+
+
+# --- PlanCache ----------------------------------------------------------------
+
+def test_plan_cache_round_trip(tmp_path):
+    cache = PlanCache(tmp_path)
+    cache.set(memory("a"), ".jpg", 1000)
+    cache.save()
+
+    reloaded = PlanCache(tmp_path)
+    assert len(reloaded) == 1
+    assert reloaded.get(memory("a"))["bytes"] == 1000
+    assert reloaded.get(memory("b")) is None
+
+
+def test_damaged_plan_cache_starts_empty(tmp_path):
+    cache = PlanCache(tmp_path)
+    cache.path.parent.mkdir(parents=True)
+    cache.path.write_text("{not json", encoding="utf-8")
+
+    assert len(PlanCache(tmp_path)) == 0
+
+
+# --- estimate_costs ---------------------------------------------------------------
+
+def test_unprobed_memories_get_the_average_of_their_type(tmp_path):
+    cache = PlanCache(tmp_path)
+    cache.set(memory("a"), ".jpg", 2_000_000)
+    cache.set(memory("b"), ".jpg", 4_000_000)
+    cache.set(memory("c", "Video"), ".zip", 10_000_000)
+    rates = dict(DEFAULT_RATES, transfer_bytes_per_s=1e6)
+
+    costs = estimate_costs([memory("a"), memory("b"), memory("c", "Video"), memory("d")], cache, rates)
+
+    per_file = rates["ttfb_seconds"] + rates["exiftool_seconds"]
+    overlay = rates["unzip_seconds"] + rates["exiftool_seconds"] + 10 * rates["ffmpeg_seconds_per_mb"]
+    assert costs == pytest.approx([per_file + 2, per_file + 4, per_file + 10 + overlay, per_file + 3])
+
+
+def test_unprobed_types_fall_back_to_typical_sizes(tmp_path):
+    rates = dict(DEFAULT_RATES, transfer_bytes_per_s=1e6)
+    [cost] = estimate_costs([memory("a", "Video")], PlanCache(tmp_path), rates)
+
+    assert cost == pytest.approx(rates["ttfb_seconds"] + rates["exiftool_seconds"]
+                                 + planner.TYPICAL_SIZES["Video"] / 1e6)
+
+
+# --- probe_url / probe_memories -----------------------------------------------------
+
+class NoHeadSession(requests.Session):
+    """Session against a server that refuses HEAD requests"""
+
+    def head(self, url, **kwargs):
+        raise requests.exceptions.ConnectionError("HEAD refused")
+
+
+def test_probe_url_uses_head():
+    with MockCDN({"jpg": (BODY, "image/jpg")}) as cdn, requests.Session() as session:
+        assert probe_url(session, memory("a", base=cdn.url)["url"]) == (".jpg", len(BODY))
+        assert (cdn.requests, cdn.bytes_sent) == (1, 0)
+
+
+def test_probe_url_falls_back_to_range():
+    with MockCDN({"jpg": (BODY, "image/jpg")}) as cdn, NoHeadSession() as session:
+        assert probe_url(session, memory("a", base=cdn.url)["url"]) == (".jpg", len(BODY))
+        # Only the first byte was sent; the size came from Content-Range
+        assert cdn.bytes_sent == 1
+
+
+def test_probe_errors_leave_memories_unknown(tmp_path, monkeypatch):
+    def fake_probe(session, url):
+        if "mid=bad" in url:
+            raise ValueError("unexpected header")
+        return ".jpg", 1000
+
+    monkeypatch.setattr(planner, "probe_url", fake_probe)
+    cache = PlanCache(tmp_path)
+    failures = probe_memories([memory("good"), memory("bad")], cache, concurrency=2)
+
+    assert [(m["url"], reason) for m, reason in failures] == [(memory("bad")["url"], "unexpected header")]
+    assert cache.get(memory("good"))["bytes"] == 1000
+    assert cache.get(memory("bad")) is None
+    assert planner.summarize_plan([memory("good"), memory("bad")], cache, DEFAULT_RATES)["unknown"] == 1
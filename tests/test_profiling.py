@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pstats
+import sys
+
+import pytest
+
+from src import profiling
+from src.profiling import PythonProfiler
+
+
+def busy_work(n: int = 20000) -> int:
+    return sum(i * i for i in range(n))
+
+
+@pytest.mark.parametrize("shared", [
+    pytest.param(False, marks=pytest.mark.skipif(
+        sys.version_info >= (3, 12), reason="one profiler per process from Python 3.12")),
+    True,
+])
+def test_profiler_with_several_workers(tmp_path, shared):
+    profiler = PythonProfiler(shared=shared)
+    workers = 4
+    # Every worker is inside profiled() at the same time
+    barrier = threading.Barrier(workers)
+
+    def worker():
+        with profiler.profiled():
+            barrier.wait()
+            with profiler.profiled():  # nested on the same thread
+                busy_work()
+            barrier.wait()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker) for _ in range(workers)]:
+            future.result()
+
+    path = tmp_path / "run.prof"
+    profiler.write(path)
+    stats = pstats.Stats(str(path))
+    assert any(function[2] == "busy_work" for function in stats.stats)
+
+
+def test_profiled_runs_with_several_workers_through_module_api(tmp_path):
+    profiling.enable(trace=False, python=True)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            def worker():
+                with profiling.profiled():
+                    return busy_work()
+            assert all(future.result() for future in [executor.submit(worker) for _ in range(8)])
+    finally:
+        _, profiler = profiling.disable()
+    profiler.write(tmp_path / "run.prof")
+    assert (tmp_path / "run.prof").exists()
@@ -0,0 +1,44 @@
+import pytest
+
+from src import scheduling
+from src.scheduling import ProgressETA, schedule_order, simulate_makespan
+
+COSTS = [2.0, 8.0, 1.0, 8.0, 4.0]
+
+
+@pytest.mark.parametrize("schedule, order", [
+    ("table", [0, 1, 2, 3, 4]),
+    # Ties keep table order
+    ("longest", [1, 3, 4, 0, 2]),
+    ("smallest", [2, 0, 4, 1, 3]),
+])
+def test_schedule_order(schedule, order):
+    assert schedule_order(COSTS, schedule) == order
+
+
+def test_schedule_order_rejects_unknown():
+    with pytest.raises(ValueError):
+        schedule_order(COSTS, "random")
+
+
+def test_simulate_makespan():
+    assert simulate_makespan(COSTS, 1) == sum(COSTS)
+    assert simulate_makespan([], 4) == 0
+    # Long Memories last stretch the end of the run
+    assert simulate_makespan([1.0, 1.0, 1.0, 1.0, 8.0], 2) == 10.0
+    assert simulate_makespan([8.0, 1.0, 1.0, 1.0, 1.0], 2) == 8.0
+    assert simulate_makespan(COSTS, 0) == sum(COSTS)
+
+
+def test_skipped_memories_leave_the_total(monkeypatch):
+    monkeypatch.setattr(scheduling.time, "perf_counter", lambda: 0.0)
+    progress = ProgressETA([10.0, 10.0, 20.0], workers=1)
+    monkeypatch.setattr(scheduling.time, "perf_counter", lambda: 10.0)
+
+    progress.skip(2)
+    progress.finish(0)
+
+    assert (progress.done, progress.skipped) == (1, 1)
+    # One of two real Memories took 10 s; the skipped one adds nothing
+    assert progress.remaining_seconds() == pytest.approx(10.0)
+    assert progress.describe().startswith("50% done")
@@ -0,0 +1,38 @@
+import pytest
+
+from src.identity import memory_id, url_id
+from src.sharding import parse_shard, shard_memories
+
+
+def memory(mid: int) -> dict:
+    return {"date": "2024-01-02 03:04:05 UTC", "type": "Image", "lat": "1.5", "lon": "2.5",
+            "url": f"https://example.com/dmd?mid={mid}&sig=x"}
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    assert parse_shard("4/4") == (4, 4)
+
+
+@pytest.mark.parametrize("spec", ["0/4", "5/4", "1/0", "1", "a/b", "1/2/3"])
+def test_parse_shard_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_shard(spec)
+
+
+def test_shards_partition_memories():
+    memories = [memory(mid) for mid in range(40)]
+    shards = [shard_memories(memories, index, 3) for index in (1, 2, 3)]
+
+    assert sorted(id(m) for shard in shards for m in shard) == sorted(id(m) for m in memories)
+    assert all(shards)
+    # Same partition whatever order the export lists them in
+    assert shard_memories(memories[::-1], 2, 3) == shards[1][::-1]
+    assert shard_memories(memories, 1, 1) == memories
+
+
+def test_url_id_fallback_keeps_query():
+    assert url_id("https://example.com/dmd?mid=abc&sig=1") == url_id("https://example.com/dmd?mid=abc&sig=2")
+    assert url_id("https://example.com/get?key=1") != url_id("https://example.com/get?key=2")
+    assert url_id("https://example.com/file.jpg") == "example.com/file.jpg"
+    assert memory_id({"url": "https://example.com/get?key=1"}) != memory_id({"url": "https://example.com/get?key=2"})
@@ -0,0 +1,163 @@
+from datetime import datetime
+from types import SimpleNamespace
+import subprocess
+import ntpath
+import struct
+import json
+import io
+
+import pytest
+
+from src import tags
+from src.tags import (MP4_EPOCH, MP4_LOCATION_KEY, iter_boxes, read_jpg_tags, read_mp4_tags,
+                      read_tags, read_tags_exiftool, tags_match)
+
+DATE = datetime(2024, 1, 2, 3, 4, 5)
+
+
+def box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def mvhd(created: int, version: int = 0) -> bytes:
+    if version == 1:
+        return box(b"mvhd", bytes([1, 0, 0, 0]) + struct.pack(">QQ", created, created))
+    return box(b"mvhd", bytes(4) + struct.pack(">II", created, created))
+
+
+def location_meta(iso6709: bytes) -> bytes:
+    # QuickTime meta as exiftool writes it: hdlr, keys, ilst
+    key = struct.pack(">I4s", 8 + len(MP4_LOCATION_KEY), b"mdta") + MP4_LOCATION_KEY
+    keys = box(b"keys", bytes(4) + struct.pack(">I", 1) + key)
+    data = box(b"data", struct.pack(">II", 1, 0) + iso6709)
+    ilst = box(b"ilst", struct.pack(">I4s", 8 + len(data), struct.pack(">I", 1)) + data)
+    return box(b"meta", box(b"hdlr", bytes(24)) + keys + ilst)
+
+
+def mp4(*moov_children: bytes) -> bytes:
+    return box(b"ftyp", b"isom") + box(b"moov", b"".join(moov_children)) + box(b"mdat", b"x" * 16)
+
+
+def seconds(date: datetime) -> int:
+    return int((date - MP4_EPOCH).total_seconds())
+
+
+# --- iter_boxes -------------------------------------------------------------
+
+def boxes_of(data: bytes) -> list[tuple]:
+    return list(iter_boxes(io.BytesIO(data), 0, len(data)))
+
+
+def test_iter_boxes_sizes():
+    large = struct.pack(">I4sQ", 1, b"mdat", 16 + 3) + b"abc"
+    data = box(b"ftyp", b"isom") + large + struct.pack(">I4s", 0, b"free") + b"rest"
+
+    assert boxes_of(data) == [
+        (b"ftyp", 8, 4),
+        (b"mdat", 28, 3),
+        # Size 0 runs to the end of the range
+        (b"free", 39, 4),
+    ]
+
+
+def test_iter_boxes_truncated_header_stops():
+    assert boxes_of(box(b"ftyp", b"isom") + b"\x00\x00\x00") == [(b"ftyp", 8, 4)]
+    # 64-bit size announced but cut off
+    assert boxes_of(struct.pack(">I4s", 1, b"mdat") + b"\x00\x00") == []
+
+
+def test_iter_boxes_overrunning_box_is_last():
+    data = box(b"ftyp", b"isom") + struct.pack(">I4s", 1000, b"mdat") + b"short"
+    assert boxes_of(data) == [(b"ftyp", 8, 4), (b"mdat", 20, 992)]
+
+
+def test_iter_boxes_size_below_header_stops():
+    assert boxes_of(struct.pack(">I4s", 4, b"bad!") + box(b"ftyp")) == []
+
+
+# --- read_mp4_tags ------------------------------------------------------------
+
+@pytest.mark.parametrize("version", [0, 1])
+def test_read_mp4_tags(tmp_path, version):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(mp4(mvhd(seconds(DATE), version), location_meta(b"+48.8584+002.2945+000.000/")))
+
+    assert read_mp4_tags(path) == {"date": DATE, "lat": 48.8584, "lon": 2.2945}
+
+
+def test_read_mp4_tags_from_udta_meta(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(mp4(mvhd(0), box(b"udta", location_meta(b"-33.8688+151.2093/"))))
+
+    assert read_mp4_tags(path) == {"date": None, "lat": -33.8688, "lon": 151.2093}
+
+
+def test_read_mp4_tags_without_moov(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(box(b"ftyp", b"isom") + box(b"mdat", b"x"))
+    assert read_mp4_tags(path) is None
+
+
+def test_read_tags_tolerates_damaged_mp4(tmp_path):
+    path = tmp_path / "video.mp4"
+    # moov declares more than the file holds; mvhd is cut short
+    path.write_bytes(box(b"ftyp", b"isom") + struct.pack(">I4s", 500, b"moov") + struct.pack(">I4s", 108, b"mvhd"))
+    assert read_tags(path) is None
+
+
+# --- read_jpg_tags ------------------------------------------------------------
+
+def test_read_jpg_tags(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    from PIL.TiffImagePlugin import IFDRational
+
+    exif = Image.Exif()
+    exif.get_ifd(tags.EXIF_IFD)[tags.DATE_TIME_ORIGINAL] = "2024:01:02 03:04:05"
+    gps = exif.get_ifd(tags.GPS_IFD)
+    gps[1], gps[2] = "S", (IFDRational(33), IFDRational(30), IFDRational(36))
+    gps[3], gps[4] = "E", (IFDRational(151), IFDRational(0), IFDRational(0))
+    path = tmp_path / "photo.jpg"
+    Image.new("RGB", (8, 8)).save(path, "JPEG", exif=exif)
+
+    result = read_jpg_tags(path)
+    assert result["date"] == DATE
+    assert result["lat"] == pytest.approx(-33.51)
+    assert result["lon"] == pytest.approx(151.0)
+
+
+def test_read_jpg_tags_untagged(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    path = tmp_path / "photo.jpg"
+    Image.new("RGB", (8, 8)).save(path, "JPEG")
+
+    assert read_jpg_tags(path) == {"date": None, "lat": None, "lon": None}
+
+
+# --- tags_match -----------------------------------------------------------------
+
+@pytest.mark.parametrize("found, expected", [
+    ({"date": DATE, "lat": 48.8584, "lon": 2.2945}, True),
+    ({"date": DATE, "lat": 48.85849, "lon": 2.29441}, True),
+    ({"date": DATE, "lat": 48.8594, "lon": 2.2945}, False),
+    ({"date": datetime(2024, 1, 2, 3, 4, 6), "lat": 48.8584, "lon": 2.2945}, False),
+    ({"date": DATE, "lat": None, "lon": 2.2945}, False),
+    ({"date": DATE, "lat": "not a number", "lon": 2.2945}, False),
+    (None, False),
+])
+def test_tags_match(found, expected):
+    assert tags_match(found, "2024-01-02 03:04:05 UTC", "48.8584", "2.2945") is expected
+
+
+# --- read_tags_exiftool -----------------------------------------------------------
+
+def test_exiftool_results_match_windows_paths(monkeypatch):
+    path = tags.Path(r"C:\Memories\2024-01-02-030405.jpg")
+    record = {"SourceFile": "C:/Memories/2024-01-02-030405.jpg", "DateTimeOriginal": "2024:01:02 03:04:05",
+              "GPSLatitude": 48.8584, "GPSLongitude": 2.2945}
+
+    monkeypatch.setattr(tags, "os", SimpleNamespace(path=ntpath))
+    monkeypatch.setattr(tags, "find_dependency", lambda name: "exiftool")
+    monkeypatch.setattr(tags.subprocess, "run", lambda cmd, **kwargs: subprocess.CompletedProcess(
+        cmd, 0, stdout=json.dumps([record]), stderr=""))
+
+    assert read_tags_exiftool([path]) == {path: {"date": DATE, "lat": 48.8584, "lon": 2.2945}}
@@ -0,0 +1,53 @@
+import hashlib
+
+from src import verify
+from src.verify import ChecksumManifest, verify_file
+
+CONTENT = b"streamed bytes"
+
+
+def fail_to_hash(path):
+    raise AssertionError(f"{path.name} was hashed again")
+
+
+def test_download_digest_is_reused(tmp_path, monkeypatch):
+    photo = tmp_path / "photo.png"
+    photo.write_bytes(CONTENT)
+    ChecksumManifest(tmp_path).record_download(photo, hashlib.sha256(CONTENT).hexdigest())
+
+    monkeypatch.setattr(verify, "file_sha256", fail_to_hash)
+    checksums = ChecksumManifest(tmp_path)
+    entry, checked = verify_file(photo, checksums, decode=False)
+
+    assert checked and entry["ok"]
+    assert entry["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+    # Verified now, so the next pass skips it
+    assert verify_file(photo, checksums, decode=False) == (entry, False)
+
+
+def test_rehash_checks_download_digest(tmp_path):
+    photo = tmp_path / "photo.png"
+    photo.write_bytes(CONTENT)
+    checksums = ChecksumManifest(tmp_path)
+    checksums.record_download(photo, hashlib.sha256(b"other bytes").hexdigest())
+
+    entry, checked = verify_file(photo, checksums, decode=False, rehash=True)
+
+    assert checked and not entry["ok"]
+    assert entry["problem"].startswith("Content changed")
+
+
+def test_unreadable_file_is_a_failure(tmp_path, monkeypatch):
+    photo = tmp_path / "2024-01-02-030405.png"
+    photo.write_bytes(CONTENT)
+    vanished = tmp_path / "2024-01-03-030405.mp4"
+
+    # Listed by the scan, gone by the time it is checked
+    monkeypatch.setattr(verify, "memory_files", lambda out_dir: [photo, vanished])
+    checked, skipped, failures = verify.verify_tree(tmp_path, workers=2, decode=False)
+
+    assert (checked, skipped) == (2, 0)
+    assert [path for path, _ in failures] == [vanished.name]
+    assert failures[0][1].startswith("Could not read file")
+    # The pass still saved its results
+    assert set(ChecksumManifest(tmp_path).entries) == {photo.name, vanished.name}